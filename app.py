@@ -1,170 +1,295 @@
+import os
+from datetime import timedelta
 from pathlib import Path
-import random
+from urllib.parse import urlencode
 
 from fasthtml.common import *
 from monsterui.core import *
 
-from recipe_parser.models import Recipe
+from recipe_parser.index import RecipeIndex
+from recipe_parser.models import DifficultyLevel, MealCategory, MeasurementUnit, Recipe
+from recipe_parser.page_cache import PageCache, ViewCounter, etag_matches
+from recipe_parser.pantry import PantryIndex
+from recipe_parser.render import difficulty_to_stars, render_recipe
+from recipe_parser.search import SearchIndex
+from recipe_parser.shopping import ShoppingIndex, ShoppingList, parse_plan
+from recipe_parser.store import open_store
+from recipe_parser.summary import SummaryIndex, SummaryPage
 from recipe_parser.utils import format_duration
 
-RECIPE_DIR = Path("recipes")
-app, rt = fast_app(hdrs=Theme.slate.headers())
+# A directory of recipe files or a .db/.sqlite store created with `recipe-parser import-recipes`.
+RECIPE_STORE = Path(os.environ.get("RECIPE_STORE", "recipes"))
+VIEWS_PATH = Path(".recipe-views.json")
+PAGE_CACHE_SIZE = 256
+WARM_PAGES = 32
+SEARCH_LIMIT = 20
+PAGE_SIZE = 24
 
+# Bump when the page layout changes so browsers do not keep pages in the old layout.
+PAGE_VERSION = "1"
+
+# Validated recipes are loaded once and kept in sync with the recipe store.
+store = open_store(RECIPE_STORE)
+recipe_index = RecipeIndex(store)
+page_cache = PageCache(PAGE_CACHE_SIZE)
+views = ViewCounter(VIEWS_PATH)
+# The search index follows the recipe index and only tokenises recipes that changed.
+search_index = SearchIndex.load(store.index_dir)
+recipe_index.subscribe(search_index.update)
+pantry_index = PantryIndex()
+recipe_index.subscribe(pantry_index.update)
+# Listings are served from the summaries stored with the recipes.
+summary_index = SummaryIndex.from_summaries(store.iter_summaries())
+recipe_index.subscribe(summary_index.update)
+# Quantities are packed as arrays so shopping lists over many recipes are summed in numpy.
+shopping_index = ShoppingIndex()
+recipe_index.subscribe(shopping_index.update)
+recipe_index.start()
+for slug in search_index.slugs() - set(recipe_index.slugs()):
+    search_index.update(slug, None)
+
+
+def warm_page_cache():
+    """Render the most viewed recipes before the first request."""
+    for name in views.most_common(WARM_PAGES):
+        if entry := recipe_index.entry(name):
+            cached_recipe_html(*entry)
+
+
+app, rt = fast_app(hdrs=Theme.slate.headers(), on_startup=[warm_page_cache], on_shutdown=[views.save])
+
+
+def recipe_page(recipe: Recipe | None) -> Div:
+    """Recipe page."""
+    if recipe is None:
+        return Div(
+            P("404 Not Found: The requested recipe does not exist.", cls="text-red-500"),
+            cls="min-h-screen bg-muted p-2 md:p-4"
+        )  # 
+
+    return render_recipe(recipe)
+
+
+def cached_recipe_html(recipe: Recipe, digest: str) -> NotStr:
+    """Rendered recipe, only rendered again when the recipe file changes."""
+    return NotStr(page_cache.get_or_render(digest, lambda: to_xml(render_recipe(recipe))))
+
+
+@rt('/')
+def get(recipe_name: str | None = None):
+    picked = recipe_index.random()
+    entry = recipe_index.entry(picked[0]) if picked else None
+    if entry is None:
+        return recipe_page(None)
+
+    return Title(entry[0].title), cached_recipe_html(*entry)
+
+
+def search_results(query: str) -> Div:
+    """Matching recipes with their description."""
+    hits = [(hit.slug, recipe_index.get(hit.slug)) for hit in search_index.search(query, limit=SEARCH_LIMIT)]
+    hits = [(slug, recipe) for slug, recipe in hits if recipe is not None]
+    if not hits:
+        return P(f"No recipes found for '{query}'.", cls="text-gray-500")
 
-def create_ingredient_list(ingredients):
     return Ul(
         *[Li(
-            Div(
-                Div(f"{ing.quantity} {ing.unit.value}", cls="text-sm text-gray-600"),
-                Div(ing.name, cls="font-medium"),
-                P(ing.notes, cls="text-sm text-gray-500") if ing.notes else "",
-                cls="flex flex-col"
-            ),
+            A(recipe.title, href=f"/recipes/{slug}", cls="font-medium"),
+            P(recipe.description, cls="text-sm text-gray-500"),
             cls="p-2 border-b"
-        ) for ing in ingredients],
+        ) for slug, recipe in hits],
         cls="divide-y rounded-lg bg-card"
     )
 
-def create_instructions_list(instructions):
-    return Ol(
+
+@rt('/search')
+def search_page(q: str = ""):
+    return Title("Search"), Div(
+        Article(
+            Form(
+                Input(type="search", name="q", value=q, placeholder="Search recipes, ingredients or tags"),
+                action="/search", method="get", cls="mb-3"
+            ),
+            search_results(q) if q.strip() else "",
+            cls="max-w-4xl mx-auto p-10 bg-background rounded-xl shadow-lg"
+        ),
+        cls="min-h-screen bg-muted p-2 md:p-4"
+    )
+
+
+def pantry_results(pantry: list[str]) -> Div:
+    """Recipes covered by the pantry with the ingredients still to buy."""
+    matches = [(match, recipe_index.get(match.slug)) for match in pantry_index.match(pantry, limit=SEARCH_LIMIT)]
+    matches = [(match, recipe) for match, recipe in matches if recipe is not None]
+    if not matches:
+        return P("No recipe uses any of these ingredients.", cls="text-gray-500")
+
+    return Ul(
         *[Li(
-            Article(
-                P(instruction.instruction, cls="text-base"),
-                P(instruction.note, cls="text-sm text-gray-500 mt-1") if instruction.note else "",
-                cls="p-2"
+            A(recipe.title, href=f"/recipes/{match.slug}", cls="font-medium"),
+            P(
+                f"Missing: {', '.join(match.missing)}" if match.missing else "You have everything.",
+                cls="text-sm text-gray-500"
             ),
-            cls="mb-2"
-        ) for instruction in instructions],
-        cls="space-y-1"
+            cls="p-2 border-b"
+        ) for match, recipe in matches],
+        cls="divide-y rounded-lg bg-card"
     )
 
-def difficulty_to_stars(difficulty):
-    stars = {
-        'easy': '★☆☆',
-        'medium': '★★☆',
-        'hard': '★★★'
-    }
-    return stars.get(difficulty.lower(), '☆☆☆')
 
-def render_recipe(recipe: Recipe) -> Div:
-    """Render recipe."""
-    return Div(
+@rt('/cook')
+def cook_page(pantry: str = ""):
+    items = [item.strip() for item in pantry.replace("\n", ",").split(",") if item.strip()]
+    return Title("What can I cook?"), Div(
         Article(
-            # Header section
-            Header(
-                H1(recipe.title, cls="text-3xl font-bold mb-2"),
-                P(recipe.description, cls="text-gray-600 italic"),
-                cls="mb-3"
-            ),
-            
-            # Recipe metadata
-            Section(
-                Grid(
-                    Div(
-                        H3("Author", cls="text-sm font-medium text-gray-500"),
-                        P(recipe.author, cls="mt-0.5"),
-                        cls="p-2"
-                    ),
-                    Div(
-                        H3("Difficulty", cls="text-sm font-medium text-gray-500"),
-                        P(difficulty_to_stars(recipe.difficulty), cls="mt-0.5"),
-                        cls="p-2"
-                    ),
-                    Div(
-                        H3("Servings", cls="text-sm font-medium text-gray-500"),
-                        P(str(recipe.servings), cls="mt-0.5"),
-                        cls="p-2"
-                    ),
-                    Div(
-                        H3("Prep Time", cls="text-sm font-medium text-gray-500"),
-                        P(
-                            UkIcon("clock", cls="inline-block w-4 h-4 mr-1"),
-                            format_duration(recipe.prep_time),
-                            cls="mt-0.5 flex items-center"
-                        ),
-                        cls="p-2"
-                    ),
-                    Div(
-                        H3("Cook Time", cls="text-sm font-medium text-gray-500"),
-                        P(
-                            UkIcon("clock", cls="inline-block w-4 h-4 mr-1"),
-                            format_duration(recipe.cook_time),
-                            cls="mt-0.5 flex items-center"
-                        ),
-                        cls="p-2"
-                    ),
-                    Div(
-                        H3("Total Time", cls="text-sm font-medium text-gray-500"),
-                        P(
-                            UkIcon("clock", cls="inline-block w-4 h-4 mr-1"),
-                            format_duration(recipe.total_time),
-                            cls="mt-0.5 flex items-center"
-                        ),
-                        cls="p-2"
-                    ),
-                    cls="grid-cols-2 md:grid-cols-3 gap-2 bg-muted rounded-lg"
-                ),
-                cls="mb-3 py-4"
-            ),
-            
-            # Main content
-            Grid(
-                # Ingredients section
-                Section(
-                    H2("Ingredients", cls="text-xl font-semibold mb-2"),
-                    create_ingredient_list(recipe.ingredients),
-                    cls="py-2"
-                ),
-                
-                # Instructions section
-                Section(
-                    H2("Instructions", cls="text-xl font-semibold mb-2"),
-                    create_instructions_list(recipe.instructions),
-                    cls="py-2"
-                ),
-                cls="grid-cols-1 lg:grid-cols-2 gap-4"
+            Form(
+                Textarea(pantry, name="pantry", placeholder="eggs, flour, butter, ...", rows=3),
+                Button("What can I cook?", type="submit"),
+                action="/cook", method="get", cls="mb-3 space-y-2"
             ),
-            
-            # Footer with tags
-            Footer(
-                H3("Tags", cls="text-base font-semibold mb-1"),
+            pantry_results(items) if items else "",
+            cls="max-w-4xl mx-auto p-10 bg-background rounded-xl shadow-lg"
+        ),
+        cls="min-h-screen bg-muted p-2 md:p-4"
+    )
+
+
+def shopping_results(shopping: ShoppingList) -> Div:
+    """Ingredients to buy with the recipes that use them."""
+    missing = P(f"Unknown recipes: {', '.join(shopping.missing)}", cls="text-red-500") if shopping.missing else ""
+    if not shopping.items:
+        return Div(missing, P("Nothing to buy for these recipes.", cls="text-gray-500"))
+
+    return Div(
+        missing,
+        Ul(
+            *[Li(
                 Div(
-                    *[Span(tag, cls="inline-block px-2 py-0.5 rounded-full text-sm font-medium bg-primary/10 text-primary mr-1 mb-1") for tag in recipe.tags],
-                    cls="flex flex-wrap"
+                    "to taste" if item.unit == MeasurementUnit.TO_TASTE else f"{item.quantity:g} {item.unit.value}",
+                    cls="text-sm text-gray-600"
+                ),
+                Div(item.name, cls="font-medium"),
+                P(*[A(slug, href=f"/recipes/{slug}", cls="mr-2") for slug in item.recipes], cls="text-sm text-gray-500"),
+                cls="p-2 border-b"
+            ) for item in shopping.items],
+            cls="divide-y rounded-lg bg-card"
+        )
+    )
+
+
+@rt('/api/shopping')
+def shopping_api(recipes: str = "", servings: int | None = None):
+    try:
+        shopping = shopping_index.shopping_list(parse_plan(recipes, servings))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(shopping.model_dump(mode="json"))
+
+
+@rt('/shopping')
+def shopping_page(recipes: str = "", servings: int | None = None):
+    try:
+        plan = parse_plan(recipes, servings)
+    except ValueError as e:
+        return P(str(e), cls="text-red-500")
+
+    return Title("Shopping list"), Div(
+        Article(
+            Form(
+                Textarea(
+                    recipes, name="recipes", rows=4,
+                    placeholder="dutch-apple-cake:12, one recipe per line or comma, with servings after a colon"
                 ),
-                cls="mt-4 pt-4 border-t"
+                Input(type="number", name="servings", value=servings or "", placeholder="Servings of every recipe", min=1),
+                Button("Make shopping list", type="submit"),
+                action="/shopping", method="get", cls="mb-3 space-y-2"
             ),
-            
+            shopping_results(shopping_index.shopping_list(plan)) if plan else "",
             cls="max-w-4xl mx-auto p-10 bg-background rounded-xl shadow-lg"
         ),
         cls="min-h-screen bg-muted p-2 md:p-4"
     )
 
-def recipe_page(recipe_path: Path) -> Div:
-    """Recipe page."""
-    if not recipe_path.exists():
-        return Div(
-            P("404 Not Found: The requested recipe does not exist.", cls="text-red-500"),
-            cls="min-h-screen bg-muted p-2 md:p-4"
-        )  # 
-        
-    with recipe_path.open() as f:
-        recipe = Recipe.model_validate_json(f.read())
 
-    return render_recipe(recipe)
+def summary_page(cursor: str, category: str, difficulty: str, max_minutes: int | None) -> SummaryPage:
+    """Page of recipe summaries, raises ValueError for unknown filter values or cursors."""
+    return summary_index.page(
+        cursor=cursor or None,
+        limit=PAGE_SIZE,
+        category=MealCategory(category) if category else None,
+        difficulty=DifficultyLevel(difficulty) if difficulty else None,
+        max_total_time=timedelta(minutes=max_minutes) if max_minutes else None,
+    )
 
 
-@rt('/')
-def get(recipe_name: str | None = None):
-    recipe_path = random.choice(list(RECIPE_DIR.iterdir()))
+@rt('/api/recipes')
+def recipes_api(cursor: str = "", category: str = "", difficulty: str = "", max_minutes: int | None = None):
+    try:
+        page = summary_page(cursor, category, difficulty, max_minutes)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(page.model_dump(mode="json"))
 
-    return recipe_page(recipe_path)
+
+@rt('/recipes')
+def recipes_list(cursor: str = "", category: str = "", difficulty: str = "", max_minutes: int | None = None):
+    try:
+        page = summary_page(cursor, category, difficulty, max_minutes)
+    except ValueError as e:
+        return P(str(e), cls="text-red-500")
+
+    filters = {"category": category, "difficulty": difficulty, "max_minutes": max_minutes or ""}
+    next_query = urlencode({k: v for k, v in {**filters, "cursor": page.next_cursor}.items() if v})
+    return Title("Recipes"), Div(
+        Article(
+            Form(
+                Select(
+                    Option("Any category", value=""),
+                    *[Option(c.value.replace("_", " "), value=c.value, selected=c.value == category) for c in MealCategory],
+                    name="category"
+                ),
+                Select(
+                    Option("Any difficulty", value=""),
+                    *[Option(d.value, value=d.value, selected=d.value == difficulty) for d in DifficultyLevel],
+                    name="difficulty"
+                ),
+                Input(type="number", name="max_minutes", value=max_minutes or "", placeholder="Max minutes", min=1),
+                Button("Filter", type="submit"),
+                action="/recipes", method="get", cls="mb-3 flex gap-2"
+            ),
+            Ul(
+                *[Li(
+                    A(summary.title, href=f"/recipes/{summary.slug}", cls="font-medium"),
+                    P(
+                        f"{difficulty_to_stars(summary.difficulty)} · {format_duration(summary.total_time)}",
+                        cls="text-sm text-gray-500"
+                    ),
+                    cls="p-2 border-b"
+                ) for summary in page.items],
+                cls="divide-y rounded-lg bg-card"
+            ) if page.items else P("No recipes match these filters.", cls="text-gray-500"),
+            A("Next page", href=f"/recipes?{next_query}", cls="mt-3 inline-block") if page.next_cursor else "",
+            cls="max-w-4xl mx-auto p-10 bg-background rounded-xl shadow-lg"
+        ),
+        cls="min-h-screen bg-muted p-2 md:p-4"
+    )
 
 
 @rt('/recipes/{recipe_name}')
-def get_recipe(recipe_name: str):
-    recipe_path = RECIPE_DIR / f"{recipe_name}.json"
+def get_recipe(recipe_name: str, request: Request):
+    entry = recipe_index.entry(recipe_name)
+    if entry is None:
+        return recipe_page(None)
+
+    views.hit(recipe_name)
+    recipe, digest = entry
+    # HTMX requests get a fragment instead of a full page for the same recipe, which needs an ETag of its own.
+    fragment = "hx-request" in request.headers and "hx-history-restore-request" not in request.headers
+    headers = {"ETag": f'"{PAGE_VERSION}-{digest}{"-frag" if fragment else ""}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        # FastHTML only adds its Vary header to the responses it renders.
+        return Response(status_code=304, headers=headers | {"Vary": "HX-Request, HX-History-Restore-Request"})
 
-    return recipe_page(recipe_path)
+    return Title(recipe.title), cached_recipe_html(recipe, digest), *[HttpHeader(k, v) for k, v in headers.items()]
 
 serve()
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""Measure the import time of the command line interface with `python -X importtime`.
+
+Run with `uv run python benchmarks/import_time.py`. Exits with a non-zero status
+when importing `recipe_parser.cli` takes longer than the budget, or when it loads
+one of the dependencies that only the commands themselves should load.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULE = "recipe_parser.cli"
+IMPORT_BUDGET_MS = 300
+REPEAT = 7
+
+# Each of these adds from tens of milliseconds (bs4) to more than a second (anthropic).
+HEAVY_MODULES = ["anthropic", "httpx", "bs4", "pydantic_settings", "numpy", "PIL", "pypdf", "recipe_parser.models"]
+
+
+def import_times(code: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of every module imported by a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_MS, help="Maximum import time in ms")
+    parser.add_argument("--module", default=MODULE)
+    args = parser.parse_args()
+
+    # The first run writes the bytecode caches, which is not what users wait for.
+    times = import_times(f"import {args.module}")
+    timings = [import_times(f"import {args.module}")[args.module] / 1000 for _ in range(REPEAT)]
+    print(f"import {args.module}: {min(timings):.1f} ms (median {statistics.median(timings):.1f} ms)")
+
+    # Packages the module pulls in, without those every interpreter imports at startup.
+    startup = import_times("pass")
+    slowest = sorted(
+        ((name, us) for name, us in times.items() if name not in startup and name != args.module and "." not in name),
+        key=lambda item: -item[1],
+    )
+    for name, us in slowest[:5]:
+        print(f"  {name:30} {us / 1000:8.1f} ms")
+
+    failed = False
+    heavy = [name for name in HEAVY_MODULES if name in times]
+    if heavy:
+        print(f"{args.module} imports {', '.join(heavy)}, load them in the commands that use them", file=sys.stderr)
+        failed = True
+    if min(timings) > args.budget:
+        print(f"import time exceeds the budget of {args.budget:g} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Measure peak memory of turning a large PDF into a Claude request.
+
+Run with `uv run python benchmarks/payload_memory.py`. Exits with a non-zero status
+when the peak exceeds the budget, expressed as a multiple of the file size.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from recipe_parser.parser import _build_request, source_to_input
+
+FILE_SIZE = 24 * 1024 * 1024
+
+# The base64 str is 4/3 of the file, encoding briefly holds the bytes and the str.
+SOURCE_PEAK_BUDGET = 2.8
+REQUEST_RETAINED_BUDGET = 1.4
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "cookbook.pdf"
+        with path.open("wb") as f:
+            f.write(b"%PDF-1.7\n")
+            f.write(os.urandom(FILE_SIZE - 9))
+
+        tracemalloc.start()
+        input = source_to_input(str(path), max_payload_bytes=None)
+        _, source_peak = tracemalloc.get_traced_memory()
+
+        request = _build_request(input, "model", "prompt")
+        retained, _ = tracemalloc.get_traced_memory()
+
+        tracemalloc.reset_peak()
+        json.dumps(request)
+        _, serialise_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    results = {
+        "source_to_input_peak": source_peak / FILE_SIZE,
+        "request_retained": retained / FILE_SIZE,
+        "serialise_peak": serialise_peak / FILE_SIZE,
+    }
+    for name, ratio in results.items():
+        print(f"{name}: {ratio:.2f}x file size")
+
+    if results["source_to_input_peak"] > SOURCE_PEAK_BUDGET or results["request_retained"] > REQUEST_RETAINED_BUDGET:
+        print("peak memory exceeds the budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
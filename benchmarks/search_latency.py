@@ -0,0 +1,74 @@
+"""Measure search latency on a synthetic collection of 100k recipes.
+
+Run with `uv run python benchmarks/search_latency.py`. Exits with a non-zero status
+when the slowest query exceeds the budget.
+"""
+
+import itertools
+import random
+import sys
+import time
+from datetime import timedelta
+
+from recipe_parser.models import Ingredient, Recipe, Step
+from recipe_parser.search import SearchIndex
+
+RECIPES = 100_000
+VOCABULARY = 20_000
+LATENCY_BUDGET_MS = 25
+
+QUERIES = ["chicken", "tomato basil", "choc", "garlic butter sa", "w", "word1", "quick vegetarian curry", "zzzz"]
+
+
+def make_recipe(rng: random.Random, words: list[str], cum_weights: list[float]) -> Recipe:
+    def text(n):
+        return " ".join(rng.choices(words, cum_weights=cum_weights, k=n))
+
+    return Recipe(
+        title=text(4),
+        description=text(25),
+        author="Benchmark",
+        prep_time=timedelta(minutes=10),
+        cook_time=timedelta(minutes=20),
+        total_time=timedelta(minutes=30),
+        servings=4,
+        difficulty="easy",
+        ingredients=[Ingredient(name=text(2), quantity=1, unit="g") for _ in range(10)],
+        instructions=[Step(order=1, instruction="Cook.")],
+        tags=[text(1) for _ in range(3)],
+        cuisine_type=text(1),
+    )
+
+
+def main() -> int:
+    rng = random.Random(0)
+    words = QUERIES[:3] + ["tomato", "basil", "garlic", "butter", "vegetarian", "curry"]
+    words += [f"word{i}" for i in range(VOCABULARY)]
+    # Word frequencies in recipes follow a Zipf distribution like natural text.
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for i in range(RECIPES):
+        index.update(f"recipe-{i}", make_recipe(rng, words, cum_weights))
+    print(f"indexed {RECIPES} recipes in {time.perf_counter() - start:.1f}s")
+
+    index.search("warm up")
+    slowest = 0.0
+    for query in QUERIES:
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            hits = index.search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        slowest = max(slowest, min(timings))
+        print(f"{query!r}: {min(timings):.1f} ms, {len(hits)} hits")
+
+    if slowest > LATENCY_BUDGET_MS:
+        print(f"slowest query exceeds the budget of {LATENCY_BUDGET_MS} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""Offline benchmarks of the parsing pipeline and the web app rendering.
+
+Run with `uv run python benchmarks/suite.py`. Results are written to
+`benchmarks/results.json` and compared with `benchmarks/baseline.json`; the script
+exits with a non-zero status when a benchmark is slower than the baseline by more
+than the tolerance. Claude is replaced by a client that replays a recorded
+message, so no network access or API key is needed. Refresh the baseline with
+`--update-baseline` after an intended change.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import timeit
+from collections.abc import Callable
+from datetime import timedelta
+from pathlib import Path
+
+from anthropic.types import (
+    InputJSONDelta,
+    Message,
+    RawContentBlockDeltaEvent,
+    RawContentBlockStartEvent,
+    RawContentBlockStopEvent,
+    RawMessageDeltaEvent,
+    RawMessageStartEvent,
+    RawMessageStopEvent,
+)
+from fasthtml.common import to_xml
+
+from recipe_parser.images import Image
+from recipe_parser.models import Recipe
+from recipe_parser.parser import parse_input_to_recipe, source_to_input
+from recipe_parser.render import render_recipe
+from recipe_parser.shopping import ShoppingIndex
+from recipe_parser.utils import format_duration
+
+BENCHMARK_DIR = Path(__file__).parent
+ROOT = BENCHMARK_DIR.parent
+RECORDED_MESSAGE = BENCHMARK_DIR / "fixtures" / "recipe_message.json"
+SAMPLE_RECIPE = ROOT / "recipes" / "dutch-apple-cake.json"
+SYSTEM_PROMPT = ROOT / "recipe-prompt.txt"
+
+CORPUS_SIZE = 10_000
+REPEAT = 5
+
+BENCHMARKS: dict[str, tuple[int, Callable[[Path], Callable[[], object] | None]]] = {}
+
+
+def benchmark(name: str, number: int):
+    """Register a setup function that prepares fixtures and returns the function to time.
+
+    The setup returns None when the benchmark cannot run, e.g. without an optional extra.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (number, setup)
+        return setup
+    return register
+
+
+class ReplayClient:
+    """Stand-in for the Anthropic client that answers every request with a recorded message.
+
+    Streamed requests get the message as stream events, with the tool input split
+    into chunks of the size the API sends.
+    """
+
+    def __init__(self, path: Path, chunk_size: int = 16):
+        self.message = Message.model_validate_json(path.read_text())
+        self.events = list(self._events(chunk_size))
+        self.messages = self
+
+    def create(self, stream: bool = False, **kwargs):
+        return ReplayStream(self.events) if stream else self.message
+
+    def _events(self, chunk_size: int):
+        start = self.message.model_copy(deep=True, update={"content": [], "stop_reason": None})
+        yield RawMessageStartEvent(type="message_start", message=start)
+        for index, block in enumerate(self.message.content):
+            if block.type == "tool_use":
+                empty = block.model_copy(update={"input": {}})
+                yield RawContentBlockStartEvent(type="content_block_start", index=index, content_block=empty)
+                data = json.dumps(block.input)
+                for offset in range(0, len(data), chunk_size):
+                    delta = InputJSONDelta(type="input_json_delta", partial_json=data[offset:offset + chunk_size])
+                    yield RawContentBlockDeltaEvent(type="content_block_delta", index=index, delta=delta)
+            else:
+                yield RawContentBlockStartEvent(type="content_block_start", index=index, content_block=block)
+            yield RawContentBlockStopEvent(type="content_block_stop", index=index)
+        yield RawMessageDeltaEvent(
+            type="message_delta",
+            delta={"stop_reason": self.message.stop_reason, "stop_sequence": None},
+            usage={"output_tokens": self.message.usage.output_tokens},
+        )
+        yield RawMessageStopEvent(type="message_stop")
+
+
+class ReplayStream:
+    def __init__(self, events: list):
+        # The accumulator fills in the started message and blocks, so those are copies.
+        self.events = [
+            event.model_copy(deep=True) if event.type in ("message_start", "content_block_start") else event
+            for event in events
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __iter__(self):
+        return iter(self.events)
+
+
+def sample_recipe() -> Recipe:
+    return Recipe.model_validate_json(SAMPLE_RECIPE.read_bytes())
+
+
+def article_html(recipe: Recipe) -> str:
+    """A recipe page buried in navigation, ads and comments like most recipe blogs."""
+    noise = "".join(f"<li><a href='/post/{i}'>Another post about cooking {i}</a></li>" for i in range(400))
+    comments = "".join(f"<div class='comment'><p>Looks delicious, made it {i} times!</p></div>" for i in range(200))
+    ingredients = "".join(f"<li>{i.quantity} {i.unit.value} {i.name}</li>" for i in recipe.ingredients)
+    steps = "".join(f"<li>{s.instruction}</li>" for s in recipe.instructions)
+    return (
+        f"<html><head><title>{recipe.title}</title><script>var ads = {'x' * 5000!r};</script></head><body>"
+        f"<nav><ul>{noise}</ul></nav><article><h1>{recipe.title}</h1><p>{recipe.description}</p>"
+        f"<h2>Ingredients</h2><ul>{ingredients}</ul><h2>Instructions</h2><ol>{steps}</ol></article>"
+        f"<section id='comments'>{comments}</section><footer>{noise}</footer></body></html>"
+    )
+
+
+def json_ld_html(recipe: Recipe) -> str:
+    """A recipe page with schema.org markup that maps to a recipe without Claude."""
+    data = {
+        "@context": "https://schema.org",
+        "@type": "Recipe",
+        "name": recipe.title,
+        "description": recipe.description,
+        "author": {"@type": "Person", "name": recipe.author},
+        "prepTime": "PT20M",
+        "cookTime": "PT1H",
+        "totalTime": "PT1H20M",
+        "recipeYield": "8",
+        "recipeIngredient": [f"{i.quantity:g} {i.unit.value} {i.name}" for i in recipe.ingredients if i.unit.value in ("g", "ml")],
+        "recipeInstructions": [{"@type": "HowToStep", "text": s.instruction} for s in recipe.instructions],
+    }
+    return f"<html><head><script type='application/ld+json'>{json.dumps(data)}</script></head><body></body></html>"
+
+
+@benchmark("source_to_input.html_article", number=20)
+def html_article(fixtures: Path):
+    path = fixtures / "article.html"
+    path.write_text(article_html(sample_recipe()))
+    return functools.partial(source_to_input, str(path))
+
+
+@benchmark("source_to_input.html_json_ld", number=50)
+def html_json_ld(fixtures: Path):
+    path = fixtures / "json_ld.html"
+    path.write_text(json_ld_html(sample_recipe()))
+    return functools.partial(source_to_input, str(path))
+
+
+@benchmark("source_to_input.pdf_8mb", number=5)
+def pdf(fixtures: Path):
+    path = fixtures / "cookbook.pdf"
+    path.write_bytes(b"%PDF-1.7\n" + random.Random(0).randbytes(8 * 2**20))
+    return functools.partial(source_to_input, str(path))
+
+
+@benchmark("source_to_input.photo", number=3)
+def photo(fixtures: Path):
+    if Image is None:
+        return None
+    # A 12 megapixel photo, as taken by a phone, with some texture so it does not compress away.
+    image = Image.radial_gradient("L").resize((4000, 3000)).convert("RGB")
+    image = Image.blend(image, Image.effect_noise((4000, 3000), 40).convert("RGB"), 0.3)
+    path = fixtures / "photo.png"
+    image.save(path)
+    return functools.partial(source_to_input, str(path))
+
+
+@benchmark("parse_input_to_recipe.replay", number=200)
+def parse_replay(fixtures: Path):
+    path = fixtures / "article.html"
+    path.write_text(article_html(sample_recipe()))
+    input = source_to_input(str(path))
+    client = ReplayClient(RECORDED_MESSAGE)
+    return functools.partial(parse_input_to_recipe, input, client, "claude-benchmark", SYSTEM_PROMPT)
+
+
+@benchmark("parse_input_to_recipe.replay_progress", number=200)
+def parse_replay_progress(fixtures: Path):
+    path = fixtures / "article.html"
+    path.write_text(article_html(sample_recipe()))
+    input = source_to_input(str(path))
+    client = ReplayClient(RECORDED_MESSAGE)
+    return functools.partial(
+        parse_input_to_recipe, input, client, "claude-benchmark", SYSTEM_PROMPT, on_progress=lambda field, value: None
+    )
+
+
+@benchmark(f"Recipe.model_validate_json.corpus_{CORPUS_SIZE}", number=1)
+def validate_corpus(fixtures: Path):
+    recipe = sample_recipe()
+    rng = random.Random(0)
+    corpus = [
+        recipe.model_copy(update={
+            "title": f"{recipe.title} {i}",
+            "servings": rng.randint(1, 12),
+            "ingredients": rng.sample(recipe.ingredients, rng.randint(3, len(recipe.ingredients))),
+        }).model_dump_json()
+        for i in range(CORPUS_SIZE)
+    ]
+    return lambda: [Recipe.model_validate_json(data) for data in corpus]
+
+
+@benchmark("shopping_list.plan_500_of_5000", number=20)
+def shopping(fixtures: Path):
+    recipe = sample_recipe()
+    rng = random.Random(0)
+    index = ShoppingIndex()
+    for i in range(5000):
+        index.update(f"recipe-{i}", recipe.model_copy(update={
+            "servings": rng.randint(1, 12),
+            "ingredients": rng.sample(recipe.ingredients, rng.randint(3, len(recipe.ingredients))),
+        }))
+    plan = [(f"recipe-{rng.randrange(5000)}", rng.randint(2, 40)) for _ in range(500)]
+    return lambda: index.shopping_list(plan)
+
+
+@benchmark("render_recipe", number=50)
+def render(fixtures: Path):
+    recipe = sample_recipe()
+    return lambda: to_xml(render_recipe(recipe))
+
+
+@benchmark("format_duration.1000", number=20)
+def durations(fixtures: Path):
+    deltas = [timedelta(seconds=seconds) for seconds in range(0, 86_400, 87)][:1000]
+    return lambda: [format_duration(delta) for delta in deltas]
+
+
+def run(selected: list[str]) -> dict[str, dict]:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        fixtures = Path(directory)
+        for name in selected:
+            number, setup = BENCHMARKS[name]
+            fn = setup(fixtures)
+            if fn is None:
+                print(f"{name:45} skipped")
+                continue
+            fn()
+            timings = [t / number for t in timeit.repeat(fn, number=number, repeat=REPEAT)]
+            results[name] = {"seconds": min(timings), "median": statistics.median(timings), "number": number}
+            print(f"{name:45} {min(timings) * 1000:10.3f} ms")
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Names of the benchmarks that are slower than the baseline by more than the tolerance."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["seconds"] / baseline[name]["seconds"]
+        marker = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{name:45} {ratio:6.2f}x baseline {marker}")
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, default=BENCHMARK_DIR / "results.json")
+    parser.add_argument("--baseline", type=Path, default=BENCHMARK_DIR / "baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("names", nargs="*", help="Run only benchmarks whose name contains one of these")
+    args = parser.parse_args()
+    # The fixtures trigger the same warning on every call, which would drown the results.
+    logging.disable(logging.WARNING)
+
+    selected = [name for name in BENCHMARKS if not args.names or any(part in name for part in args.names)]
+    results = run(selected)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "benchmarks": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text())["benchmarks"] if args.baseline.exists() else {}
+        args.baseline.write_text(json.dumps({**report, "benchmarks": {**baseline, **results}}, indent=2) + "\n")
+        print(f"baseline updated in {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}, run with --update-baseline to create one")
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text())["benchmarks"], args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Parse many sources at once through the Anthropic Message Batches API."""
+
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from .cache import ParseCache
+from .extract import DEFAULT_TOKEN_BUDGET
+from .images import ImageOptions
+from .parser import (
+    DEFAULT_MAX_PAYLOAD_BYTES,
+    TokenUsage,
+    _build_request,
+    _message_to_recipe,
+    load_system_prompt,
+    source_to_input,
+)
+from .store import RecipeStore
+from .utils import atomic_write
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+
+    from .fetch import Fetcher
+
+logger = logging.getLogger(__name__)
+
+# Limits of a single message batch, larger jobs are split into several batches.
+MAX_BATCH_REQUESTS = 100_000
+MAX_BATCH_BYTES = 256 * 1024 * 1024
+
+# Collected results are written to the manifest in steps, not after every result.
+SAVE_INTERVAL = 100
+
+
+class BatchEntry(BaseModel):
+    """State of a single source in a message batch."""
+
+    source: str
+    cache_key: str | None = None
+    recipe_path: Path | None = None
+    error: str | None = None
+
+
+class BatchManifest(BaseModel):
+    """Local record of a batch job so that an interrupted run can be resumed."""
+
+    model_name: str
+    batch_id: str | None = None
+    entries: dict[str, BatchEntry] = {}
+
+    @classmethod
+    def load(cls, path: Path, model_name: str) -> "BatchManifest":
+        """Load the manifest or start a new one if it does not exist.
+
+        Raises ValueError when the manifest was created for another model.
+        """
+        if not path.exists():
+            return cls(model_name=model_name)
+        manifest = cls.model_validate_json(path.read_text())
+        if manifest.model_name != model_name:
+            raise ValueError(
+                f"manifest {path} was created for model {manifest.model_name}, not {model_name}; "
+                "finish it with that model or use another manifest"
+            )
+        return manifest
+
+    def save(self, path: Path) -> None:
+        """Write the manifest atomically."""
+        atomic_write(path, self.model_dump_json(indent=2))
+
+    def add_sources(self, sources: list[str]) -> None:
+        """Register sources that are not part of the manifest yet."""
+        for source in sources:
+            self.entries.setdefault(custom_id(source), BatchEntry(source=source))
+
+    def pending(self) -> dict[str, BatchEntry]:
+        """Entries that do not have a recipe yet."""
+        return {cid: entry for cid, entry in self.entries.items() if entry.recipe_path is None}
+
+
+def custom_id(source: str) -> str:
+    """Stable batch request ID for a source."""
+    return "recipe-" + hashlib.sha256(source.encode()).hexdigest()[:32]
+
+
+def submit_batch(
+    client: "Anthropic",
+    manifest: BatchManifest,
+    system_path: Path,
+    store: RecipeStore,
+    cache: ParseCache | None = None,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    fetcher: "Fetcher | None" = None,
+    image_options: ImageOptions | None = None,
+    max_payload_bytes: int | None = DEFAULT_MAX_PAYLOAD_BYTES,
+    attempted: set[str] | None = None,
+    deferred: dict[str, tuple[dict, int]] | None = None,
+) -> str | None:
+    """Submit pending sources as one message batch, as many as fit in the batch limits.
+
+    Sources that are already in the parse cache are stored directly and are not
+    submitted. Sources in `attempted` are skipped, and every source that is loaded is
+    added to it, also when loading fails. The request that no longer fits in the
+    batch is kept in `deferred` with its size and submitted first by the next call,
+    so its source is not loaded again. Returns the batch ID or None when nothing had
+    to be submitted.
+    """
+    system_prompt = load_system_prompt(system_path)
+    attempted = set() if attempted is None else attempted
+    deferred = {} if deferred is None else deferred
+
+    def build() -> Iterator[tuple[str, dict, int]]:
+        while deferred:
+            cid = next(iter(deferred))
+            yield cid, *deferred.pop(cid)
+        for cid, entry in manifest.pending().items():
+            if cid in attempted:
+                continue
+            attempted.add(cid)
+            try:
+                input = source_to_input(entry.source, token_budget, fetcher, image_options, max_payload_bytes)
+            except Exception as e:
+                entry.error = f"{type(e).__name__}: {e}"
+                continue
+
+            if input.recipe is not None:
+                entry.recipe_path = store.put(input.recipe)
+                entry.error = None
+                continue
+
+            if cache is not None:
+                entry.cache_key = ParseCache.key(input.data, input.file_type, system_prompt, manifest.model_name)
+                if (recipe := cache.get(entry.cache_key)) is not None:
+                    entry.recipe_path = store.put(recipe)
+                    entry.error = None
+                    continue
+
+            request = {"custom_id": cid, "params": _build_request(input, manifest.model_name, system_prompt)}
+            request_size = len(json.dumps(request))
+            if request_size > MAX_BATCH_BYTES:
+                entry.error = f"request of {request_size} bytes exceeds the batch limit of {MAX_BATCH_BYTES} bytes"
+                continue
+            yield cid, request, request_size
+
+    requests = []
+    size = 0
+    for cid, request, request_size in build():
+        if len(requests) == MAX_BATCH_REQUESTS or size + request_size > MAX_BATCH_BYTES:
+            deferred[cid] = (request, request_size)
+            break
+        requests.append(request)
+        size += request_size
+
+    if not requests:
+        return None
+
+    batch = client.messages.batches.create(requests=requests)
+    logger.info(f"submitted batch {batch.id} with {len(requests)} requests")
+    return batch.id
+
+
+def wait_for_batch(client: "Anthropic", batch_id: str, poll_interval: float) -> None:
+    """Block until the batch has finished processing."""
+    while True:
+        batch = client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        logger.info(
+            f"batch {batch_id} is {batch.processing_status}: {counts.processing} processing, "
+            f"{counts.succeeded} succeeded, {counts.errored} errored"
+        )
+        if batch.processing_status == "ended":
+            return
+        time.sleep(poll_interval)
+
+
+def collect_results(
+    client: "Anthropic",
+    manifest: BatchManifest,
+    manifest_path: Path,
+    store: RecipeStore,
+    cache: ParseCache | None = None,
+    usage: TokenUsage | None = None,
+) -> None:
+    """Store the recipes of a finished batch and record the outcome per source.
+
+    The manifest is saved every SAVE_INTERVAL recipes and when collecting stops
+    early, so an interrupted run does not store the same recipes again.
+    """
+    stored = 0
+    try:
+        for response in client.messages.batches.results(manifest.batch_id):
+            entry = manifest.entries.get(response.custom_id)
+            if entry is None or entry.recipe_path is not None:
+                continue
+
+            result = response.result
+            if result.type != "succeeded":
+                entry.error = f"batch request {result.type}"
+                continue
+
+            if usage is not None:
+                usage.add(result.message.usage)
+
+            try:
+                recipe = _message_to_recipe(result.message)
+            except Exception as e:
+                entry.error = f"{type(e).__name__}: {e}"
+                continue
+
+            entry.recipe_path = store.put(recipe)
+            entry.error = None
+            if cache is not None and entry.cache_key is not None:
+                cache.put(entry.cache_key, recipe)
+            stored += 1
+            if stored % SAVE_INTERVAL == 0:
+                manifest.save(manifest_path)
+    except BaseException:
+        manifest.save(manifest_path)
+        raise
+
+    # The batch is fully collected, a next run resubmits whatever is still pending.
+    manifest.batch_id = None
+    manifest.save(manifest_path)
+
+
+def run_batch(
+    client: "Anthropic",
+    sources: list[str],
+    manifest_path: Path,
+    model_name: str,
+    system_path: Path,
+    store: RecipeStore,
+    cache: ParseCache | None = None,
+    poll_interval: float = 60.0,
+    usage: TokenUsage | None = None,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    fetcher: "Fetcher | None" = None,
+    image_options: ImageOptions | None = None,
+    max_payload_bytes: int | None = DEFAULT_MAX_PAYLOAD_BYTES,
+) -> BatchManifest:
+    """Submit, wait for and collect message batches, resuming from the manifest.
+
+    Sources that do not fit in the limits of one batch are submitted in the next
+    batch once the previous one is collected.
+    """
+    manifest = BatchManifest.load(manifest_path, model_name)
+    manifest.add_sources(sources)
+
+    if manifest.batch_id is not None:
+        logger.info(f"resuming batch {manifest.batch_id}")
+
+    # Sources are submitted once per run, a failed request is retried by the next run.
+    attempted: set[str] = set()
+    deferred: dict[str, tuple[dict, int]] = {}
+    while True:
+        if manifest.batch_id is None:
+            manifest.batch_id = submit_batch(
+                client,
+                manifest,
+                system_path,
+                store,
+                cache,
+                token_budget,
+                fetcher,
+                image_options,
+                max_payload_bytes,
+                attempted,
+                deferred,
+            )
+            manifest.save(manifest_path)
+        if manifest.batch_id is None:
+            return manifest
+
+        wait_for_batch(client, manifest.batch_id, poll_interval)
+        collect_results(client, manifest, manifest_path, store, cache, usage)
@@ -0,0 +1,110 @@
+"""On-disk cache of parsed recipes keyed by everything that goes into a parse."""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from .models import Recipe
+from .utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ParseCache:
+    """Content-addressed store of recipes with size and age based eviction."""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_size: int = 256 * 1024 * 1024,
+        max_age: timedelta = timedelta(days=30),
+    ):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+
+    @staticmethod
+    def key(data: str, file_type: str, system_prompt: str, model_name: str) -> str:
+        """Hash the source data, prompt, model and recipe schema into a cache key."""
+        schema = _recipe_schema()
+        digest = hashlib.sha256()
+        for part in (file_type, data, system_prompt, model_name, schema):
+            # Prefix every part with its length so different splits never collide.
+            digest.update(len(part).to_bytes(8, "big"))
+            # Encode in chunks so a large base64 payload is not copied as a whole.
+            for start in range(0, len(part), HASH_CHUNK_SIZE):
+                digest.update(part[start:start + HASH_CHUNK_SIZE].encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Recipe | None:
+        """Return the cached recipe or None on a miss or expired entry."""
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        if time.time() - stat.st_mtime > self.max_age.total_seconds():
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            recipe = Recipe.model_validate_json(path.read_bytes())
+        except ValidationError:
+            logger.warning(f"discarding invalid cache entry {key}")
+            path.unlink(missing_ok=True)
+            return None
+
+        # Refresh the modification time so eviction drops the least recently used entries.
+        os.utime(path)
+        return recipe
+
+    def put(self, key: str, recipe: Recipe) -> None:
+        """Store a recipe under the given key."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, recipe.model_dump_json())
+
+    def evict(self) -> int:
+        """Remove expired entries and the oldest entries above the size limit."""
+        if not self.cache_dir.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.cache_dir.glob("*/*.json"):
+            stat = path.stat()
+            if now - stat.st_mtime > self.max_age.total_seconds():
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            removed += 1
+
+        logger.info(f"evicted {removed} cache entries")
+        return removed
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+
+@functools.cache
+def _recipe_schema() -> str:
+    return json.dumps(Recipe.model_json_schema(), sort_keys=True)
@@ -1,23 +1,32 @@
 """Command line interface for recipe parser."""
 
+import functools
+import logging
+from collections.abc import Callable, Iterable
+from datetime import timedelta
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import typer
-from anthropic import Anthropic
-from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import HttpUrl, ValidationError, SecretStr
+from pydantic import BaseModel, HttpUrl, ValidationError
 
-from recipe_parser.parser import parse_input_to_recipe, source_to_input
-from recipe_parser.utils import format_fn
+from recipe_parser.splitter import DEFAULT_HEADING_PATTERN, iter_lines, split_book, write_chunks
 
+# Commands import the modules they use, so `--help` and quick commands start without
+# the Anthropic SDK, httpx, BeautifulSoup, pydantic-settings and the recipe models.
+if TYPE_CHECKING:
+    from anthropic import Anthropic, AsyncAnthropic
 
-class Settings(BaseSettings):
-    """Settings for the recipe parser."""
-
-    api_key: SecretStr
-    claude_model_name: str
-
-    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
+    from recipe_parser.cache import ParseCache
+    from recipe_parser.dedup import DedupIndex
+    from recipe_parser.fetch import Fetcher
+    from recipe_parser.images import ImageOptions
+    from recipe_parser.models import Recipe
+    from recipe_parser.parser import Base64Input, TokenUsage
+    from recipe_parser.profiling import Profiler
+    from recipe_parser.settings import Settings
+    from recipe_parser.store import RecipeStore
+    from recipe_parser.sync import SourceState
 
 
 def validate_url(url: str) -> bool:
@@ -40,53 +49,872 @@ def source_callback(value: str) -> str:
     return value
 
 
+class SourceResult(BaseModel):
+    """Outcome of parsing a single source in a batch."""
+
+    source: str
+    recipe_path: Path | None = None
+    slug: str | None = None
+    error: str | None = None
+    duplicate_of: str | None = None
+    unchanged: bool = False
+
+
+def load_settings() -> "Settings":
+    """Read the settings from the environment and `.env`."""
+    from recipe_parser.settings import Settings
+
+    return Settings()
+
+
+def make_client(settings: "Settings") -> "Anthropic":
+    """Create the Anthropic client."""
+    from anthropic import Anthropic
+
+    return Anthropic(api_key=settings.api_key.get_secret_value(), base_url=settings.anthropic_base_url)
+
+
+def make_async_client(settings: "Settings") -> "AsyncAnthropic":
+    """Create the Anthropic client for concurrent requests."""
+    from anthropic import AsyncAnthropic
+
+    return AsyncAnthropic(api_key=settings.api_key.get_secret_value(), base_url=settings.anthropic_base_url)
+
+
+def make_cache(settings: "Settings", no_cache: bool) -> "ParseCache | None":
+    """Create the parse cache unless it is disabled."""
+    if no_cache:
+        return None
+    from recipe_parser.cache import ParseCache
+
+    return ParseCache(
+        cache_dir=settings.cache_dir,
+        max_size=settings.cache_max_size_mb * 1024 * 1024,
+        max_age=timedelta(days=settings.cache_max_age_days),
+    )
+
+
+def make_fetcher(settings: "Settings", no_cache: bool) -> "Fetcher":
+    """Create the shared HTTP fetcher, the HTTP cache follows the parse cache flag."""
+    from recipe_parser.fetch import Fetcher
+
+    return Fetcher(
+        cache_dir=None if no_cache else settings.http_cache_dir,
+        per_host_limit=settings.fetch_per_host_limit,
+        http2=settings.http2,
+    )
+
+
+def make_image_options(settings: "Settings") -> "ImageOptions":
+    """Image preprocessing options from the settings."""
+    from recipe_parser.images import ImageOptions
+
+    return ImageOptions(
+        max_long_edge=settings.image_max_long_edge,
+        quality=settings.image_quality,
+        crop=settings.image_crop,
+    )
+
+
+def echo_progress(field: str, value) -> None:
+    """Print the parts of a recipe that have arrived while the response streams in."""
+    if field == "title":
+        typer.echo(value)
+    elif field == "ingredient":
+        quantity = value.get("quantity")
+        amount = f"{quantity:g}" if isinstance(quantity, int | float) else ""
+        typer.echo(f"  {amount} {value.get('unit', '')} {value.get('name', '')}")
+
+
+def read_sources(lines: typer.FileText) -> list[str]:
+    """Read one source per line, skipping blank lines and comments."""
+    sources = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            sources.append(line)
+    return sources
+
+
+# Options shared between commands.
+SYSTEM_PROMPT_OPTION = typer.Option(
+    "recipe-prompt.txt",
+    "--system-prompt",
+    "-s",
+    help="Path to system prompt file",
+    exists=True,
+    file_okay=True,
+    dir_okay=False,
+)
+OUTPUT_DIR_OPTION = typer.Option(
+    Path("./recipes"),
+    "--output-dir",
+    "-o",
+    help="Directory, or .db/.sqlite file, to save parsed recipes",
+)
+CONCURRENCY_OPTION = typer.Option(
+    8,
+    "--concurrency",
+    "-c",
+    min=1,
+    help="Maximum number of recipes parsed at the same time",
+)
+NO_CACHE_OPTION = typer.Option(False, "--no-cache", help="Do not read from or write to the parse cache")
+REFRESH_OPTION = typer.Option(False, "--refresh", help="Ignore cached recipes but store the new results")
+PROFILE_OPTION = typer.Option(
+    False, "--profile", help="Print the time per stage, payload sizes, tokens and estimated cost"
+)
+HEDGE_OPTION = typer.Option(
+    False, "--hedge", help="Send a duplicate request when one is slower than 95% of the recent requests"
+)
+SIMILARITY_OPTION = typer.Option(
+    None,
+    "--similarity",
+    min=0.0,
+    max=1.0,
+    help="Text similarity from which a source is a duplicate, 0.8 by default. Applies to text only, "
+    "photos are duplicates when their perceptual hashes differ in at most 6 of 64 bits",
+)
+
+
+def report_results(
+    results: list[SourceResult], usage: "TokenUsage", profiler: "Profiler | None" = None, noun: str = "sources"
+) -> None:
+    """Print the summary of a run, with the profile if given, and exit with 1 when a source failed."""
+    # A duplicate without a recipe lost its source, it counts as a failure.
+    failures = [result for result in results if result.error is not None or (result.duplicate_of and not result.slug)]
+    duplicates = [result for result in results if result.duplicate_of is not None and result.slug]
+    typer.echo(f"Parsed {len(results) - len(failures) - len(duplicates)}/{len(results)} {noun}.")
+    if duplicates:
+        typer.echo(f"Skipped {len(duplicates)} near-duplicate sources.")
+    typer.echo(f"Usage: {usage.summary()}")
+    if profiler is not None:
+        typer.echo(profiler.summary())
+    if failures:
+        raise typer.Exit(code=1)
+
+
 app = typer.Typer()
 
 
+@app.callback()
+def options(
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Log progress, extraction and token details"),
+) -> None:
+    """Parse recipes from URLs and files with Claude."""
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+
 @app.command()
 def parse(
     source: str = typer.Argument(
         ..., help="URL or path to file containing recipe"
     ),
-    system_prompt: Path = typer.Option(
-        "recipe-prompt.txt",
-        "--system-prompt",
-        "-s",
-        help="Path to system prompt file",
-        exists=True,
-        file_okay=True,
+    system_prompt: Path = SYSTEM_PROMPT_OPTION,
+    output_dir: Path = OUTPUT_DIR_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
+    refresh: bool = REFRESH_OPTION,
+    profile: bool = PROFILE_OPTION,
+) -> None:
+    """Parse a recipe from a URL or file."""
+    from recipe_parser.parser import TokenUsage, parse_input_to_recipe, source_to_input
+    from recipe_parser.profiling import Profiler, stage
+    from recipe_parser.store import open_store
+
+    settings = load_settings()
+    cache = make_cache(settings, no_cache)
+    profiler = Profiler(settings.profile_log)
+
+    with profiler.source(source):
+        # Parse source to Claude content
+        fetcher = make_fetcher(settings, no_cache)
+        try:
+            input = source_to_input(
+                source,
+                token_budget=settings.token_budget,
+                fetcher=fetcher,
+                image_options=make_image_options(settings),
+                max_payload_bytes=settings.max_payload_mb * 2**20,
+            )
+        finally:
+            fetcher.close()
+
+        store = open_store(output_dir)
+        try:
+            client = make_client(settings)
+            usage = TokenUsage()
+
+            recipe = parse_input_to_recipe(
+                input=input,
+                client=client,
+                model_name=settings.claude_model_name,
+                system_path=system_prompt,
+                cache=cache,
+                refresh=refresh,
+                usage=usage,
+                deadline=settings.request_deadline_seconds,
+                on_progress=echo_progress,
+            )
+
+            with stage("store"):
+                recipe_path = store.put(recipe)
+        finally:
+            store.close()
+
+    typer.echo(f"Saved {recipe_path}")
+    typer.echo(f"Usage: {usage.summary()}")
+    if profile:
+        typer.echo(profiler.summary())
+
+    if cache is not None:
+        cache.evict()
+
+
+@app.command()
+def batch(
+    sources_file: typer.FileText = typer.Argument(
+        "-", help="File with one URL or path per line, use '-' to read from stdin"
+    ),
+    system_prompt: Path = SYSTEM_PROMPT_OPTION,
+    output_dir: Path = OUTPUT_DIR_OPTION,
+    concurrency: int = CONCURRENCY_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
+    refresh: bool = REFRESH_OPTION,
+    profile: bool = PROFILE_OPTION,
+    hedge: bool = HEDGE_OPTION,
+    dedup: bool = typer.Option(
+        True, "--dedup/--no-dedup", help="Skip sources that are near-duplicates of already parsed sources"
+    ),
+    similarity: float | None = SIMILARITY_OPTION,
+) -> None:
+    """Parse many recipes concurrently from a list of URLs or files."""
+    import asyncio
+
+    from recipe_parser.dedup import DEFAULT_THRESHOLD, DedupIndex
+    from recipe_parser.parser import TokenUsage
+    from recipe_parser.profiling import Profiler
+    from recipe_parser.store import open_store
+
+    settings = load_settings()
+    cache = make_cache(settings, no_cache)
+    sources = read_sources(sources_file)
+
+    store = open_store(output_dir)
+
+    usage = TokenUsage()
+    profiler = Profiler(settings.profile_log)
+    try:
+        results = asyncio.run(
+            _parse_sources(
+                sources=sources,
+                settings=settings,
+                system_prompt=system_prompt,
+                store=store,
+                concurrency=concurrency,
+                cache=cache,
+                refresh=refresh,
+                usage=usage,
+                profiler=profiler,
+                hedge=hedge,
+                dedup=DedupIndex.load(store.index_dir, DEFAULT_THRESHOLD if similarity is None else similarity) if dedup else None,
+            )
+        )
+    finally:
+        store.close()
+
+    if cache is not None:
+        cache.evict()
+
+    report_results(results, usage, profiler if profile else None)
+
+
+async def _parse_sources(
+    sources: list[str],
+    settings: "Settings",
+    system_prompt: Path,
+    store: "RecipeStore",
+    concurrency: int,
+    cache: "ParseCache | None" = None,
+    refresh: bool = False,
+    usage: "TokenUsage | None" = None,
+    profiler: "Profiler | None" = None,
+    hedge: bool = False,
+    dedup: "DedupIndex | None" = None,
+) -> list[SourceResult]:
+    """Parse sources concurrently and save each recipe as soon as it is done."""
+    from recipe_parser.parser import source_to_input
+
+    fetcher = make_fetcher(settings, no_cache=cache is None)
+    image_options = make_image_options(settings)
+
+    def load(source: str) -> "Base64Input":
+        source_callback(source)
+        return source_to_input(
+            source,
+            settings.token_budget,
+            fetcher,
+            image_options,
+            settings.max_payload_mb * 2**20,
+        )
+
+    jobs = ((source, functools.partial(load, source)) for source in sources)
+    try:
+        return await _run_jobs(
+            jobs,
+            settings,
+            system_prompt,
+            store,
+            concurrency,
+            cache,
+            refresh,
+            usage,
+            profiler=profiler,
+            hedge=hedge,
+            dedup=dedup,
+        )
+    finally:
+        fetcher.close()
+
+
+async def _run_jobs(
+    jobs: Iterable[tuple[str, Callable[[], "Base64Input | None"]]],
+    settings: "Settings",
+    system_prompt: Path,
+    store: "RecipeStore",
+    concurrency: int,
+    cache: "ParseCache | None" = None,
+    refresh: bool = False,
+    usage: "TokenUsage | None" = None,
+    finalize: Callable[[str, "Recipe"], "Recipe"] | None = None,
+    profiler: "Profiler | None" = None,
+    hedge: bool = False,
+    dedup: "DedupIndex | None" = None,
+    replaces: dict[str, str] | None = None,
+) -> list[SourceResult]:
+    """Load and parse inputs concurrently and save each recipe as soon as it is done.
+
+    Jobs are pairs of a label and a function that loads the input, which runs in a
+    thread. A load that returns None leaves the source unchanged and nothing is
+    parsed. Jobs are pulled from the iterable only when a slot is free, so a
+    generator is never read further ahead than the concurrency limit. With `hedge`,
+    requests slower than 95% of the recent ones are sent a second time. With a dedup
+    index, inputs that are near-duplicates of indexed sources are not parsed and
+    link to the recipe of the original instead. A duplicate of a source that is still
+    being parsed waits for it, and is parsed itself when the original fails.
+    Recipes get a new slug when theirs is taken, unless `replaces` maps the label
+    to the slug of an older version of the recipe.
+    """
+    import asyncio
+
+    from recipe_parser.dedup import input_signature
+    from recipe_parser.parser import aparse_input_to_recipe
+    from recipe_parser.profiling import Profiler, stage
+    from recipe_parser.streaming import LatencyTracker
+
+    client = make_async_client(settings)
+
+    profiler = profiler or Profiler()
+    latencies = LatencyTracker() if hedge else None
+    # Slug of every source that is being parsed, or None when it fails.
+    parsing: dict[str, asyncio.Future[str | None]] = {}
+
+    async def run_job(label: str, load: Callable[[], "Base64Input | None"]) -> SourceResult:
+        # Each job runs in a task of its own, so the profile does not leak into other jobs.
+        with profiler.source(label) as profile:
+            signature = None
+            try:
+                input = await asyncio.to_thread(load)
+                if input is None:
+                    return SourceResult(source=label, unchanged=True)
+                if dedup is not None:
+                    with stage("dedup"):
+                        signature = await asyncio.to_thread(input_signature, input)
+                # Text too short to tell copies apart has no signature and is always parsed.
+                if signature is not None:
+                    while (match := dedup.find(label, signature)) is not None:
+                        if match.slug is None and match.duplicate_of in parsing:
+                            match.slug = await asyncio.shield(parsing[match.duplicate_of])
+                            if match.slug is None:
+                                # The original failed and left the index, look for another one.
+                                continue
+                        if match.slug is None:
+                            # The original was never parsed, e.g. an interrupted run.
+                            break
+                        dedup.add(label, signature, match.slug)
+                        return SourceResult(
+                            source=label,
+                            recipe_path=store.location(match.slug),
+                            slug=match.slug,
+                            duplicate_of=match.duplicate_of,
+                        )
+                    dedup.add(label, signature)
+                    parsing[label] = asyncio.get_running_loop().create_future()
+                recipe = await aparse_input_to_recipe(
+                    input=input,
+                    client=client,
+                    model_name=settings.claude_model_name,
+                    system_path=system_prompt,
+                    cache=cache,
+                    refresh=refresh,
+                    usage=usage,
+                    deadline=settings.request_deadline_seconds,
+                    hedge=latencies,
+                )
+                if finalize is not None:
+                    recipe = finalize(label, recipe)
+                with stage("store"):
+                    slug = await asyncio.to_thread(store.add, recipe, (replaces or {}).get(label))
+                recipe_path = store.location(slug)
+                if signature is not None:
+                    dedup.add(label, signature, slug)
+                if (future := parsing.pop(label, None)) is not None:
+                    future.set_result(slug)
+            except Exception as e:
+                if signature is not None:
+                    dedup.remove(label)
+                if (future := parsing.pop(label, None)) is not None:
+                    future.set_result(None)
+                profile.error = f"{type(e).__name__}: {e}"
+                return SourceResult(source=label, error=profile.error)
+        return SourceResult(source=label, recipe_path=recipe_path, slug=slug)
+
+    jobs = iter(jobs)
+    pending = set()
+    results = []
+    async with client:
+        while True:
+            while len(pending) < concurrency and (job := next(jobs, None)) is not None:
+                pending.add(asyncio.create_task(run_job(*job)))
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result.duplicate_of is not None:
+                    typer.echo(f"DUP  {result.source} = {result.duplicate_of}")
+                elif result.error is not None:
+                    typer.echo(f"FAIL {result.source}: {result.error}", err=True)
+                elif not result.unchanged:
+                    typer.echo(f"OK   {result.source} -> {result.recipe_path}")
+                results.append(result)
+
+    return results
+
+
+@app.command()
+def sync(
+    sources_file: typer.FileText = typer.Argument(
+        ..., help="File with one URL, file or directory per line, use '-' to read from stdin"
+    ),
+    system_prompt: Path = SYSTEM_PROMPT_OPTION,
+    output_dir: Path = OUTPUT_DIR_OPTION,
+    manifest_path: Path | None = typer.Option(
+        None, "--manifest", "-m", help="Sync manifest, defaults to sync-manifest.json in the index directory of the store"
+    ),
+    concurrency: int = typer.Option(
+        8,
+        "--concurrency",
+        "-c",
+        min=1,
+        help="Maximum number of sources checked or parsed at the same time",
+    ),
+    no_cache: bool = NO_CACHE_OPTION,
+    force: bool = typer.Option(
+        False, "--force", help="Parse every source again, ignoring the manifest and cached recipes"
+    ),
+) -> None:
+    """Parse the sources that are new or changed since the last sync and remove the recipes of unlisted sources."""
+    import asyncio
+
+    from recipe_parser.parser import TokenUsage, load_system_prompt, source_to_input
+    from recipe_parser.store import open_store
+    from recipe_parser.sync import MANIFEST_NAME, SyncManifest, expand_sources, load_source, parse_version
+
+    settings = load_settings()
+    cache = make_cache(settings, no_cache)
+    sources = expand_sources(read_sources(sources_file))
+
+    store = open_store(output_dir)
+    manifest_path = manifest_path or store.index_dir / MANIFEST_NAME
+    manifest = SyncManifest.load(manifest_path)
+    synced_slugs = manifest.slugs()
+    version = parse_version(settings.claude_model_name, load_system_prompt(system_prompt))
+
+    fetcher = make_fetcher(settings, no_cache)
+    image_options = make_image_options(settings)
+    outputs = set(store.versions())
+    # Checked sources without their bodies, the manifest is updated from them once they are parsed.
+    states: dict[str, "SourceState"] = {}
+
+    def load_input(source: str, body: bytes | None) -> "Base64Input":
+        return source_to_input(
+            source,
+            settings.token_budget,
+            fetcher,
+            image_options,
+            settings.max_payload_mb * 2**20,
+            body=body,
+        )
+
+    def load(source: str) -> "Base64Input | None":
+        # Checking and loading run in the slot of the job, so only as many bodies as parses are held at a time.
+        states[source], input = load_source(
+            source, manifest.entries.get(source), version, outputs, fetcher, load_input, force
+        )
+        return input
+
+    usage = TokenUsage()
+    try:
+        results = asyncio.run(
+            _run_jobs(
+                ((source, functools.partial(load, source)) for source in sources),
+                settings,
+                system_prompt,
+                store,
+                concurrency,
+                cache,
+                refresh=force,
+                usage=usage,
+                replaces={source: entry.slug for source, entry in manifest.entries.items()},
+            )
+        )
+    finally:
+        fetcher.close()
+
+    failures = [result for result in results if result.error is not None]
+    for result in results:
+        if result.error is None:
+            manifest.record(states[result.source], version, result.slug, result.recipe_path)
+
+    # Sources that failed keep their entry and recipe, only recipes no synced source points to are removed.
+    removed = manifest.prune(sources)
+    orphaned = sorted(synced_slugs - manifest.slugs())
+    for slug in orphaned:
+        store.delete(slug)
+        typer.echo(f"DEL  {store.location(slug)}")
+    manifest.save(manifest_path)
+    store.close()
+
+    if cache is not None:
+        cache.evict()
+
+    unchanged = sum(result.unchanged for result in results)
+    parsed = len(results) - unchanged - len(failures)
+    typer.echo(
+        f"Synced {len(sources)} sources: {parsed} parsed, {unchanged} unchanged, "
+        f"{len(failures)} failed, {len(removed)} removed ({len(orphaned)} recipes deleted)."
+    )
+    if parsed:
+        typer.echo(f"Usage: {usage.summary()}")
+    if failures:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def message_batch(
+    sources_file: typer.FileText = typer.Argument(
+        "-", help="File with one URL or path per line, use '-' to read from stdin"
+    ),
+    system_prompt: Path = SYSTEM_PROMPT_OPTION,
+    output_dir: Path = OUTPUT_DIR_OPTION,
+    manifest: Path = typer.Option(
+        Path("batch-manifest.json"),
+        "--manifest",
+        "-m",
+        help="Job manifest used to resume an interrupted batch",
         dir_okay=False,
     ),
-    output_dir: Path = typer.Option(
-        Path("./recipes"),
-        "--output-dir",
-        "-o",
-        help="Directory to save parsed recipes",
+    poll_interval: float = typer.Option(
+        60.0, "--poll-interval", min=0.0, help="Seconds between batch status checks"
+    ),
+    no_cache: bool = NO_CACHE_OPTION,
+) -> None:
+    """Parse many recipes in one Message Batch, resuming from the manifest."""
+    from recipe_parser.batches import run_batch
+    from recipe_parser.parser import TokenUsage
+    from recipe_parser.store import open_store
+
+    settings = load_settings()
+    cache = make_cache(settings, no_cache)
+    sources = read_sources(sources_file)
+
+    store = open_store(output_dir)
+
+    client = make_client(settings)
+
+    fetcher = make_fetcher(settings, no_cache)
+    usage = TokenUsage()
+    try:
+        result = run_batch(
+            client=client,
+            sources=sources,
+            manifest_path=manifest,
+            model_name=settings.claude_model_name,
+            system_path=system_prompt,
+            store=store,
+            cache=cache,
+            poll_interval=poll_interval,
+            usage=usage,
+            token_budget=settings.token_budget,
+            fetcher=fetcher,
+            image_options=make_image_options(settings),
+            max_payload_bytes=settings.max_payload_mb * 2**20,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--manifest") from None
+    finally:
+        fetcher.close()
+        store.close()
+
+    for entry in result.entries.values():
+        if entry.recipe_path is not None:
+            typer.echo(f"OK   {entry.source} -> {entry.recipe_path}")
+        else:
+            typer.echo(f"FAIL {entry.source}: {entry.error or 'not parsed'}", err=True)
+
+    failures = [entry for entry in result.entries.values() if entry.recipe_path is None]
+    typer.echo(f"Parsed {len(result.entries) - len(failures)}/{len(result.entries)} sources.")
+    typer.echo(f"Usage: {usage.summary()}")
+    if failures:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def cookbook(
+    pdf_path: Path = typer.Argument(
+        ..., help="PDF cookbook to split into recipes", exists=True, file_okay=True, dir_okay=False
+    ),
+    system_prompt: Path = SYSTEM_PROMPT_OPTION,
+    output_dir: Path = OUTPUT_DIR_OPTION,
+    strategy: str = typer.Option(
+        "outline",
+        "--strategy",
+        help="How to find the recipes: 'outline' (bookmarks), 'headings' (ingredient headings) or 'model'",
+    ),
+    book_title: str | None = typer.Option(None, "--title", help="Book title, defaults to the PDF metadata"),
+    author: str | None = typer.Option(None, "--author", help="Book author, defaults to the PDF metadata"),
+    page_offset: int = typer.Option(
+        0, "--page-offset", help="Printed page number minus PDF page number, for BookSource.page"
+    ),
+    concurrency: int = CONCURRENCY_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
+    refresh: bool = REFRESH_OPTION,
+    profile: bool = PROFILE_OPTION,
+    hedge: bool = HEDGE_OPTION,
+) -> None:
+    """Split a PDF cookbook into recipes and parse them concurrently."""
+    import asyncio
+
+    from recipe_parser.models import BookSource
+    from recipe_parser.parser import TokenUsage
+    from recipe_parser.pdf import Cookbook, SplitStrategy
+    from recipe_parser.profiling import Profiler
+    from recipe_parser.store import open_store
+
+    if strategy not in SplitStrategy.__args__:
+        raise typer.BadParameter(f"unknown strategy {strategy}", param_hint="--strategy")
+
+    settings = load_settings()
+    cache = make_cache(settings, no_cache)
+    book = Cookbook(pdf_path)
+
+    client = make_client(settings)
+    ranges = book.find_ranges(strategy, client=client, model_name=settings.claude_model_name)
+    typer.echo(f"Found {len(ranges)} recipes in {pdf_path}.")
+
+    book_title = book_title or book.title
+    author = author or book.author
+    if not (book_title and author):
+        typer.echo("Book title or author unknown, recipes are saved without their source.", err=True)
+
+    labels = {f"{pdf_path} pages {r.start + 1}-{r.end} ({r.title or 'untitled'})": r for r in ranges}
+
+    def add_source(label: str, recipe: "Recipe") -> "Recipe":
+        if not (book_title and author):
+            return recipe
+        page = max(1, labels[label].start + 1 + page_offset)
+        return recipe.model_copy(update={"source": BookSource(title=book_title, author=author, page=page)})
+
+    store = open_store(output_dir)
+
+    usage = TokenUsage()
+    profiler = Profiler(settings.profile_log)
+    try:
+        results = asyncio.run(
+            _run_jobs(
+                ((label, functools.partial(book.range_to_input, r)) for label, r in labels.items()),
+                settings=settings,
+                system_prompt=system_prompt,
+                store=store,
+                concurrency=concurrency,
+                cache=cache,
+                refresh=refresh,
+                usage=usage,
+                finalize=add_source,
+                profiler=profiler,
+                hedge=hedge,
+            )
+        )
+    finally:
+        store.close()
+
+    if cache is not None:
+        cache.evict()
+
+    report_results(results, usage, profiler if profile else None, noun="recipes")
+
+
+@app.command()
+def split(
+    book: Path = typer.Argument(
+        ..., help="Markdown or text book to split into recipes", exists=True, file_okay=True, dir_okay=False
+    ),
+    chunks_dir: Path | None = typer.Option(
+        None,
+        "--chunks-dir",
+        "-d",
+        help="Directory to write one markdown file per recipe, defaults to 'recipes' next to the book",
         file_okay=False,
         dir_okay=True,
     ),
+    heading_pattern: str = typer.Option(
+        DEFAULT_HEADING_PATTERN, "--pattern", help="Regular expression of a recipe heading, group 1 is the title"
+    ),
+    parse_chunks: bool = typer.Option(
+        False, "--parse", help="Parse every recipe with Claude as soon as it is split"
+    ),
+    system_prompt: Path = SYSTEM_PROMPT_OPTION,
+    output_dir: Path = OUTPUT_DIR_OPTION,
+    concurrency: int = CONCURRENCY_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
+    refresh: bool = REFRESH_OPTION,
+    profile: bool = PROFILE_OPTION,
+    hedge: bool = HEDGE_OPTION,
 ) -> None:
-    """Parse a recipe from a URL or file."""
-    settings = Settings()
+    """Split a book into one markdown file per recipe and optionally parse them."""
+    chunks = write_chunks(
+        split_book(iter_lines(book), heading_pattern),
+        chunks_dir or book.parent / "recipes",
+    )
+
+    if not parse_chunks:
+        count = sum(1 for _ in chunks)
+        typer.echo(f"Split {count} recipes into separate files.")
+        return
+
+    import asyncio
+
+    from recipe_parser.parser import TokenUsage
+    from recipe_parser.profiling import Profiler
+    from recipe_parser.store import open_store
+
+    settings = load_settings()
+    cache = make_cache(settings, no_cache)
+    store = open_store(output_dir)
+
+    usage = TokenUsage()
+    profiler = Profiler(settings.profile_log)
+    try:
+        results = asyncio.run(
+            _run_jobs(
+                ((chunk.filename, chunk.to_input) for chunk in chunks),
+                settings=settings,
+                system_prompt=system_prompt,
+                store=store,
+                concurrency=concurrency,
+                cache=cache,
+                refresh=refresh,
+                usage=usage,
+                profiler=profiler,
+                hedge=hedge,
+            )
+        )
+    finally:
+        store.close()
+
+    if cache is not None:
+        cache.evict()
 
-    # Parse source to Claude content
-    input = source_to_input(source)
+    report_results(results, usage, profiler if profile else None, noun="recipes")
 
-    # Create output directory if it doesn't exist
-    output_dir.mkdir(parents=True, exist_ok=True)
 
-    client = Anthropic(api_key=settings.api_key.get_secret_value())
+@app.command("import-recipes")
+def import_recipes(
+    source: Path = typer.Argument(..., help="Directory of recipe JSON files", exists=True, file_okay=False),
+    target: Path = typer.Argument(..., help="Store to import into, a .db/.sqlite file or a directory"),
+    batch_size: int = typer.Option(500, "--batch-size", min=1, help="Recipes written per transaction"),
+) -> None:
+    """Copy a directory of recipe files into a store, keeping the file names as slugs."""
+    from recipe_parser.store import copy_recipes, open_store
+
+    source_store, target_store = open_store(source), open_store(target)
+    count = copy_recipes(source_store, target_store, batch_size)
+    target_store.close()
+    typer.echo(f"Imported {count} recipes into {target}.")
+
+
+@app.command("export-recipes")
+def export_recipes(
+    source: Path = typer.Argument(..., help="Store to export, a .db/.sqlite file or a directory", exists=True),
+    target: Path = typer.Argument(..., help="Directory to write one JSON file per recipe", file_okay=False),
+) -> None:
+    """Write every recipe of a store to a directory of recipe files."""
+    from recipe_parser.store import copy_recipes, open_store
+
+    source_store, target_store = open_store(source), open_store(target)
+    count = copy_recipes(source_store, target_store)
+    source_store.close()
+    typer.echo(f"Exported {count} recipes to {target}.")
+
+
+@app.command("export-site")
+def export_site(
+    source: Path = typer.Argument(..., help="Store to export, a .db/.sqlite file or a directory", exists=True),
+    target: Path = typer.Argument(..., help="Directory of the static site", file_okay=False),
+    workers: int | None = typer.Option(
+        None, "--workers", "-w", min=1, help="Processes that render pages, defaults to the number of CPUs"
+    ),
+    force: bool = typer.Option(False, "--force", help="Render every page, not only the recipes that changed"),
+) -> None:
+    """Prerender every recipe page, an index page and the search data as a static site."""
+    from recipe_parser.site import build_site
+    from recipe_parser.store import open_store
+
+    store = open_store(source)
+    report = build_site(store, target, workers=workers, force=force)
+    store.close()
 
-    recipe = parse_input_to_recipe(
-        input=input,
-        client=client,
-        model_name=settings.claude_model_name,
-        system_path=system_prompt,
+    typer.echo(
+        f"Rendered {report.rendered} pages into {target}, {report.unchanged} unchanged, {report.removed} removed."
     )
+    if report.failed:
+        typer.echo(f"Skipped {len(report.failed)} invalid recipes: {', '.join(report.failed)}", err=True)
+
+
+@app.command()
+def duplicates(
+    output_dir: Path = typer.Option(
+        Path("./recipes"),
+        "--output-dir",
+        "-o",
+        help="Directory, or .db/.sqlite file, whose sources to report on",
+    ),
+    similarity: float | None = SIMILARITY_OPTION,
+) -> None:
+    """Report the parsed sources that are near-duplicates of each other."""
+    from recipe_parser.dedup import DEFAULT_THRESHOLD, DedupIndex
+    from recipe_parser.store import open_store
+
+    store = open_store(output_dir)
+    index = DedupIndex.load(store.index_dir, DEFAULT_THRESHOLD if similarity is None else similarity)
+    store.close()
 
-    # Save recipe to JSON file
-    recipe_path = output_dir / f"{format_fn(recipe.title)}.json"
-    recipe_path.write_text(recipe.model_dump_json())
+    matches = index.duplicates()
+    for match in sorted(matches, key=lambda match: (match.duplicate_of, -match.similarity)):
+        recipe = f" ({match.slug})" if match.slug else ""
+        typer.echo(f"{match.similarity:.2f}  {match.source} = {match.duplicate_of}{recipe}")
+    typer.echo(f"{len(matches)} of {len(index)} sources are near-duplicates.")
 
 
 def main():
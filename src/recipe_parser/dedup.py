@@ -0,0 +1,260 @@
+"""Near-duplicate detection of sources with MinHash signatures and locality sensitive hashing."""
+
+import base64
+import hashlib
+import io
+import logging
+import threading
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+from .images import Image
+from .journal import Journal
+from .parser import Base64Input
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = "dedup.jsonl"
+
+# Word shingles of five words, 128 hash functions split into 16 bands of 8 rows. A
+# pair of texts becomes a candidate when one band is equal, likely from a Jaccard
+# similarity of about (1 / 16) ** (1 / 8) = 0.71 up, and is a duplicate when the
+# estimated similarity reaches the threshold.
+SHINGLE_SIZE = 5
+NUM_HASHES = 128
+BANDS = 16
+DEFAULT_THRESHOLD = 0.8
+
+# Empty pages, error pages and short notes have too few shingles to tell them apart,
+# they would all look like copies of each other. A recipe has far more than this.
+MIN_SHINGLES = 20
+
+# Hashes are (a * x + b) mod a prime just above 2**32, the product of two 32-bit
+# numbers fits in 64 bits.
+PRIME = (1 << 32) + 15
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, 1 << 32, NUM_HASHES, dtype=np.uint64)[:, np.newaxis]
+_B = _rng.integers(0, 1 << 32, NUM_HASHES, dtype=np.uint64)[:, np.newaxis]
+
+# Photos of the same recipe card differ in a few bits of their 64-bit difference hash.
+# With 8 bands of 8 bits, hashes up to 7 bits apart share a band. This is fixed, the
+# threshold of the index is a Jaccard similarity and only applies to text.
+IMAGE_MAX_DISTANCE = 6
+
+
+class Signature(BaseModel):
+    """Compact fingerprint of a source.
+
+    Text has MinHash values, images a difference hash and other files the digest
+    of their content, which only finds exact copies.
+    """
+
+    model_config = ConfigDict(ser_json_bytes="base64", val_json_bytes="base64")
+
+    kind: Literal["text", "image", "exact"]
+    values: bytes
+
+    def bands(self) -> Iterator[bytes]:
+        if self.kind == "exact":
+            yield self.values
+            return
+        count = BANDS if self.kind == "text" else 8
+        size = len(self.values) // count
+        for band in range(count):
+            yield self.values[band * size:(band + 1) * size]
+
+    def similarity(self, other: "Signature") -> float:
+        """Estimated Jaccard similarity for text, share of equal bits for images."""
+        if self.kind != other.kind:
+            return 0.0
+        if self.kind == "text":
+            mine = np.frombuffer(self.values, dtype=np.uint32)
+            theirs = np.frombuffer(other.values, dtype=np.uint32)
+            return float(np.mean(mine == theirs))
+        if self.kind == "image":
+            distance = (int.from_bytes(self.values) ^ int.from_bytes(other.values)).bit_count()
+            return 1 - distance / 64
+        return float(self.values == other.values)
+
+
+class DedupEntry(BaseModel):
+    """A source in the index, and the recipe parsed from it once there is one."""
+
+    source: str
+    signature: Signature | None
+    slug: str | None = None
+
+
+class DuplicateMatch(BaseModel):
+    """A source that is a near-duplicate of an indexed source."""
+
+    source: str
+    duplicate_of: str
+    similarity: float
+    slug: str | None = None
+
+
+def text_signature(text: str) -> Signature | None:
+    """MinHash of the word shingles of a text, so formatting and casing do not matter.
+
+    Returns None for texts with fewer than MIN_SHINGLES distinct shingles.
+    """
+    words = tokenize(text)
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    minhash = ((_A * hashes + _B) % PRIME).min(axis=1)
+    return Signature(kind="text", values=(minhash & 0xFFFFFFFF).astype(np.uint32).tobytes())
+
+
+def image_signature(data: bytes) -> Signature:
+    """Difference hash: whether each pixel is brighter than its right neighbour, at 9x8 pixels."""
+    image = Image.open(io.BytesIO(data)).convert("L").resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return Signature(kind="image", values=np.packbits(bits).tobytes())
+
+
+def input_signature(input: Base64Input) -> Signature | None:
+    """Signature of the Claude input of a source, computed without calling Claude, None for short text."""
+    if input.file_type == "text/plain":
+        return text_signature(input.data)
+    data = base64.b64decode(input.data)
+    if input.file_type.startswith("image/") and Image is not None:
+        try:
+            return image_signature(data)
+        except OSError as e:
+            logger.warning(f"could not hash image: {e}")
+    return Signature(kind="exact", values=hashlib.sha256(data).digest())
+
+
+class DedupIndex:
+    """Signatures of sources with band buckets, kept in an append-only journal.
+
+    Sources are added before they are parsed, so a copy that comes up while the
+    original is still being parsed is found too. Skipped copies are added as well,
+    with the slug of the original, so the report lists them.
+    """
+
+    def __init__(self, index_dir: Path | None = None, threshold: float = DEFAULT_THRESHOLD):
+        self.index_dir = index_dir
+        self.threshold = threshold
+        self._entries: dict[str, DedupEntry] = {}
+        self._buckets: dict[tuple[str, int, bytes], set[str]] = {}
+        self._positions: dict[str, int] = {}
+        self._next_position = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self._entries
+
+    @classmethod
+    def load(cls, index_dir: Path, threshold: float = DEFAULT_THRESHOLD) -> "DedupIndex":
+        """Replay the journal in the index directory, compacting it when most lines are outdated."""
+        index = cls(index_dir, threshold)
+        journal = Journal(index_dir / JOURNAL_NAME)
+        for entry in journal.replay(DedupEntry.model_validate_json):
+            if entry.signature is None:
+                index._remove(entry.source)
+            else:
+                index._add(entry)
+        if journal.is_outdated(len(index)):
+            index.save()
+        return index
+
+    def save(self) -> None:
+        """Rewrite the journal with one line per source."""
+        if self.index_dir is None:
+            return
+        with self._lock:
+            Journal(self.index_dir / JOURNAL_NAME).rewrite(entry.model_dump_json() for entry in self._entries.values())
+
+    def find(self, source: str, signature: Signature) -> DuplicateMatch | None:
+        """The most similar source at or above the threshold, if any.
+
+        An indexed source is only compared with the sources indexed before it, so an
+        original is never reported as a copy of its own copies.
+        """
+        with self._lock:
+            candidates = set()
+            for band, values in enumerate(signature.bands()):
+                candidates |= self._buckets.get((signature.kind, band, values), set())
+            candidates.discard(source)
+            if (position := self._positions.get(source)) is not None:
+                candidates = {candidate for candidate in candidates if self._positions[candidate] < position}
+
+            best = None
+            for candidate in candidates:
+                entry = self._entries[candidate]
+                similarity = signature.similarity(entry.signature)
+                if self._is_duplicate(signature, similarity) and (best is None or similarity > best.similarity):
+                    best = DuplicateMatch(
+                        source=source, duplicate_of=candidate, similarity=similarity, slug=entry.slug
+                    )
+            return best
+
+    def add(self, source: str, signature: Signature, slug: str | None = None) -> None:
+        """Index a source, again with the slug of its recipe once it is parsed."""
+        entry = DedupEntry(source=source, signature=signature, slug=slug)
+        with self._lock:
+            self._add(entry)
+        self._append(entry)
+
+    def remove(self, source: str) -> None:
+        """Forget a source, e.g. when parsing it failed."""
+        with self._lock:
+            if source not in self._entries:
+                return
+            self._remove(source)
+        self._append(DedupEntry(source=source, signature=None))
+
+    def duplicates(self) -> list[DuplicateMatch]:
+        """Every indexed source that duplicates a source indexed before it."""
+        matches = []
+        for source, entry in list(self._entries.items()):
+            if (match := self.find(source, entry.signature)) is not None:
+                matches.append(match)
+        return matches
+
+    def _is_duplicate(self, signature: Signature, similarity: float) -> bool:
+        if signature.kind == "image":
+            return similarity >= 1 - IMAGE_MAX_DISTANCE / 64
+        return similarity >= self.threshold
+
+    def _append(self, entry: DedupEntry) -> None:
+        if self.index_dir is None:
+            return
+        Journal(self.index_dir / JOURNAL_NAME).append([entry.model_dump_json()])
+
+    def _add(self, entry: DedupEntry) -> None:
+        # A source that is indexed again keeps its place, so it stays the original of its copies.
+        if (previous := self._entries.get(entry.source)) is not None:
+            self._unbucket(previous)
+        else:
+            self._positions[entry.source] = self._next_position
+            self._next_position += 1
+        self._entries[entry.source] = entry
+        for band, values in enumerate(entry.signature.bands()):
+            self._buckets.setdefault((entry.signature.kind, band, values), set()).add(entry.source)
+
+    def _remove(self, source: str) -> None:
+        if (entry := self._entries.pop(source, None)) is not None:
+            del self._positions[source]
+            self._unbucket(entry)
+
+    def _unbucket(self, entry: DedupEntry) -> None:
+        for band, values in enumerate(entry.signature.bands()):
+            key = (entry.signature.kind, band, values)
+            self._buckets[key].discard(entry.source)
+            if not self._buckets[key]:
+                del self._buckets[key]
@@ -0,0 +1,154 @@
+"""Extract the recipe-relevant text from an HTML page."""
+
+import importlib.util
+import logging
+import math
+import re
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel
+
+# BeautifulSoup is imported when a page is parsed, so reading PDFs and images never loads it.
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+
+DEFAULT_TOKEN_BUDGET = 20_000
+
+# Rough average for English text, good enough to budget a prompt without a tokenizer.
+CHARS_PER_TOKEN = 4
+
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "template", "nav", "aside", "iframe", "svg", "button", "select", "dialog",
+]
+# Page chrome outside the content, but inside an article a header holds the title and a form may hold servings.
+CHROME_TAGS = ["header", "footer", "form"]
+CONTENT_TAGS = ("article", "main")
+BOILERPLATE_PATTERN = re.compile(
+    r"comment|sidebar|footer|header|masthead|\bnav|menu|breadcrumb|advert|\bads?\b|promo|"
+    r"share|social|newsletter|subscribe|related|cookie|consent|popup|modal|banner",
+    re.IGNORECASE,
+)
+RECIPE_PATTERN = re.compile(r"recipe|ingredient|instruction|direction|method|preparation|step", re.IGNORECASE)
+
+# A recipe region smaller than this is most likely a widget, e.g. a rating or print button.
+MIN_REGION_CHARS = 200
+
+
+class ExtractionReport(BaseModel):
+    """Size of the page text before and after extraction."""
+
+    chars_before: int
+    chars_after: int
+    tokens_before: int
+    tokens_after: int
+    truncated: bool
+
+
+def make_soup(html: str) -> "BeautifulSoup":
+    """Parse HTML with the fastest available parser."""
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, HTML_PARSER)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens in a text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def extract_main_text(soup: "BeautifulSoup", token_budget: int | None = DEFAULT_TOKEN_BUDGET) -> tuple[str, ExtractionReport]:
+    """Strip boilerplate, keep the recipe region and fit the text in the token budget.
+
+    The soup is modified in place.
+    """
+    from bs4 import Comment
+
+    chars_before = len(soup.get_text())
+    title = soup.find("h1")
+
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+    for element in soup.find_all(BOILERPLATE_TAGS):
+        if not element.decomposed:
+            element.decompose()
+    for element in soup.find_all(CHROME_TAGS):
+        if not element.decomposed and not _holds(element, title) and not _in_content(element):
+            element.decompose()
+    for element in soup.find_all(_is_boilerplate):
+        if not element.decomposed and not _holds(element, title):
+            element.decompose()
+
+    region = _recipe_region(soup)
+    text = collapse_whitespace(region.get_text("\n"))
+    # The title is often above the recipe region, e.g. in the page header.
+    if title is not None and not title.decomposed and not _holds(region, title):
+        text = collapse_whitespace(title.get_text(" ")) + "\n" + text
+
+    truncated = False
+    if token_budget is not None and estimate_tokens(text) > token_budget:
+        text = text[: token_budget * CHARS_PER_TOKEN].rsplit("\n", 1)[0]
+        truncated = True
+
+    report = ExtractionReport(
+        chars_before=chars_before,
+        chars_after=len(text),
+        tokens_before=math.ceil(chars_before / CHARS_PER_TOKEN),
+        tokens_after=estimate_tokens(text),
+        truncated=truncated,
+    )
+    logger.info(
+        f"extracted {report.chars_after}/{report.chars_before} characters, "
+        f"~{report.tokens_after}/{report.tokens_before} tokens"
+        + (" (truncated to token budget)" if truncated else "")
+    )
+    return text, report
+
+
+def collapse_whitespace(text: str) -> str:
+    """Collapse runs of whitespace and drop empty lines."""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _names(element) -> str:
+    return " ".join(element.get("class") or []) + " " + (element.get("id") or "")
+
+
+def _is_boilerplate(element) -> bool:
+    """Element whose class or id marks it as page chrome rather than recipe content."""
+    if element.name in ("html", "body", "main", "article"):
+        return False
+    names = _names(element)
+    return bool(BOILERPLATE_PATTERN.search(names)) and not RECIPE_PATTERN.search(names)
+
+
+def _holds(element, title) -> bool:
+    """Whether the element is or contains the page title."""
+    return title is not None and (element is title or any(parent is element for parent in title.parents))
+
+
+def _in_content(element) -> bool:
+    """Whether the element is inside an article, the main content or a recipe-marked container."""
+    return any(
+        parent.name in CONTENT_TAGS or (parent.name not in ("html", "body") and RECIPE_PATTERN.search(_names(parent)))
+        for parent in element.parents
+    )
+
+
+def _recipe_region(soup: "BeautifulSoup"):
+    """Smallest element containing every recipe-marked element, or the main content."""
+    markers = soup.find_all(lambda element: RECIPE_PATTERN.search(_names(element)))
+    if markers:
+        common = list(reversed([markers[0], *markers[0].parents]))
+        for marker in markers[1:]:
+            ancestors = {id(parent) for parent in (marker, *marker.parents)}
+            while common and id(common[-1]) not in ancestors:
+                common.pop()
+        if common and len(common[-1].get_text()) >= MIN_REGION_CHARS:
+            return common[-1]
+
+    return soup.find("article") or soup.find("main") or soup.body or soup
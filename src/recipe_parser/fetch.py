@@ -0,0 +1,198 @@
+"""Shared HTTP client for URL sources with an on-disk conditional request cache."""
+
+import functools
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import httpx
+from pydantic import BaseModel
+
+from .utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CacheEntry(BaseModel):
+    """Validators of a cached response, the body is stored next to it."""
+
+    url: str
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched_at: float
+
+
+class FetchResult(BaseModel):
+    """Body and validators of a response, without a body when the resource was not modified."""
+
+    body: bytes | None
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class Fetcher:
+    """Pooled HTTP client with retries, per-host concurrency limits and an HTTP cache."""
+
+    def __init__(
+        self,
+        cache_dir: Path | None = Path(".http-cache"),
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        per_host_limit: int = 4,
+        http2: bool = False,
+    ):
+        self.cache_dir = cache_dir
+        self.retries = retries
+        self.backoff = backoff
+        self.per_host_limit = per_host_limit
+        self._client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            follow_redirects=True,
+            http2=http2 and _http2_available(),
+            headers={"User-Agent": "recipe-parser"},
+        )
+        self._host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> bytes:
+        """Fetch the body of a URL, revalidating a cached copy if there is one."""
+        cached = self._load(url)
+        headers = {}
+        if cached is not None:
+            entry, _ = cached
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        response = self._request(url, headers)
+
+        if response.status_code == 304 and cached is not None:
+            logger.info(f"not modified, using cached copy of {url}")
+            entry, body = cached
+            self._store(entry.model_copy(update={"fetched_at": time.time()}))
+            return body
+
+        response.raise_for_status()
+        self._store(
+            CacheEntry(
+                url=url,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                fetched_at=time.time(),
+            ),
+            response.content,
+        )
+        return response.content
+
+    def fetch(self, url: str, etag: str | None = None, last_modified: str | None = None) -> FetchResult:
+        """Conditional GET with validators kept by the caller, bypassing the HTTP cache."""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        response = self._request(url, headers)
+        if response.status_code == 304 and headers:
+            logger.info(f"not modified: {url}")
+            return FetchResult(body=None, etag=etag, last_modified=last_modified)
+
+        response.raise_for_status()
+        return FetchResult(
+            body=response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self._client.close()
+
+    def _request(self, url: str, headers: dict) -> httpx.Response:
+        """GET with exponential backoff on transport errors and retryable status codes."""
+        for attempt in range(self.retries + 1):
+            try:
+                with self._host_slot(url):
+                    response = self._client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"fetching {url} failed ({e}), retrying")
+                time.sleep(self._delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                return response
+
+            logger.warning(f"fetching {url} returned {response.status_code}, retrying")
+            time.sleep(self._delay(attempt, response.headers.get("Retry-After")))
+
+        raise AssertionError("unreachable")
+
+    def _delay(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2**attempt * (1 + random.random())
+
+    @contextmanager
+    def _host_slot(self, url: str):
+        """Limit the number of concurrent requests to the host of the URL."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._host_semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host_limit))
+        with semaphore:
+            yield
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        directory = self.cache_dir / key[:2]
+        return directory / f"{key}.json", directory / f"{key}.body"
+
+    def _load(self, url: str) -> tuple[CacheEntry, bytes] | None:
+        if self.cache_dir is None:
+            return None
+        meta_path, body_path = self._paths(url)
+        try:
+            entry = CacheEntry.model_validate_json(meta_path.read_text())
+            body = body_path.read_bytes()
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.etag is None and entry.last_modified is None:
+            return None
+        return entry, body
+
+    def _store(self, entry: CacheEntry, body: bytes | None = None) -> None:
+        """Write the validators and, if given, the body of a response."""
+        if self.cache_dir is None or (entry.etag is None and entry.last_modified is None):
+            return
+        meta_path, body_path = self._paths(entry.url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write the body first so that metadata never points to a missing body.
+        if body is not None:
+            atomic_write(body_path, body)
+        atomic_write(meta_path, entry.model_dump_json())
+
+
+@functools.cache
+def get_fetcher() -> Fetcher:
+    """Process-wide fetcher used when no fetcher is passed explicitly."""
+    return Fetcher()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+        return False
+    return True
@@ -0,0 +1,146 @@
+"""Detect, orient, shrink and re-encode images before they are sent to Claude."""
+
+import io
+import logging
+import math
+import time
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Claude downscales images beyond these limits, so larger uploads only cost bandwidth.
+MAX_LONG_EDGE = 1568
+MAX_PIXELS = 1_150_000
+
+MAGIC_BYTES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+]
+
+
+class ImageOptions(BaseModel):
+    """Settings of the image preprocessing stage."""
+
+    max_long_edge: int = MAX_LONG_EDGE
+    max_pixels: int = MAX_PIXELS
+    quality: int = 85
+    crop: bool = False
+
+
+class ImageReport(BaseModel):
+    """Effect of preprocessing a single image."""
+
+    bytes_before: int
+    bytes_after: int
+    size_before: tuple[int, int]
+    size_after: tuple[int, int]
+    seconds: float
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def detect_file_type(data: bytes) -> str | None:
+    """Media type from the magic bytes at the start of the data."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, file_type in MAGIC_BYTES:
+        if data.startswith(magic):
+            return file_type
+    return None
+
+
+def preprocess_image(
+    data: bytes, file_type: str, options: ImageOptions | None = None
+) -> tuple[bytes, str, ImageReport | None]:
+    """Auto-orient, optionally crop, downscale and re-encode an image.
+
+    The original bytes are returned unchanged when Pillow is not installed or when
+    processing would not make the image smaller.
+    """
+    if Image is None:
+        logger.warning("Pillow is not installed, images are uploaded without preprocessing")
+        return data, file_type, None
+
+    options = options or ImageOptions()
+    start = time.perf_counter()
+
+    image = Image.open(io.BytesIO(data))
+    size_before = image.size
+    if getattr(image, "is_animated", False):
+        return data, file_type, None
+
+    image = ImageOps.exif_transpose(image)
+    if options.crop:
+        image = crop_to_text(image)
+
+    scale = min(
+        1.0,
+        options.max_long_edge / max(image.size),
+        math.sqrt(options.max_pixels / (image.width * image.height)),
+    )
+    if scale < 1.0:
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.Resampling.LANCZOS,
+        )
+
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency on white, recipe cards and screenshots have light backgrounds.
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=options.quality, optimize=True)
+    processed = buffer.getvalue()
+
+    if len(processed) >= len(data) and image.size == size_before:
+        processed, new_type = data, file_type
+    else:
+        new_type = "image/jpeg"
+
+    report = ImageReport(
+        bytes_before=len(data),
+        bytes_after=len(processed),
+        size_before=size_before,
+        size_after=image.size,
+        seconds=time.perf_counter() - start,
+    )
+    logger.info(
+        f"image {size_before[0]}x{size_before[1]} -> {image.width}x{image.height}, "
+        f"{report.bytes_before} -> {report.bytes_after} bytes ({report.bytes_saved} saved) "
+        f"in {report.seconds:.3f}s"
+    )
+    return processed, new_type, report
+
+
+def crop_to_text(image, margin: float = 0.02):
+    """Crop to the bounding box of the dark content on a light background."""
+    gray = ImageOps.autocontrast(ImageOps.grayscale(image), cutoff=1)
+    # Ink is dark, so after inverting the text is bright and the background is zero.
+    mask = ImageOps.invert(gray).point(lambda value: 255 if value > 96 else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return image
+
+    left, top, right, bottom = bbox
+    pad_x, pad_y = round(image.width * margin), round(image.height * margin)
+    return image.crop((
+        max(0, left - pad_x),
+        max(0, top - pad_y),
+        min(image.width, right + pad_x),
+        min(image.height, bottom + pad_y),
+    ))
@@ -0,0 +1,142 @@
+"""In-memory index of validated recipes that follows changes in the recipe store."""
+
+import hashlib
+import logging
+import random
+import threading
+from collections.abc import Callable, Hashable
+
+from pydantic import ValidationError
+
+from .models import Recipe
+from .store import RecipeStore
+
+logger = logging.getLogger(__name__)
+
+
+class RecipeIndex:
+    """Recipes keyed by slug, kept up to date by polling the versions of the store."""
+
+    def __init__(self, store: RecipeStore, poll_interval: float = 2.0):
+        self.store = store
+        self.poll_interval = poll_interval
+        self._recipes: dict[str, Recipe] = {}
+        self._versions: dict[str, Hashable] = {}
+        self._digests: dict[str, str] = {}
+        # Slugs in a list as well so a random recipe can be picked in constant time.
+        self._slugs: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._listeners: list[Callable[[str, Recipe | None, str | None], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._slugs)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._recipes
+
+    def get(self, slug: str) -> Recipe | None:
+        """Recipe with the given slug."""
+        return self._recipes.get(slug)
+
+    def slugs(self) -> list[str]:
+        with self._lock:
+            return list(self._slugs)
+
+    def subscribe(self, listener: Callable[[str, Recipe | None, str | None], None]) -> None:
+        """Call the listener with slug, recipe and digest on every change, recipe is None on removal."""
+        self._listeners.append(listener)
+
+    def entry(self, slug: str) -> tuple[Recipe, str] | None:
+        """Recipe with the SHA-256 of its file, the digest changes whenever the recipe does."""
+        with self._lock:
+            if slug not in self._recipes:
+                return None
+            return self._recipes[slug], self._digests[slug]
+
+    def random(self) -> tuple[str, Recipe] | None:
+        """A random slug and recipe, or None when there are no recipes."""
+        with self._lock:
+            if not self._slugs:
+                return None
+            slug = random.choice(self._slugs)
+            return slug, self._recipes[slug]
+
+    def refresh(self) -> None:
+        """Load new and changed recipes and drop removed ones."""
+        current = self.store.versions()
+
+        for slug in self._versions.keys() - current.keys():
+            self._remove(slug)
+
+        for slug, version in current.items():
+            if self._versions.get(slug) == version:
+                continue
+            data = self.store.read(slug)
+            if data is None:
+                # Removed since the versions were listed.
+                continue
+            try:
+                recipe = Recipe.model_validate_json(data)
+            except ValidationError as e:
+                logger.warning(f"skipping recipe {self.store.location(slug)}: {e}")
+                self._remove(slug)
+                # Remember the version so the broken recipe is not read again until it changes.
+                self._versions[slug] = version
+                continue
+            self._add(slug, recipe, version, hashlib.sha256(data).hexdigest())
+
+    def start(self) -> None:
+        """Load all recipes and keep polling for changes in a background thread."""
+        self.refresh()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="recipe-index", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling for changes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("refreshing the recipe index failed")
+
+    def _add(self, slug: str, recipe: Recipe, version: Hashable, digest: str) -> None:
+        with self._lock:
+            if slug not in self._positions:
+                self._positions[slug] = len(self._slugs)
+                self._slugs.append(slug)
+            self._recipes[slug] = recipe
+            self._versions[slug] = version
+            self._digests[slug] = digest
+        self._notify(slug, recipe, digest)
+
+    def _remove(self, slug: str) -> None:
+        with self._lock:
+            self._versions.pop(slug, None)
+            self._recipes.pop(slug, None)
+            self._digests.pop(slug, None)
+            position = self._positions.pop(slug, None)
+            if position is None:
+                return
+            # Move the last slug into the gap to remove in constant time.
+            last = self._slugs.pop()
+            if last != slug:
+                self._slugs[position] = last
+                self._positions[last] = position
+        self._notify(slug, None, None)
+
+    def _notify(self, slug: str, recipe: Recipe | None, digest: str | None) -> None:
+        for listener in self._listeners:
+            try:
+                listener(slug, recipe, digest)
+            except Exception:
+                logger.exception(f"recipe index listener failed for {slug}")
@@ -0,0 +1,48 @@
+"""Append-only JSON Lines journals that readers replay, for the indexes next to a recipe store."""
+
+import json
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from .utils import atomic_write
+
+
+class Journal:
+    """Changes written as one JSON line each, compacted once most lines are outdated."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Lines read by the last replay.
+        self.lines = 0
+
+    def replay(self, parse: Callable[[str], Any] = json.loads) -> Iterator[Any]:
+        """Parsed entries in the order they were written, skipping lines cut short by a crash."""
+        self.lines = 0
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = parse(line)
+                except ValueError:
+                    continue
+                self.lines += 1
+                yield entry
+
+    def is_outdated(self, entries: int) -> bool:
+        """Whether the last replay read more than twice as many lines as there are live entries."""
+        return self.lines > 2 * entries + 100
+
+    def append(self, lines: Iterable[str]) -> None:
+        """Add JSON lines, written in one go so concurrent writers do not interleave them."""
+        data = "".join(line + "\n" for line in lines)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(data)
+
+    def rewrite(self, lines: Iterable[str]) -> None:
+        """Replace the journal with the given JSON lines, one per live entry."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, (line + "\n" for line in lines))
+        self.lines = 0
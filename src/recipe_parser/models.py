@@ -204,4 +204,9 @@ class Recipe(BaseModel):
     category: MealCategory | None = Field(
         None,
         description="The category of the dish, e.g., 'main course', 'dessert', 'appetizer'"
+    )
+    source: Source | None = Field(
+        None,
+        discriminator="type",
+        description="The original source of this recipe, whether from the web, a book, or a magazine"
     )
\ No newline at end of file
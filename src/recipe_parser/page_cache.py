@@ -0,0 +1,85 @@
+"""Cache of rendered pages and the view counts used to warm it."""
+
+import json
+import logging
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+
+from .utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """Rendered HTML keyed by content digest, the least recently used page is evicted first."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._pages: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def get(self, key: str) -> str | None:
+        """Cached page, marked as recently used."""
+        with self._lock:
+            html = self._pages.get(key)
+            if html is not None:
+                self._pages.move_to_end(key)
+            return html
+
+    def put(self, key: str, html: str) -> None:
+        """Store a page and evict the oldest pages beyond the limit."""
+        with self._lock:
+            self._pages[key] = html
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def get_or_render(self, key: str, render: Callable[[], str]) -> str:
+        """Cached page, rendered and stored on a miss."""
+        html = self.get(key)
+        if html is None:
+            html = render()
+            self.put(key, html)
+        return html
+
+
+class ViewCounter:
+    """Views per page, saved to disk so the popular pages can be rendered at startup."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._counts: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        if path.exists():
+            try:
+                self._counts.update(json.loads(path.read_text()))
+            except (OSError, ValueError) as e:
+                logger.warning(f"ignoring view counts in {path}: {e}")
+
+    def hit(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def most_common(self, n: int) -> list[str]:
+        with self._lock:
+            return [name for name, _ in self._counts.most_common(n)]
+
+    def save(self) -> None:
+        """Write the counts atomically."""
+        with self._lock:
+            data = json.dumps(dict(self._counts))
+        atomic_write(self.path, data)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag, compared weakly as RFC 9110 requires."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
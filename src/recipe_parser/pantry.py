@@ -0,0 +1,179 @@
+"""Find the recipes that can be cooked from a pantry, ranked by missing ingredients."""
+
+import re
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel
+
+from .models import Recipe
+from .store import RecipeStore, open_store
+
+# Words that describe size, freshness or preparation rather than the ingredient itself.
+DESCRIPTORS = {
+    "fresh", "freshly", "dried", "large", "medium", "small", "whole", "ground", "chopped",
+    "diced", "minced", "sliced", "grated", "crushed", "peeled", "finely", "roughly", "thinly",
+    "unsalted", "salted", "extra", "virgin", "organic", "optional", "to", "taste", "of", "for",
+}
+
+# Assumed to be in every kitchen, so they never count as missing. Matched by their exact
+# normalised name, 'pepper' is a staple but 'red bell pepper' is not.
+STAPLES = ["salt", "pepper", "water"]
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+
+class PantryMatch(BaseModel):
+    """A recipe with the ingredients that the pantry does not cover."""
+
+    slug: str
+    covered: int
+    total: int
+    missing: list[str]
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(name: str) -> str:
+    """Ingredient name without quantities, notes and descriptors, in singular form.
+
+    'Eggs', 'large egg' and 'egg (room temperature)' all become 'egg'.
+    """
+    name = re.sub(r"\(.*?\)", " ", name.lower()).split(",")[0]
+    words = [_singular(word) for word in WORD_PATTERN.findall(name) if word not in DESCRIPTORS]
+    return " ".join(words)
+
+
+class PantryIndex:
+    """Recipes as rows of normalised ingredient ids, scored against a pantry with numpy."""
+
+    def __init__(self):
+        self._ingredient_ids: dict[str, int] = {}
+        # Ingredient ids of every word, a pantry item covers the ingredients containing all its words.
+        self._word_postings: dict[str, set[int]] = {}
+        self._recipes: dict[str, list[tuple[int, str]]] = {}
+        self._lock = threading.Lock()
+        # Flattened (recipe, ingredient) pairs, rebuilt lazily after changes.
+        self._slugs: list[str] = []
+        self._rows: np.ndarray | None = None
+        self._columns: np.ndarray | None = None
+        self._totals: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    @classmethod
+    def from_store(cls, store: RecipeStore) -> "PantryIndex":
+        """Index every recipe of a store."""
+        index = cls()
+        for slug, recipe in store:
+            index.update(slug, recipe)
+        return index
+
+    def update(self, slug: str, recipe: Recipe | None, digest: str | None = None) -> None:
+        """Add or replace a recipe, or remove it when the recipe is None."""
+        with self._lock:
+            self._rows = None
+            if recipe is None:
+                self._recipes.pop(slug, None)
+                return
+
+            ingredients = {}
+            for ingredient in recipe.ingredients:
+                if normalized := normalize_ingredient(ingredient.name):
+                    ingredients.setdefault(self._ingredient_id(normalized), ingredient.name)
+            self._recipes[slug] = list(ingredients.items())
+
+    def match(
+        self,
+        pantry: Iterable[str],
+        limit: int = 20,
+        max_missing: int | None = None,
+        staples: bool = True,
+    ) -> list[PantryMatch]:
+        """Recipes with the fewest missing ingredients, ties go to the recipe using more of the pantry."""
+        with self._lock:
+            if self._rows is None:
+                self._build()
+            if not self._slugs:
+                return []
+
+            have = self._bitmap(pantry)
+            # Recipes that only share staples with the pantry are no match.
+            candidates = np.flatnonzero(np.bincount(self._rows, weights=have[self._columns], minlength=len(self._slugs)))
+            if staples:
+                have[self._exact_ids(STAPLES)] = True
+
+            covered = np.bincount(self._rows, weights=have[self._columns], minlength=len(self._slugs)).astype(np.int64)
+            missing = self._totals - covered
+            if max_missing is not None:
+                candidates = candidates[missing[candidates] <= max_missing]
+            order = candidates[np.lexsort((-covered[candidates], missing[candidates]))][:limit]
+
+            return [
+                PantryMatch(
+                    slug=self._slugs[row],
+                    covered=int(covered[row]),
+                    total=int(self._totals[row]),
+                    missing=[name for id, name in self._recipes[self._slugs[row]] if not have[id]],
+                )
+                for row in order
+            ]
+
+    def _bitmap(self, items: Iterable[str]) -> np.ndarray:
+        """One flag per ingredient id, set when one of the items covers it."""
+        have = np.zeros(len(self._ingredient_ids), dtype=bool)
+        for item in items:
+            have[list(self._covered_by(normalize_ingredient(item)))] = True
+        return have
+
+    def _exact_ids(self, items: Iterable[str]) -> list[int]:
+        """Ids of the ingredients whose normalised name is one of the items."""
+        names = (normalize_ingredient(item) for item in items)
+        return [self._ingredient_ids[name] for name in names if name in self._ingredient_ids]
+
+    def _ingredient_id(self, normalized: str) -> int:
+        if normalized not in self._ingredient_ids:
+            id = len(self._ingredient_ids)
+            self._ingredient_ids[normalized] = id
+            for word in normalized.split():
+                self._word_postings.setdefault(word, set()).add(id)
+        return self._ingredient_ids[normalized]
+
+    def _covered_by(self, normalized: str) -> set[int]:
+        """Ingredient ids containing every word of a pantry item, 'butter' covers 'unsalted butter'."""
+        words = normalized.split()
+        if not words:
+            return set()
+        postings = sorted((self._word_postings.get(word, set()) for word in words), key=len)
+        return set.intersection(*postings)
+
+    def _build(self) -> None:
+        self._slugs = list(self._recipes)
+        lengths = [len(self._recipes[slug]) for slug in self._slugs]
+        self._rows = np.repeat(np.arange(len(self._slugs)), lengths)
+        self._columns = np.fromiter(
+            (id for slug in self._slugs for id, _ in self._recipes[slug]), dtype=np.int64, count=sum(lengths)
+        )
+        self._totals = np.array(lengths, dtype=np.int64)
+
+
+def what_can_i_cook(
+    pantry: Iterable[str], store_path: Path, limit: int = 20, max_missing: int | None = None
+) -> list[PantryMatch]:
+    """Recipes in a recipe directory or SQLite store that are fully or mostly covered by the pantry."""
+    store = open_store(store_path)
+    try:
+        return PantryIndex.from_store(store).match(pantry, limit=limit, max_missing=max_missing)
+    finally:
+        store.close()
@@ -1,76 +1,334 @@
 """Take raw input and parse to the Recipe model."""
 
-import base64
-from pathlib import Path
-from typing import Literal
-import httpx
+import binascii
+import functools
+import json
+import mmap
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Literal
 import logging
+from urllib.parse import urlsplit
 
-from pydantic import BaseModel, Base64Bytes
-from anthropic import Anthropic
-from bs4 import BeautifulSoup
+from pydantic import BaseModel
 
+from .cache import ParseCache
+from .extract import DEFAULT_TOKEN_BUDGET, estimate_tokens, extract_main_text, make_soup
+from .images import ImageOptions, detect_file_type, preprocess_image
 from .models import Recipe
+from .profiling import TokenUsage, record_size, record_usage, stage
+from .streaming import (
+    DEFAULT_DEADLINE,
+    LatencyTracker,
+    ProgressCallback,
+    astream_message,
+    hedged,
+    stream_message,
+)
 from .utils import is_valid_http_url
 
-FileType = Literal["image/jpeg", "image/png", "image/webp", "application/pdf", "text/plain"]
+# The Anthropic SDK, httpx and BeautifulSoup take most of the import time, they are
+# loaded by the code paths that use them: the caller creates the client, fetch is
+# imported for URLs and structured for HTML.
+if TYPE_CHECKING:
+    from anthropic import Anthropic, AsyncAnthropic
+
+    from .fetch import Fetcher
+
+FileType = Literal["image/jpeg", "image/png", "image/webp", "image/gif", "application/pdf", "text/plain"]
+
+RECIPE_TOOL_NAME = "recipe_parser"
+
+# The Messages API rejects requests larger than 32 MB.
+DEFAULT_MAX_PAYLOAD_BYTES = 32 * 1024 * 1024
 
 logger = logging.getLogger(__name__)
 
+
+class PayloadTooLargeError(ValueError):
+    """Raised when a source would exceed the maximum request payload size."""
+
 class Base64Input(BaseModel):
-    """Image input."""
+    """Claude input, base64 encoded for images and PDFs and plain text otherwise.
+
+    `recipe` is the recipe mapped from schema.org markup, Claude is not called for it.
+    """
 
-    data: bytes
+    data: str
     file_type: FileType
+    recipe: Recipe | None = None
 
 
-def source_to_input(path: str) -> str | Base64Input:
-    """Read from source path and return Claude-compatible object."""
+def source_to_input(
+    path: str,
+    token_budget: int | None = DEFAULT_TOKEN_BUDGET,
+    fetcher: "Fetcher | None" = None,
+    image_options: ImageOptions | None = None,
+    max_payload_bytes: int | None = DEFAULT_MAX_PAYLOAD_BYTES,
+    body: bytes | None = None,
+) -> Base64Input:
+    """Read from source path and return Claude-compatible object.
+
+    `body` is the response of a URL that was already fetched, it is not fetched again.
+    """
     if is_valid_http_url(path):
-        response = httpx.get(path)
-        response.raise_for_status()
-        raw_data = response.content
+        from .fetch import get_fetcher
+
+        if body is not None:
+            raw_data = body
+        else:
+            with stage("fetch"):
+                raw_data = (fetcher or get_fetcher()).get(path)
+        file_type = detect_file_type(raw_data) or _get_file_type(path)
     else:
-        raw_data = Path(path).read_bytes()
+        with open(path, "rb") as f:
+            file_type = detect_file_type(f.read(16)) or _get_file_type(path)
+
+        if file_type == "application/pdf":
+            # Encode straight from the memory-mapped file, the raw bytes are never copied into memory.
+            size = Path(path).stat().st_size
+            record_size("source", size)
+            _check_payload_size(path, size, max_payload_bytes)
+            logger.info(f"file type is {file_type}")
+            with stage("encode"):
+                data = _encode_file(Path(path))
+            record_size("payload", len(data))
+            return Base64Input(data=data, file_type=file_type)
+
+        with stage("read"):
+            raw_data = Path(path).read_bytes()
 
-    file_type = _get_file_type(path)
     logger.info(f"file type is {file_type}")
+    record_size("source", len(raw_data))
 
-    # extract only text if file is a HTML file.
+    if file_type.startswith("image/"):
+        with stage("image"):
+            raw_data, file_type, _ = preprocess_image(raw_data, file_type, image_options)
+
+    # use schema.org recipe markup if it maps to a recipe, otherwise extract only the recipe text if file is a HTML file.
     if file_type == "text/plain":
-        soup = BeautifulSoup(raw_data.decode("utf-8"), "html.parser")
-        raw_data = soup.get_text().encode("utf-8")
+        from .structured import find_recipe_data, recipe_from_structured
+
+        with stage("extract"):
+            soup = make_soup(raw_data.decode("utf-8"))
+            structured = find_recipe_data(soup)
+
+        recipe = None
+        if structured is not None:
+            logger.info("found schema.org recipe markup")
+            with stage("structured"):
+                recipe = recipe_from_structured(structured)
+
+        if recipe is not None:
+            logger.info("mapped schema.org recipe markup without calling Claude")
+            input = Base64Input(data=json.dumps(structured, ensure_ascii=False), file_type=file_type, recipe=recipe)
+        else:
+            with stage("extract"):
+                if structured is None:
+                    text, _ = extract_main_text(soup, token_budget)
+                else:
+                    # Markup that cannot be mapped is often a stub, e.g. without times or with
+                    # part of the ingredients, so Claude gets the page text along with it.
+                    markup = json.dumps(structured, ensure_ascii=False)
+                    if token_budget is not None:
+                        token_budget = max(token_budget - estimate_tokens(markup), 0)
+                    text, _ = extract_main_text(soup, token_budget)
+                    text = f"schema.org Recipe markup:\n{markup}\n\nPage text:\n{text}"
+            input = Base64Input(data=text, file_type=file_type)
+        record_size("payload", len(input.data))
+        return input
+
+    _check_payload_size(path, len(raw_data), max_payload_bytes)
+    with stage("encode"):
+        data = _encode(raw_data)
+    record_size("payload", len(data))
+    return Base64Input(data=data, file_type=file_type)
+
+
+def _check_payload_size(source: str, size: int, max_payload_bytes: int | None) -> None:
+    """Fail before encoding when the base64 payload would be too large."""
+    encoded_size = 4 * -(-size // 3)
+    if max_payload_bytes is not None and encoded_size > max_payload_bytes:
+        raise PayloadTooLargeError(
+            f"{source} is {size / 2**20:.1f} MB, its base64 payload of {encoded_size / 2**20:.1f} MB "
+            f"exceeds the maximum of {max_payload_bytes / 2**20:.1f} MB"
+        )
+
+
+def _encode(data) -> str:
+    """Base64 encode a bytes-like object into a str."""
+    return binascii.b2a_base64(data, newline=False).decode("ascii")
+
+
+def _encode_file(path: Path) -> str:
+    """Base64 encode a file through a memory map."""
+    with open(path, "rb") as f:
+        if path.stat().st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _encode(mapped)
+
+
+
+def parse_input_to_recipe(
+    input: Base64Input,
+    client: "Anthropic",
+    model_name: str,
+    system_path: Path,
+    cache: ParseCache | None = None,
+    refresh: bool = False,
+    usage: TokenUsage | None = None,
+    deadline: float | None = DEFAULT_DEADLINE,
+    on_progress: ProgressCallback | None = None,
+) -> Recipe:
+    """Parse text to recipe.
+
+    The response is streamed, `on_progress` receives the title and the ingredients
+    as soon as they arrive. Raises DeadlineExceededError when the request takes
+    longer than the deadline in seconds.
+    """
+    if input.recipe is not None:
+        return input.recipe
+
+    system_prompt = load_system_prompt(system_path)
 
-    return Base64Input(data=base64.standard_b64encode(raw_data), file_type=file_type)
+    with stage("cache"):
+        cache_key = _cache_key(input, model_name, system_prompt, cache)
+        if cache_key is not None and not refresh and (recipe := cache.get(cache_key)) is not None:
+            logger.info(f"cache hit {cache_key}")
+            return recipe
 
+    with stage("model"):
+        message = stream_message(client, _build_request(input, model_name, system_prompt), deadline, on_progress)
+    _record_usage(message, usage)
+    with stage("validate"):
+        recipe = _message_to_recipe(message)
 
+    if cache_key is not None:
+        with stage("cache"):
+            cache.put(cache_key, recipe)
+    return recipe
 
-def parse_input_to_recipe(input: Base64Input, client: Anthropic, model_name: str, system_path: Path) -> Recipe:
-    """Parse text to recipe."""
-    system_prompt = system_path.read_text()
-    tools = [
+
+async def aparse_input_to_recipe(
+    input: Base64Input,
+    client: "AsyncAnthropic",
+    model_name: str,
+    system_path: Path,
+    cache: ParseCache | None = None,
+    refresh: bool = False,
+    usage: TokenUsage | None = None,
+    deadline: float | None = DEFAULT_DEADLINE,
+    hedge: LatencyTracker | None = None,
+) -> Recipe:
+    """Parse text to recipe without blocking the event loop.
+
+    With a latency tracker, a duplicate request is sent when the first one is slower
+    than most recent requests, and the first response wins.
+    """
+    if input.recipe is not None:
+        return input.recipe
+
+    system_prompt = load_system_prompt(system_path)
+
+    with stage("cache"):
+        cache_key = _cache_key(input, model_name, system_prompt, cache)
+        if cache_key is not None and not refresh and (recipe := cache.get(cache_key)) is not None:
+            logger.info(f"cache hit {cache_key}")
+            return recipe
+
+    request = _build_request(input, model_name, system_prompt)
+    with stage("model"):
+        if hedge is None:
+            message = await astream_message(client, request, deadline)
+        else:
+            message = await hedged(lambda: astream_message(client, request, deadline), hedge)
+    _record_usage(message, usage)
+    with stage("validate"):
+        recipe = _message_to_recipe(message)
+
+    if cache_key is not None:
+        with stage("cache"):
+            cache.put(cache_key, recipe)
+    return recipe
+
+
+def _cache_key(input: Base64Input, model_name: str, system_prompt: str, cache: ParseCache | None) -> str | None:
+    """Cache key for the request or None when caching is disabled."""
+    if cache is None:
+        return None
+    return ParseCache.key(input.data, input.file_type, system_prompt, model_name)
+
+
+@functools.cache
+def load_system_prompt(system_path: Path) -> str:
+    """Read the system prompt once per process."""
+    return system_path.read_text()
+
+
+@functools.cache
+def _recipe_tools() -> list[dict]:
+    """Tool definition with the recipe schema, built once per process."""
+    return [
         {
-            "name": "recipe_parser",
+            "name": RECIPE_TOOL_NAME,
             "description": "Parses a recipe from the message according to the provided schema.",
             "input_schema": Recipe.model_json_schema()
         }
     ]
+
+
+@functools.cache
+def _system_blocks(system_prompt: str) -> list[dict]:
+    """System prompt marked for prompt caching.
+
+    The tool definitions precede the system prompt in the cached prefix, so the
+    breakpoint on the system prompt caches the recipe schema as well.
+    """
+    return [
+        {
+            "type": "text",
+            "text": system_prompt,
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+
+def _build_request(input: Base64Input, model_name: str, system_prompt: str) -> dict:
+    """Build the keyword arguments for a recipe parsing request."""
     input_content = _input_to_claude_content(input)
 
-    message = client.messages.create(
+    return dict(
         max_tokens=8192,
         model=model_name,
-        system=system_prompt,
+        system=_system_blocks(system_prompt),
         messages=[{
             "role": "user",
             "content": [input_content],
         }],
-        tools=tools,
-        tool_choice={"type": "tool", "name": "recipe_parser"}
+        tools=_recipe_tools(),
+        tool_choice={"type": "tool", "name": RECIPE_TOOL_NAME}
     )
 
-    return Recipe(**message.content[0].input)
-    
+
+def _record_usage(message, usage: TokenUsage | None) -> None:
+    """Log the token usage of a message and add it to the running total."""
+    logger.info(
+        f"usage: {message.usage.input_tokens} input, {message.usage.output_tokens} output, "
+        f"{message.usage.cache_creation_input_tokens or 0} cache write, "
+        f"{message.usage.cache_read_input_tokens or 0} cache read tokens"
+    )
+    if usage is not None:
+        usage.add(message.usage)
+    record_usage(message.model, message.usage)
+
+
+def _message_to_recipe(message) -> Recipe:
+    """Convert the tool call in a Claude message to a recipe."""
+    for block in message.content:
+        if block.type == "tool_use" and block.name == RECIPE_TOOL_NAME:
+            return Recipe(**block.input)
+    raise ValueError(f"response has no {RECIPE_TOOL_NAME} tool call, stop reason {message.stop_reason}")
+
 
 def _input_to_claude_content(input: Base64Input) -> dict:
     """Input to claude content."""
@@ -78,7 +336,7 @@ def _input_to_claude_content(input: Base64Input) -> dict:
         case "text/plain":
             content = {
                 "type": "text",
-                "text": input.data.decode("utf-8")
+                "text": input.data
             }
         case "application/pdf":
             content = {
@@ -86,7 +344,7 @@ def _input_to_claude_content(input: Base64Input) -> dict:
                 "source": {
                     "type": "base64",
                     "media_type": "application/pdf",
-                    "data": input.data.decode("utf-8")
+                    "data": input.data
                 }
             }
         case _:
@@ -95,7 +353,7 @@ def _input_to_claude_content(input: Base64Input) -> dict:
                 "source": {
                     "type": "base64",
                     "media_type": input.file_type,
-                    "data": input.data.decode("utf-8")
+                    "data": input.data
                 }
             }
     
@@ -104,14 +362,17 @@ def _input_to_claude_content(input: Base64Input) -> dict:
 
 def _get_file_type(path: str) -> FileType:
     """Get file type from path."""
-    _, extension = path.rsplit(".")
+    name = urlsplit(path).path if is_valid_http_url(path) else path
+    _, dot, extension = PurePosixPath(name).name.rpartition(".")
 
-    if extension is None:
+    if not dot:
         logger.warning("No extension provided. Assume it's text.")
         return "text/plain"
     
     extension = extension.lower()
-    if extension in ["jpeg", "webp", "png"]:
+    if extension == "jpg":
+        return "image/jpeg"
+    elif extension in ["jpeg", "webp", "png", "gif"]:
         return f"image/{extension}"
     elif extension == "pdf":
         return "application/pdf"
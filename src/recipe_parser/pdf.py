@@ -0,0 +1,193 @@
+"""Split a PDF cookbook into per-recipe page ranges."""
+
+import io
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+from pydantic import BaseModel
+
+from .parser import Base64Input, _encode
+from .profiling import record_size, stage
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = None
+
+SplitStrategy = Literal["outline", "headings", "model"]
+
+# A page that contains one of these words most likely starts a recipe.
+RECIPE_START_PATTERN = re.compile(r"^\s*(ingredients|serves|makes|yield)\b", re.IGNORECASE | re.MULTILINE)
+
+# Characters of each page that are shown to the model to find the recipes.
+PAGE_PREVIEW_CHARS = 300
+
+# Longest recipe, keeps back matter such as the index out of the last recipe.
+MAX_RECIPE_PAGES = 6
+
+RECIPE_INDEX_TOOL = {
+    "name": "recipe_index",
+    "description": "Lists the recipes in a cookbook with their start page.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "recipes": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string"},
+                        "start_page": {"type": "integer"},
+                    },
+                    "required": ["title", "start_page"],
+                },
+            }
+        },
+        "required": ["recipes"],
+    },
+}
+
+
+class RecipeRange(BaseModel):
+    """Pages of a single recipe, start inclusive and end exclusive, zero based."""
+
+    title: str | None = None
+    start: int
+    end: int
+
+
+class Cookbook:
+    """PDF cookbook that can be split into recipe page ranges."""
+
+    def __init__(self, path: Path):
+        if PdfReader is None:
+            raise ImportError("splitting PDF cookbooks requires pypdf, install the 'pdf' extra")
+        self.path = path
+        self.reader = PdfReader(path)
+        # pypdf reads lazily from a shared file handle, so page access is serialised.
+        self._lock = threading.Lock()
+
+    @property
+    def title(self) -> str | None:
+        return self.reader.metadata.title if self.reader.metadata else None
+
+    @property
+    def author(self) -> str | None:
+        return self.reader.metadata.author if self.reader.metadata else None
+
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    def find_ranges(
+        self,
+        strategy: SplitStrategy = "outline",
+        client: "Anthropic | None" = None,
+        model_name: str | None = None,
+        max_pages: int = MAX_RECIPE_PAGES,
+    ) -> list[RecipeRange]:
+        """Find the recipe page ranges with the given strategy."""
+        match strategy:
+            case "outline":
+                starts = self._outline_starts()
+            case "headings":
+                starts = self._heading_starts()
+            case "model":
+                if client is None or model_name is None:
+                    raise ValueError("the model strategy needs a client and model name")
+                starts = self._model_starts(client, model_name)
+
+        if not starts:
+            logger.warning(f"no recipes found with the {strategy} strategy, using the whole book")
+            return [RecipeRange(title=self.title, start=0, end=self.page_count())]
+
+        return _starts_to_ranges(starts, self.page_count(), max_pages)
+
+    def range_to_input(self, recipe_range: RecipeRange) -> Base64Input:
+        """PDF document input containing only the pages of the range."""
+        writer = PdfWriter()
+        with stage("split"), self._lock:
+            for index in range(recipe_range.start, recipe_range.end):
+                writer.add_page(self.reader.pages[index])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+        record_size("source", buffer.getbuffer().nbytes)
+        with stage("encode"):
+            data = _encode(buffer.getbuffer())
+        record_size("payload", len(data))
+        return Base64Input(data=data, file_type="application/pdf")
+
+    def _outline_starts(self) -> list[tuple[int, str | None]]:
+        """Start pages of the deepest bookmarks, which are the recipes in most cookbooks."""
+        entries = []
+
+        def walk(outline, depth):
+            for item in outline:
+                if isinstance(item, list):
+                    walk(item, depth + 1)
+                else:
+                    page = self.reader.get_destination_page_number(item)
+                    if page is not None:
+                        entries.append((depth, page, item.title))
+
+        walk(self.reader.outline, 0)
+        if not entries:
+            return []
+
+        deepest = max(depth for depth, _, _ in entries)
+        return [(page, title) for depth, page, title in entries if depth == deepest]
+
+    def _heading_starts(self) -> list[tuple[int, str | None]]:
+        """Pages with an ingredient heading, titled by their first line of text."""
+        starts = []
+        for index in range(self.page_count()):
+            text = self._page_text(index)
+            if RECIPE_START_PATTERN.search(text):
+                lines = [line.strip() for line in text.splitlines() if line.strip()]
+                starts.append((index, lines[0] if lines else None))
+        return starts
+
+    def _model_starts(self, client: "Anthropic", model_name: str) -> list[tuple[int, str | None]]:
+        """Ask the model for the recipe start pages from a short preview of every page."""
+        previews = "\n\n".join(
+            f"<page number=\"{index + 1}\">\n{self._page_text(index)[:PAGE_PREVIEW_CHARS]}\n</page>"
+            for index in range(self.page_count())
+        )
+        message = client.messages.create(
+            max_tokens=4096,
+            model=model_name,
+            system="You receive the beginning of every page of a cookbook. List every recipe with the page it starts on.",
+            messages=[{"role": "user", "content": previews}],
+            tools=[RECIPE_INDEX_TOOL],
+            tool_choice={"type": "tool", "name": RECIPE_INDEX_TOOL["name"]},
+        )
+        block = next(block for block in message.content if block.type == "tool_use")
+        return [
+            (recipe["start_page"] - 1, recipe.get("title"))
+            for recipe in block.input["recipes"]
+            if 1 <= recipe["start_page"] <= self.page_count()
+        ]
+
+    def _page_text(self, index: int) -> str:
+        with self._lock:
+            return self.reader.pages[index].extract_text() or ""
+
+
+def _starts_to_ranges(starts: list[tuple[int, str | None]], page_count: int, max_pages: int) -> list[RecipeRange]:
+    """Turn recipe start pages into ranges that end where the next recipe starts."""
+    unique = {}
+    for page, title in sorted(starts, key=lambda start: start[0]):
+        unique.setdefault(page, title)
+
+    pages = list(unique)
+    return [
+        RecipeRange(title=unique[page], start=page, end=min(next_page, page + max_pages))
+        for page, next_page in zip(pages, pages[1:] + [page_count])
+    ]
@@ -0,0 +1,188 @@
+"""Per-source stage timings, payload sizes, token usage and estimated cost."""
+
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+# USD per million input, output, cache write and cache read tokens, matched by the
+# longest prefix of the model name. Unknown models are reported without a cost.
+MODEL_PRICES = {
+    "claude-3-haiku": (0.25, 1.25, 0.30, 0.03),
+    "claude-3-5-haiku": (0.80, 4.0, 1.0, 0.08),
+    "claude-haiku-4-5": (1.0, 5.0, 1.25, 0.10),
+    "claude-3-5-sonnet": (3.0, 15.0, 3.75, 0.30),
+    "claude-3-7-sonnet": (3.0, 15.0, 3.75, 0.30),
+    "claude-sonnet-4": (3.0, 15.0, 3.75, 0.30),
+    "claude-3-opus": (15.0, 75.0, 18.75, 1.50),
+    "claude-opus-4": (15.0, 75.0, 18.75, 1.50),
+    "claude-opus-4-5": (5.0, 25.0, 6.25, 0.50),
+}
+
+
+class TokenUsage(BaseModel):
+    """Token counts accumulated over one or more Claude requests."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+
+    def add(self, usage) -> None:
+        """Add the usage reported on a Claude message."""
+        self.requests += 1
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cache_creation_input_tokens += usage.cache_creation_input_tokens or 0
+        self.cache_read_input_tokens += usage.cache_read_input_tokens or 0
+
+    def cost(self, model_name: str) -> float | None:
+        """Estimated cost in USD, None for models without a known price."""
+        prefixes = [prefix for prefix in MODEL_PRICES if model_name.startswith(prefix)]
+        if not prefixes:
+            return None
+        input_price, output_price, write_price, read_price = MODEL_PRICES[max(prefixes, key=len)]
+        return (
+            self.input_tokens * input_price
+            + self.output_tokens * output_price
+            + self.cache_creation_input_tokens * write_price
+            + self.cache_read_input_tokens * read_price
+        ) / 1_000_000
+
+    def summary(self) -> str:
+        """One line description of the usage."""
+        return (
+            f"{self.requests} requests, {self.input_tokens} input tokens, "
+            f"{self.output_tokens} output tokens, {self.cache_creation_input_tokens} cache write tokens, "
+            f"{self.cache_read_input_tokens} cache read tokens"
+        )
+
+
+class SourceProfile(BaseModel):
+    """Where the time of parsing one source went."""
+
+    source: str
+    stages: dict[str, float] = {}
+    sizes: dict[str, int] = {}
+    usage: TokenUsage = Field(default_factory=TokenUsage)
+    model_name: str | None = None
+    cost: float | None = None
+    error: str | None = None
+
+
+# The profile of the source being parsed, set per task so concurrent sources and the
+# threads they load in (asyncio.to_thread copies the context) record separately.
+current_profile: ContextVar[SourceProfile | None] = ContextVar("current_profile", default=None)
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    """Time a stage of the current source, stages that run more than once add up."""
+    profile = current_profile.get()
+    if profile is None:
+        # Nothing is recorded outside a profiled source, e.g. in the web app.
+        return nullcontext()
+    return _timed(profile, name)
+
+
+@contextmanager
+def _timed(profile: SourceProfile, name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stages[name] = profile.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def record_size(name: str, size: int) -> None:
+    """Record a payload size in bytes for the current source."""
+    if (profile := current_profile.get()) is not None:
+        profile.sizes[name] = size
+
+
+def record_usage(model_name: str, usage) -> None:
+    """Add the usage of a Claude message to the current source."""
+    if (profile := current_profile.get()) is not None:
+        profile.usage.add(usage)
+        profile.model_name = model_name
+
+
+class Profiler:
+    """Collects the profile of every source of a run.
+
+    Each finished profile is logged as JSON and appended to `log_path` when given,
+    one profile per line.
+    """
+
+    def __init__(self, log_path: Path | None = None):
+        self.log_path = log_path
+        self.profiles: list[SourceProfile] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def source(self, source: str) -> Iterator[SourceProfile]:
+        """Profile everything done for a source within the block."""
+        profile = SourceProfile(source=source)
+        token = current_profile.set(profile)
+        try:
+            with _timed(profile, "total"):
+                yield profile
+        except BaseException as e:
+            profile.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current_profile.reset(token)
+            if profile.model_name is not None:
+                profile.cost = profile.usage.cost(profile.model_name)
+            self._finish(profile)
+
+    def _finish(self, profile: SourceProfile) -> None:
+        line = profile.model_dump_json()
+        logger.info(f"profile {line}")
+        with self._lock:
+            self.profiles.append(profile)
+            if self.log_path is not None:
+                with self.log_path.open("a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def summary(self) -> str:
+        """Table of the time per stage over all sources, followed by sizes, tokens and cost."""
+        stages: dict[str, list[float]] = {}
+        sizes: dict[str, int] = {}
+        usage = TokenUsage()
+        costs = []
+        for profile in self.profiles:
+            for name, seconds in profile.stages.items():
+                stages.setdefault(name, []).append(seconds)
+            for name, size in profile.sizes.items():
+                sizes[name] = sizes.get(name, 0) + size
+            for field in TokenUsage.model_fields:
+                setattr(usage, field, getattr(usage, field) + getattr(profile.usage, field))
+            if profile.usage.requests:
+                costs.append(profile.cost)
+
+        lines = [f"{'stage':12} {'sources':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        # Stages in pipeline order, as first recorded, with the total last.
+        for name in sorted(stages, key=lambda name: name == "total"):
+            seconds = stages[name]
+            lines.append(
+                f"{name:12} {len(seconds):8} {sum(seconds):10.3f} "
+                f"{sum(seconds) / len(seconds) * 1000:10.1f} {max(seconds) * 1000:10.1f}"
+            )
+        if sizes:
+            lines.append("payload: " + ", ".join(f"{name} {size / 1024:.1f} kB" for name, size in sizes.items()))
+        lines.append(f"tokens: {usage.summary()}")
+        if costs:
+            known = [cost for cost in costs if cost is not None]
+            unknown = f" ({len(costs) - len(known)} sources without a known price)" if len(known) < len(costs) else ""
+            lines.append(f"estimated cost: ${sum(known):.4f}{unknown}")
+        failed = sum(profile.error is not None for profile in self.profiles)
+        lines.append(f"{len(self.profiles)} sources, {failed} failed")
+        return "\n".join(lines)
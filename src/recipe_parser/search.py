@@ -0,0 +1,248 @@
+"""Full-text search over recipes with an inverted index, BM25 ranking and prefix matching."""
+
+import bisect
+import json
+import logging
+import math
+import re
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel
+
+from .journal import Journal
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# The index lives next to the recipe store, as an append-only journal of indexed recipes.
+INDEX_DIR = ".index"
+JOURNAL_NAME = "search.jsonl"
+
+# A word in the title says more about a recipe than the same word in the description.
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "cuisine_type": 2.0,
+    "category": 2.0,
+    "ingredients": 1.5,
+    "description": 1.0,
+}
+
+# BM25 term frequency saturation and length normalisation.
+K1 = 1.2
+B = 0.75
+
+# Completions of a partial word score lower than the word itself, and only the most
+# common completions are scored so short prefixes stay fast.
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_TERMS = 50
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+class SearchHit(BaseModel):
+    """A matching recipe and its score."""
+
+    slug: str
+    score: float
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words of a text."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def recipe_terms(recipe: Recipe) -> dict[str, float]:
+    """Field weighted frequency of every word in the searchable fields of a recipe."""
+    fields = {
+        "title": [recipe.title],
+        "tags": recipe.tags,
+        "cuisine_type": [recipe.cuisine_type] if recipe.cuisine_type else [],
+        "category": [recipe.category.value] if recipe.category else [],
+        "ingredients": [ingredient.name for ingredient in recipe.ingredients],
+        "description": [recipe.description],
+    }
+    terms: dict[str, float] = {}
+    for field, texts in fields.items():
+        for text in texts:
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0.0) + FIELD_WEIGHTS[field]
+    return terms
+
+
+def append_to_journal(index_dir: Path, entries: Iterable[tuple[str, Recipe | None, str | None]]) -> None:
+    """Record written or removed recipes without loading the index, a reader replays them on load.
+
+    Entries are slug, recipe and digest triples, the recipe is None for removed recipes.
+    """
+    Journal(index_dir / JOURNAL_NAME).append(
+        json.dumps({"slug": slug, "digest": digest, "terms": recipe_terms(recipe) if recipe else None})
+        for slug, recipe, digest in entries
+    )
+
+
+class SearchIndex:
+    """Inverted index from words to the recipes that contain them."""
+
+    def __init__(self, index_dir: Path | None = None):
+        self.index_dir = index_dir
+        self._ids: dict[str, int] = {}
+        self._slugs: list[str | None] = []
+        self._digests: dict[str, str | None] = {}
+        self._lengths: list[float] = []
+        self._doc_terms: dict[int, dict[str, float]] = {}
+        self._postings: dict[str, dict[int, float]] = {}
+        self._total_length = 0.0
+        # Derived lookups, rebuilt lazily after changes.
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._length_array: np.ndarray | None = None
+        self._sorted_terms: list[str] | None = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._ids
+
+    def slugs(self) -> set[str]:
+        with self._lock:
+            return set(self._ids)
+
+    @classmethod
+    def load(cls, index_dir: Path) -> "SearchIndex":
+        """Replay the journal in the index directory, compacting it when most lines are outdated."""
+        index = cls(index_dir)
+        journal = Journal(index_dir / JOURNAL_NAME)
+        for entry in journal.replay():
+            if entry["terms"] is None:
+                index._remove(entry["slug"])
+            else:
+                index._add(entry["slug"], entry["terms"], entry["digest"])
+        if journal.is_outdated(len(index)):
+            index.save()
+        return index
+
+    def save(self) -> None:
+        """Rewrite the journal with one line per indexed recipe."""
+        if self.index_dir is None:
+            return
+        with self._lock:
+            Journal(self.index_dir / JOURNAL_NAME).rewrite(
+                json.dumps({"slug": slug, "digest": self._digests[slug], "terms": self._doc_terms[doc_id]})
+                for slug, doc_id in self._ids.items()
+            )
+
+    def update(self, slug: str, recipe: Recipe | None, digest: str | None = None) -> None:
+        """Index a new or changed recipe, or remove it when the recipe is None.
+
+        Recipes whose digest is already indexed are skipped, so following the recipe
+        store only tokenises recipes that changed since the journal was written.
+        """
+        with self._lock:
+            if recipe is None:
+                if slug not in self._ids:
+                    return
+                self._remove(slug)
+            else:
+                if digest is not None and self._digests.get(slug) == digest:
+                    return
+                self._add(slug, recipe_terms(recipe), digest)
+        if self.index_dir is not None:
+            append_to_journal(self.index_dir, [(slug, recipe, digest)])
+
+    def search(self, query: str, limit: int = 20) -> list[SearchHit]:
+        """Best matching recipes, the last word of the query also matches as a prefix."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            if not self._ids:
+                return []
+            lengths = self._lengths_array()
+            norm = K1 * (1 - B + B * lengths / (self._total_length / len(self._ids)))
+            scores = np.zeros(len(self._slugs))
+            for position, token in enumerate(tokens):
+                expansions = [(token, 1.0)] if token in self._postings else []
+                if position == len(tokens) - 1:
+                    expansions += [(term, PREFIX_WEIGHT) for term in self._completions(token)]
+                # A word counts once per recipe, with its best matching completion.
+                token_scores = np.zeros(len(self._slugs))
+                for term, weight in expansions:
+                    doc_ids, tfs = self._posting_arrays(term)
+                    idf = math.log(1 + (len(self._ids) - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+                    term_scores = weight * idf * tfs * (K1 + 1) / (tfs + norm[doc_ids])
+                    token_scores[doc_ids] = np.maximum(token_scores[doc_ids], term_scores)
+                scores += token_scores
+
+            matches = np.flatnonzero(scores)
+            if len(matches) > limit:
+                matches = matches[np.argpartition(scores[matches], -limit)[-limit:]]
+            matches = matches[np.argsort(-scores[matches], kind="stable")]
+            return [SearchHit(slug=self._slugs[doc_id], score=float(scores[doc_id])) for doc_id in matches]
+
+    def _completions(self, prefix: str) -> list[str]:
+        """Indexed words that start with the prefix, most common first."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        end = bisect.bisect_left(self._sorted_terms, prefix + "\U0010ffff")
+        completions = [term for term in self._sorted_terms[start:end] if term != prefix]
+        if len(completions) > MAX_PREFIX_TERMS:
+            completions.sort(key=lambda term: len(self._postings[term]), reverse=True)
+            completions = completions[:MAX_PREFIX_TERMS]
+        return completions
+
+    def _posting_arrays(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        if term not in self._arrays:
+            posting = self._postings[term]
+            self._arrays[term] = (
+                np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                np.fromiter(posting.values(), dtype=np.float64, count=len(posting)),
+            )
+        return self._arrays[term]
+
+    def _lengths_array(self) -> np.ndarray:
+        if self._length_array is None:
+            self._length_array = np.array(self._lengths, dtype=np.float64)
+        return self._length_array
+
+    def _add(self, slug: str, terms: dict[str, float], digest: str | None) -> None:
+        self._remove(slug)
+        # Ids are not reused, removed recipes leave a gap with length zero.
+        doc_id = len(self._slugs)
+        self._ids[slug] = doc_id
+        self._slugs.append(slug)
+        self._digests[slug] = digest
+        self._doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self._lengths.append(length)
+        self._total_length += length
+        for term, tf in terms.items():
+            if term not in self._postings:
+                self._sorted_terms = None
+                self._postings[term] = {}
+            self._postings[term][doc_id] = tf
+            self._arrays.pop(term, None)
+        self._length_array = None
+
+    def _remove(self, slug: str) -> None:
+        doc_id = self._ids.pop(slug, None)
+        if doc_id is None:
+            return
+        self._slugs[doc_id] = None
+        del self._digests[slug]
+        self._total_length -= self._lengths[doc_id]
+        self._lengths[doc_id] = 0.0
+        for term in self._doc_terms.pop(doc_id):
+            posting = self._postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[term]
+                self._sorted_terms = None
+            self._arrays.pop(term, None)
+        self._length_array = None
@@ -0,0 +1,34 @@
+"""Settings of the command line interface, read from the environment and `.env`."""
+
+from pathlib import Path
+
+from pydantic import SecretStr
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from .extract import DEFAULT_TOKEN_BUDGET
+from .images import MAX_LONG_EDGE
+from .parser import DEFAULT_MAX_PAYLOAD_BYTES
+from .streaming import DEFAULT_DEADLINE
+
+
+class Settings(BaseSettings):
+    """Settings for the recipe parser."""
+
+    api_key: SecretStr
+    claude_model_name: str
+    anthropic_base_url: str | None = None
+    cache_dir: Path = Path(".recipe-cache")
+    cache_max_size_mb: int = 256
+    cache_max_age_days: int = 30
+    token_budget: int = DEFAULT_TOKEN_BUDGET
+    http_cache_dir: Path = Path(".http-cache")
+    http2: bool = False
+    fetch_per_host_limit: int = 4
+    image_max_long_edge: int = MAX_LONG_EDGE
+    image_quality: int = 85
+    image_crop: bool = False
+    max_payload_mb: int = DEFAULT_MAX_PAYLOAD_BYTES // 2**20
+    profile_log: Path | None = None
+    request_deadline_seconds: float = DEFAULT_DEADLINE
+
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
@@ -0,0 +1,231 @@
+"""Scale recipes to a number of servings and aggregate shopping lists with numpy."""
+
+import threading
+from collections.abc import Iterable
+
+import numpy as np
+from pydantic import BaseModel
+
+from .models import Ingredient, MeasurementUnit, Recipe
+from .pantry import normalize_ingredient
+
+# Units are packed as their position in MeasurementUnit. Every unit belongs to a
+# dimension and converts to the base unit of its dimension with a factor, spoons
+# are metric: a teaspoon is 5 ml and a tablespoon 15 ml.
+UNITS = list(MeasurementUnit)
+UNIT_CODES = {unit: code for code, unit in enumerate(UNITS)}
+VOLUME, MASS, COUNT, PINCHES, UNMEASURED = range(5)
+DIMENSION_COUNT = 5
+_UNIT_TABLE = {
+    MeasurementUnit.ML: (VOLUME, 1.0),
+    MeasurementUnit.L: (VOLUME, 1000.0),
+    MeasurementUnit.TSP: (VOLUME, 5.0),
+    MeasurementUnit.TBSP: (VOLUME, 15.0),
+    MeasurementUnit.G: (MASS, 1.0),
+    MeasurementUnit.KG: (MASS, 1000.0),
+    MeasurementUnit.PIECE: (COUNT, 1.0),
+    MeasurementUnit.PINCH: (PINCHES, 1.0),
+    MeasurementUnit.TO_TASTE: (UNMEASURED, 1.0),
+}
+DIMENSIONS = np.array([_UNIT_TABLE[unit][0] for unit in UNITS], dtype=np.int64)
+FACTORS = np.array([_UNIT_TABLE[unit][1] for unit in UNITS])
+IS_SPOON = np.array([unit in (MeasurementUnit.TSP, MeasurementUnit.TBSP) for unit in UNITS])
+
+ML = UNIT_CODES[MeasurementUnit.ML]
+L = UNIT_CODES[MeasurementUnit.L]
+TSP = UNIT_CODES[MeasurementUnit.TSP]
+TBSP = UNIT_CODES[MeasurementUnit.TBSP]
+G = UNIT_CODES[MeasurementUnit.G]
+KG = UNIT_CODES[MeasurementUnit.KG]
+PIECE = UNIT_CODES[MeasurementUnit.PIECE]
+PINCH = UNIT_CODES[MeasurementUnit.PINCH]
+TO_TASTE = UNIT_CODES[MeasurementUnit.TO_TASTE]
+
+# Small volumes measured with spoons stay in spoons up to this many millilitres.
+MAX_SPOON_ML = 60.0
+
+
+class ShoppingItem(BaseModel):
+    """Total amount of an ingredient over a plan, with the recipes that need it."""
+
+    name: str
+    quantity: float
+    unit: MeasurementUnit
+    recipes: list[str]
+
+
+class ShoppingList(BaseModel):
+    """Ingredients to buy for a plan, and the requested recipes that are not known."""
+
+    items: list[ShoppingItem]
+    missing: list[str] = []
+
+
+def convert(quantity: float, unit: MeasurementUnit, to: MeasurementUnit) -> float:
+    """Quantity in another unit of the same dimension, e.g. tablespoons to millilitres."""
+    source, target = UNIT_CODES[unit], UNIT_CODES[to]
+    if DIMENSIONS[source] != DIMENSIONS[target]:
+        raise ValueError(f"cannot convert {unit.value} to {to.value}")
+    return quantity * FACTORS[source] / FACTORS[target]
+
+
+def display_units(dimensions: np.ndarray, base: np.ndarray, spoons: np.ndarray) -> np.ndarray:
+    """Readable unit codes for quantities in base units.
+
+    Kilograms from 1000 g, litres from 1000 ml, and spoons for small volumes that
+    were measured with spoons.
+    """
+    return np.select(
+        [
+            (dimensions == VOLUME) & spoons & (base < MAX_SPOON_ML) & (base >= FACTORS[TBSP]),
+            (dimensions == VOLUME) & spoons & (base < MAX_SPOON_ML),
+            (dimensions == VOLUME) & (base >= 1000),
+            dimensions == VOLUME,
+            (dimensions == MASS) & (base >= 1000),
+            dimensions == MASS,
+            dimensions == COUNT,
+            dimensions == PINCHES,
+        ],
+        [TBSP, TSP, L, ML, KG, G, PIECE, PINCH],
+        default=TO_TASTE,
+    )
+
+
+def round_quantities(quantities: np.ndarray, units: np.ndarray, whole_pieces: bool = False) -> np.ndarray:
+    """Round to what a kitchen measures.
+
+    Quarters of spoons and pieces, whole grams and millilitres and steps of 5 from
+    100 up. With `whole_pieces`, pieces are rounded up to whole ones to buy.
+    """
+    steps = np.select(
+        [
+            np.isin(units, [TSP, TBSP, PINCH, PIECE]),
+            np.isin(units, [KG, L]),
+            quantities >= 100,
+            quantities >= 10,
+        ],
+        [0.25, 0.01, 5.0, 1.0],
+        default=0.1,
+    )
+    rounded = np.maximum(np.round(quantities / steps) * steps, steps)
+    if whole_pieces:
+        rounded = np.where(units == PIECE, np.maximum(np.ceil(quantities - 1e-9), 1.0), rounded)
+    # Nothing to measure for "to taste", it stays a single mention.
+    return np.where(units == TO_TASTE, 1.0, rounded)
+
+
+def scale_recipe(recipe: Recipe, servings: int) -> Recipe:
+    """The recipe for another number of servings, in readable units."""
+    units = np.array([UNIT_CODES[ingredient.unit] for ingredient in recipe.ingredients], dtype=np.int64)
+    quantities = np.array([ingredient.quantity for ingredient in recipe.ingredients])
+    base = quantities * (servings / recipe.servings) * FACTORS[units]
+    scaled_units = display_units(DIMENSIONS[units], base, IS_SPOON[units])
+    scaled = round_quantities(base / FACTORS[scaled_units], scaled_units)
+    ingredients = [
+        ingredient.model_copy(update={"quantity": float(quantity), "unit": UNITS[unit]})
+        for ingredient, quantity, unit in zip(recipe.ingredients, scaled, scaled_units)
+    ]
+    return recipe.model_copy(update={"servings": servings, "ingredients": ingredients})
+
+
+def parse_plan(text: str, servings: int | None = None) -> list[tuple[str, int | None]]:
+    """Plan from recipe slugs separated by commas or lines, `slug:servings` for other servings.
+
+    Raises ValueError when servings are not a positive whole number.
+    """
+    plan = []
+    for item in text.replace("\n", ",").split(","):
+        slug, _, count = (part.strip() for part in item.partition(":"))
+        if not slug:
+            continue
+        try:
+            planned = int(count) if count else servings
+        except ValueError:
+            raise ValueError(f"servings of {slug} must be a whole number, not '{count}'") from None
+        if planned is not None and planned < 1:
+            raise ValueError(f"servings of {slug} must be at least 1")
+        plan.append((slug, planned))
+    return plan
+
+
+class ShoppingIndex:
+    """Ingredients of every recipe packed as arrays of name ids, unit codes and quantities.
+
+    A shopping list concatenates the arrays of the planned recipes, so scaling,
+    converting and summing run as a few array operations however long the plan is.
+    """
+
+    def __init__(self):
+        self._name_ids: dict[str, int] = {}
+        self._names: list[str] = []
+        self._recipes: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._recipes
+
+    def update(self, slug: str, recipe: Recipe | None, digest: str | None = None) -> None:
+        """Pack a new or changed recipe, or remove it when the recipe is None."""
+        with self._lock:
+            if recipe is None:
+                self._recipes.pop(slug, None)
+                return
+            names = np.array([self._name_id(ingredient) for ingredient in recipe.ingredients], dtype=np.int64)
+            units = np.array([UNIT_CODES[ingredient.unit] for ingredient in recipe.ingredients], dtype=np.int64)
+            quantities = np.array([ingredient.quantity for ingredient in recipe.ingredients], dtype=np.float64)
+            self._recipes[slug] = (names, units, quantities, recipe.servings)
+
+    def shopping_list(self, plan: Iterable[tuple[str, int | None]]) -> ShoppingList:
+        """Everything to buy for pairs of a recipe slug and a number of servings.
+
+        None keeps the servings of the recipe, and a recipe planned twice is bought
+        for twice. The same ingredient in compatible units is added up, e.g.
+        tablespoons and millilitres of milk.
+        """
+        plan = list(plan)
+        with self._lock:
+            packed = [(slug, self._recipes[slug], servings) for slug, servings in plan if slug in self._recipes]
+            missing = list(dict.fromkeys(slug for slug, _ in plan if slug not in self._recipes))
+            names = list(self._names)
+        if not packed:
+            return ShoppingList(items=[], missing=missing)
+
+        slugs = [slug for slug, _, _ in packed]
+        lengths = np.array([len(arrays[0]) for _, arrays, _ in packed])
+        rows = np.repeat(np.arange(len(packed)), lengths)
+        name_ids = np.concatenate([arrays[0] for _, arrays, _ in packed])
+        units = np.concatenate([arrays[1] for _, arrays, _ in packed])
+        quantities = np.concatenate([arrays[2] for _, arrays, _ in packed])
+        factors = np.array([(servings or arrays[3]) / arrays[3] for _, arrays, servings in packed])
+
+        dimensions = DIMENSIONS[units]
+        base = quantities * factors[rows] * FACTORS[units]
+        # One item per ingredient and dimension, grams of butter and pieces of butter stay apart.
+        keys, items = np.unique(name_ids * DIMENSION_COUNT + dimensions, return_inverse=True)
+        totals = np.bincount(items, weights=base, minlength=len(keys))
+        spoons = np.bincount(items, weights=IS_SPOON[units], minlength=len(keys)) == np.bincount(items)
+        item_units = display_units(keys % DIMENSION_COUNT, totals, spoons)
+        item_quantities = round_quantities(totals / FACTORS[item_units], item_units, whole_pieces=True)
+
+        # Sorted unique (item, recipe) pairs, split into the recipes of every item.
+        pairs = np.unique(items * len(packed) + rows)
+        groups = np.split(pairs % len(packed), np.flatnonzero(np.diff(pairs // len(packed))) + 1)
+        recipes = [list(dict.fromkeys(slugs[row] for row in group)) for group in groups]
+
+        shopping = [
+            ShoppingItem(name=names[key // DIMENSION_COUNT], quantity=float(quantity), unit=UNITS[unit], recipes=used_by)
+            for key, quantity, unit, used_by in zip(keys, item_quantities, item_units, recipes)
+        ]
+        shopping.sort(key=lambda item: item.name)
+        return ShoppingList(items=shopping, missing=missing)
+
+    def _name_id(self, ingredient: Ingredient) -> int:
+        """Id of the normalised name, items are shown with the first name seen for it."""
+        name = normalize_ingredient(ingredient.name) or ingredient.name.lower()
+        if name not in self._name_ids:
+            self._name_ids[name] = len(self._names)
+            self._names.append(ingredient.name.lower())
+        return self._name_ids[name]
@@ -0,0 +1,220 @@
+"""Prerender the recipe collection as a static site that any file server can serve."""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from fasthtml.common import *
+from monsterui.core import *
+from pydantic import BaseModel, ValidationError
+
+from .models import Recipe
+from .render import difficulty_to_stars, render_recipe
+from .store import RecipeStore
+from .summary import RecipeSummary
+from .utils import atomic_write, format_duration
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".site-manifest.json"
+SEARCH_DATA_NAME = "search.json"
+
+# Bump when the page layout changes so every page is rendered again.
+SITE_VERSION = "1"
+
+# Starting worker processes costs more than rendering a handful of pages.
+MIN_POOL_PAGES = 16
+
+# Filters the index page with the search data, which is only fetched once something is typed.
+SEARCH_SCRIPT = """
+const input = document.getElementById("search");
+let documents;
+input.addEventListener("input", async () => {
+    documents ??= await (await fetch("search.json")).json();
+    const words = input.value.toLowerCase().split(/\\s+/).filter(Boolean);
+    for (const item of document.querySelectorAll("#recipes li")) {
+        const text = documents[item.dataset.slug] || "";
+        item.hidden = !words.every(word => text.includes(word));
+    }
+});
+"""
+
+
+class SitePage(BaseModel):
+    """A rendered recipe page, with what the index page and the search data need."""
+
+    version: str
+    digest: str
+    summary: RecipeSummary
+    search_text: str
+
+
+class SiteManifest(BaseModel):
+    """Rendered pages by slug, to render only the recipes that changed since the last export."""
+
+    version: str = SITE_VERSION
+    pages: dict[str, SitePage] = {}
+
+    @classmethod
+    def load(cls, site_dir: Path) -> "SiteManifest":
+        """The manifest of the last export, empty when there is none or the layout changed."""
+        try:
+            manifest = cls.model_validate_json((site_dir / MANIFEST_NAME).read_bytes())
+        except (OSError, ValidationError):
+            return cls()
+        return manifest if manifest.version == SITE_VERSION else cls()
+
+    def save(self, site_dir: Path) -> None:
+        atomic_write(site_dir / MANIFEST_NAME, self.model_dump_json())
+
+
+class SiteReport(BaseModel):
+    """What an export did."""
+
+    rendered: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failed: list[str] = []
+
+
+@functools.cache
+def _headers() -> list:
+    return Theme.slate.headers()
+
+
+def html_page(title: str, *content) -> str:
+    """A complete HTML document with the theme of the web app."""
+    return to_xml(Html(
+        Head(Meta(charset="utf-8"), Meta(name="viewport", content="width=device-width, initial-scale=1"), Title(title), *_headers()),
+        Body(*content),
+    ))
+
+
+def recipe_page_path(site_dir: Path, slug: str) -> Path:
+    """Pages are index files in a directory per recipe, so they are served at /recipes/<slug>/ like in the app."""
+    return site_dir / "recipes" / slug / "index.html"
+
+
+def search_text(recipe: Recipe) -> str:
+    """Lowercase text of the fields the web app searches, for the search data."""
+    fields = [recipe.title, recipe.description, recipe.cuisine_type or "", recipe.category.value if recipe.category else ""]
+    fields += recipe.tags + [ingredient.name for ingredient in recipe.ingredients]
+    return " ".join(" ".join(fields).lower().split())
+
+
+def render_page(site_dir: Path, slug: str, data: bytes) -> tuple[RecipeSummary, str] | str:
+    """Render and write the page of a recipe, returns its summary and search text or an error.
+
+    Runs in the worker processes, the recipe is validated there as well.
+    """
+    try:
+        recipe = Recipe.model_validate_json(data)
+    except ValidationError as e:
+        return str(e)
+    path = recipe_page_path(site_dir, slug)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, html_page(recipe.title, render_recipe(recipe)))
+    return RecipeSummary.from_recipe(slug, recipe), search_text(recipe)
+
+
+def _render_chunk(site_dir: Path, jobs: list[tuple[str, bytes]]) -> list[tuple[RecipeSummary, str] | str]:
+    return [render_page(site_dir, slug, data) for slug, data in jobs]
+
+
+def index_page(summaries: list[RecipeSummary]) -> str:
+    """All recipes with a search box that filters them."""
+    return html_page("Recipes", Div(
+        Article(
+            Input(type="search", id="search", placeholder="Search recipes, ingredients or tags", cls="mb-3"),
+            Ul(
+                *[Li(
+                    A(summary.title, href=f"recipes/{summary.slug}/", cls="font-medium"),
+                    P(
+                        f"{difficulty_to_stars(summary.difficulty)} · {format_duration(summary.total_time)}",
+                        cls="text-sm text-gray-500"
+                    ),
+                    data_slug=summary.slug,
+                    cls="p-2 border-b"
+                ) for summary in summaries],
+                id="recipes",
+                cls="divide-y rounded-lg bg-card"
+            ),
+            Script(SEARCH_SCRIPT),
+            cls="max-w-4xl mx-auto p-10 bg-background rounded-xl shadow-lg"
+        ),
+        cls="min-h-screen bg-muted p-2 md:p-4"
+    ))
+
+
+def build_site(store: RecipeStore, site_dir: Path, workers: int | None = None, force: bool = False) -> SiteReport:
+    """Render the recipe pages, the index page and the search data into a directory.
+
+    Only recipes whose JSON changed since the last export are rendered again, unless
+    `force` is set, in a pool of worker processes when there are enough of them.
+    Recipes that fail validation are skipped and their old page is removed.
+    """
+    site_dir.mkdir(parents=True, exist_ok=True)
+    manifest = SiteManifest.load(site_dir)
+    report = SiteReport()
+
+    # The store's version marker is cheap, the digest of the JSON is only computed when it changed.
+    jobs: list[tuple[str, bytes]] = []
+    markers: dict[str, tuple[str, str]] = {}
+    versions = {slug: json.dumps(version) for slug, version in store.versions().items()}
+    for slug, version in versions.items():
+        page = manifest.pages.get(slug)
+        if not force and page is not None and page.version == version:
+            report.unchanged += 1
+            continue
+        data = store.read(slug)
+        if data is None:
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        if not force and page is not None and page.digest == digest:
+            page.version = version
+            report.unchanged += 1
+            continue
+        markers[slug] = (version, digest)
+        jobs.append((slug, data))
+
+    for slug, result in zip((slug for slug, _ in jobs), _render(site_dir, jobs, workers)):
+        if isinstance(result, str):
+            logger.warning(f"skipping recipe {store.location(slug)}: {result}")
+            report.failed.append(slug)
+            continue
+        summary, text = result
+        version, digest = markers[slug]
+        manifest.pages[slug] = SitePage(version=version, digest=digest, summary=summary, search_text=text)
+        report.rendered += 1
+
+    removed = [slug for slug in manifest.pages if slug not in versions]
+    for slug in removed + report.failed:
+        manifest.pages.pop(slug, None)
+        shutil.rmtree(recipe_page_path(site_dir, slug).parent, ignore_errors=True)
+    report.removed = len(removed)
+
+    if report.rendered or report.removed or report.failed or not (site_dir / "index.html").exists():
+        pages = [manifest.pages[slug] for slug in sorted(manifest.pages)]
+        atomic_write(site_dir / "index.html", index_page([page.summary for page in pages]))
+        search_data = {slug: manifest.pages[slug].search_text for slug in sorted(manifest.pages)}
+        atomic_write(site_dir / SEARCH_DATA_NAME, json.dumps(search_data, ensure_ascii=False))
+    manifest.save(site_dir)
+    return report
+
+
+def _render(site_dir: Path, jobs: list[tuple[str, bytes]], workers: int | None) -> list[tuple[RecipeSummary, str] | str]:
+    """Render pages in worker processes, in chunks so every worker gets a few at a time."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < MIN_POOL_PAGES:
+        return _render_chunk(site_dir, jobs)
+
+    size = max(1, len(jobs) // (workers * 4))
+    chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+    with ProcessPoolExecutor(workers) as pool:
+        results = pool.map(functools.partial(_render_chunk, site_dir), chunks)
+        return [result for chunk in results for result in chunk]
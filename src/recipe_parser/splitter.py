@@ -0,0 +1,92 @@
+"""Split markdown or text books into one chunk per recipe without loading the whole book."""
+
+import re
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from .parser import Base64Input
+
+# Recipes start at a second level markdown heading.
+DEFAULT_HEADING_PATTERN = r"^\s*##\s(.+)$"
+
+
+class BookChunk(BaseModel):
+    """A single recipe of a book."""
+
+    index: int
+    title: str
+    filename: str
+    content: str
+
+    @property
+    def text(self) -> str:
+        """Markdown of the recipe with its title as heading."""
+        return f"# {self.title}\n\n{self.content}"
+
+    def to_input(self) -> "Base64Input":
+        """Claude input for the recipe."""
+        from .parser import Base64Input
+
+        return Base64Input(data=self.text, file_type="text/plain")
+
+
+def iter_lines(path: Path) -> Iterator[str]:
+    """Read a file line by line, only one buffer is in memory at a time."""
+    with path.open("r", encoding="utf-8") as f:
+        yield from f
+
+
+def split_book(lines: Iterable[str], heading_pattern: str = DEFAULT_HEADING_PATTERN) -> Iterator[BookChunk]:
+    """Yield a chunk for every recipe heading, text before the first heading is skipped.
+
+    Titles that map to the same file name get a numeric suffix in the order they
+    appear, so repeated runs always produce the same files.
+    """
+    heading = re.compile(heading_pattern)
+    used: set[str] = set()
+    title = None
+    content: list[str] = []
+    index = 0
+
+    def make_chunk() -> BookChunk:
+        base = filename = _filename(title)
+        count = 1
+        # Compare case-insensitively, macOS and Windows file systems do.
+        while filename.lower() in used:
+            count += 1
+            filename = f"{base}_{count}"
+        used.add(filename.lower())
+        return BookChunk(index=index, title=title, filename=f"{filename}.md", content="".join(content).strip())
+
+    for line in lines:
+        if match := heading.match(line):
+            if title is not None:
+                yield make_chunk()
+                index += 1
+            title = match[1].strip()
+            content = []
+        elif title is not None:
+            content.append(line)
+
+    if title is not None:
+        yield make_chunk()
+
+
+def write_chunks(chunks: Iterable[BookChunk], output_dir: Path, batch_size: int = 256) -> Iterator[BookChunk]:
+    """Write chunks to markdown files in batches and pass them on once written."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    chunks = iter(chunks)
+    with ThreadPoolExecutor() as executor:
+        while batch := list(islice(chunks, batch_size)):
+            list(executor.map(lambda chunk: (output_dir / chunk.filename).write_text(chunk.text, encoding="utf-8"), batch))
+            yield from batch
+
+
+def _filename(title: str) -> str:
+    return re.sub(r"[^\w\-_\. ]", "_", title)
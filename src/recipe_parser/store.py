@@ -0,0 +1,335 @@
+"""Storage backends for parsed recipes: a directory of JSON files or a single SQLite file."""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Hashable, Iterable, Iterator
+from itertools import count, islice
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from .journal import Journal
+from .models import Recipe
+from .search import INDEX_DIR, append_to_journal
+from .summary import RecipeSummary
+from .utils import atomic_write, slugify
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+# Summaries of a directory store, an append-only journal next to the search journal.
+SUMMARY_JOURNAL_NAME = "summaries.jsonl"
+
+
+class RecipeStore(ABC):
+    """Recipes stored as JSON by slug.
+
+    Every write also stores a summary of the recipe for listings and is recorded in
+    the search journal under `index_dir`, so the web app picks it up without
+    validating or tokenising the whole store.
+    """
+
+    index_dir: Path
+    # Held while a slug is chosen and written, so two recipes never claim the same slug.
+    _claim_lock = threading.Lock()
+
+    @abstractmethod
+    def versions(self) -> dict[str, Hashable]:
+        """Cheap marker per slug that changes whenever the recipe changes."""
+
+    @abstractmethod
+    def read(self, slug: str) -> bytes | None:
+        """JSON of a recipe, or None when there is no recipe with the slug."""
+
+    @abstractmethod
+    def iter_raw(self) -> Iterator[tuple[str, bytes]]:
+        """Slug and JSON of every recipe, one at a time."""
+
+    @abstractmethod
+    def iter_summaries(self) -> Iterator[tuple[RecipeSummary, str]]:
+        """Summary and digest of every recipe, sorted by slug."""
+
+    @abstractmethod
+    def location(self, slug: str) -> Path:
+        """Where a recipe is stored, for messages."""
+
+    @abstractmethod
+    def _write(self, items: list[tuple[str, bytes, str, RecipeSummary]]) -> None:
+        """Store recipes as (slug, JSON, digest, summary) tuples."""
+
+    @abstractmethod
+    def _delete(self, slug: str) -> bool:
+        """Remove a recipe, returns whether it existed."""
+
+    def close(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self.versions())
+
+    def __contains__(self, slug: str) -> bool:
+        return self.read(slug) is not None
+
+    def __iter__(self) -> Iterator[tuple[str, Recipe]]:
+        for slug, data in self.iter_raw():
+            yield slug, Recipe.model_validate_json(data)
+
+    def get(self, slug: str) -> Recipe | None:
+        data = self.read(slug)
+        return Recipe.model_validate_json(data) if data is not None else None
+
+    def put(self, recipe: Recipe, slug: str | None = None) -> Path:
+        """Store a recipe under the given slug, replacing it, or under a new slug from its title."""
+        if slug is None:
+            slug = self.add(recipe)
+        else:
+            self.put_many([(slug, recipe)])
+        return self.location(slug)
+
+    def add(self, recipe: Recipe, replace: str | None = None) -> str:
+        """Store a recipe under a slug from its title and return the slug.
+
+        A different recipe that already has the slug is kept and the new one gets a
+        numeric suffix, e.g. 'mac-cheese-2'. The same recipe keeps its slug, and
+        `replace` is the slug of an older version of the recipe that may be replaced.
+        """
+        base = slugify(recipe.title)
+        data = recipe.model_dump_json().encode()
+        with self._claim_lock:
+            for number in count(1):
+                slug = base if number == 1 else f"{base}-{number}"
+                if slug == replace or (existing := self.read(slug)) is None or existing == data:
+                    break
+            self.put_many([(slug, recipe)])
+        return slug
+
+    def put_many(self, recipes: Iterable[tuple[str, Recipe]], batch_size: int = 500) -> int:
+        """Store recipes in batches, returns the number of stored recipes."""
+        recipes = iter(recipes)
+        count = 0
+        while batch := list(islice(recipes, batch_size)):
+            items = []
+            for slug, recipe in batch:
+                data = recipe.model_dump_json().encode()
+                items.append((slug, data, hashlib.sha256(data).hexdigest(), RecipeSummary.from_recipe(slug, recipe)))
+            self._write(items)
+            append_to_journal(self.index_dir, [(slug, recipe, digest) for (slug, recipe), (_, _, digest, _) in zip(batch, items)])
+            count += len(batch)
+        return count
+
+    def delete(self, slug: str) -> None:
+        if self._delete(slug):
+            append_to_journal(self.index_dir, [(slug, None, None)])
+
+
+class DirectoryStore(RecipeStore):
+    """One JSON file per recipe, named after the slug."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.index_dir = path / INDEX_DIR
+        path.mkdir(parents=True, exist_ok=True)
+
+    def versions(self) -> dict[str, Hashable]:
+        versions = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    stat = entry.stat()
+                    versions[entry.name.removesuffix(".json")] = (stat.st_mtime_ns, stat.st_size)
+        return versions
+
+    def read(self, slug: str) -> bytes | None:
+        try:
+            return self.location(slug).read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    def iter_raw(self) -> Iterator[tuple[str, bytes]]:
+        for slug in sorted(self.versions()):
+            if (data := self.read(slug)) is not None:
+                yield slug, data
+
+    def iter_summaries(self) -> Iterator[tuple[RecipeSummary, str]]:
+        """Replay the summary journal, summarising files that were added without the store."""
+        journal = Journal(self.index_dir / SUMMARY_JOURNAL_NAME)
+        summaries: dict[str, tuple[RecipeSummary, str]] = {}
+        for entry in journal.replay():
+            if entry["summary"] is None:
+                summaries.pop(entry["slug"], None)
+            else:
+                summary = RecipeSummary.model_validate(entry["summary"])
+                summaries[summary.slug] = (summary, entry["digest"])
+
+        slugs = sorted(self.versions())
+        missing = []
+        for slug in slugs:
+            if slug in summaries or (data := self.read(slug)) is None:
+                continue
+            try:
+                recipe = Recipe.model_validate_json(data)
+            except ValidationError as e:
+                logger.warning(f"skipping recipe {self.location(slug)}: {e}")
+                continue
+            summaries[slug] = (RecipeSummary.from_recipe(slug, recipe), hashlib.sha256(data).hexdigest())
+            missing.append(summaries[slug])
+
+        if journal.is_outdated(len(slugs)):
+            self._rewrite_summaries([summaries[slug] for slug in slugs if slug in summaries])
+        elif missing:
+            self._append_summaries([(summary.slug, summary, digest) for summary, digest in missing])
+
+        for slug in slugs:
+            if slug in summaries:
+                yield summaries[slug]
+
+    def location(self, slug: str) -> Path:
+        if "/" in slug or "\\" in slug or slug.startswith("."):
+            raise ValueError(f"invalid recipe slug {slug!r}")
+        return self.path / f"{slug}.json"
+
+    def _write(self, items: list[tuple[str, bytes, str, RecipeSummary]]) -> None:
+        for slug, data, _, _ in items:
+            atomic_write(self.location(slug), data)
+        self._append_summaries([(slug, summary, digest) for slug, _, digest, summary in items])
+
+    def _delete(self, slug: str) -> bool:
+        try:
+            self.location(slug).unlink()
+        except FileNotFoundError:
+            return False
+        self._append_summaries([(slug, None, None)])
+        return True
+
+    def _append_summaries(self, entries: list[tuple[str, RecipeSummary | None, str | None]]) -> None:
+        """Record summaries, a None summary marks a removed recipe."""
+        Journal(self.index_dir / SUMMARY_JOURNAL_NAME).append(
+            json.dumps({
+                "slug": slug,
+                "digest": digest,
+                "summary": summary.model_dump(mode="json") if summary is not None else None,
+            })
+            for slug, summary, digest in entries
+        )
+
+    def _rewrite_summaries(self, summaries: list[tuple[RecipeSummary, str]]) -> None:
+        Journal(self.index_dir / SUMMARY_JOURNAL_NAME).rewrite(
+            json.dumps({"slug": summary.slug, "digest": digest, "summary": summary.model_dump(mode="json")})
+            for summary, digest in summaries
+        )
+
+
+class SQLiteStore(RecipeStore):
+    """All recipes in a single SQLite file, safe to share between threads."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.index_dir = path.with_name(f"{path.name}{INDEX_DIR}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS recipes (slug TEXT PRIMARY KEY, digest TEXT NOT NULL, data BLOB NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS summaries (slug TEXT PRIMARY KEY, digest TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        # Readers such as the web app do not block the parser while it writes.
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def versions(self) -> dict[str, Hashable]:
+        with self._lock:
+            return dict(self._connection.execute("SELECT slug, digest FROM recipes"))
+
+    def read(self, slug: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM recipes WHERE slug = ?", (slug,)).fetchone()
+        return row[0] if row else None
+
+    def iter_raw(self) -> Iterator[tuple[str, bytes]]:
+        # A connection of its own, so writes can go on while the iteration is paused.
+        connection = self._connect()
+        try:
+            cursor = connection.execute("SELECT slug, data FROM recipes ORDER BY slug")
+            while rows := cursor.fetchmany(256):
+                yield from rows
+        finally:
+            connection.close()
+
+    def iter_summaries(self) -> Iterator[tuple[RecipeSummary, str]]:
+        """Stored summaries, recipes from before summaries were stored are summarised first."""
+        with self._lock:
+            outdated = self._connection.execute(
+                "SELECT recipes.slug, recipes.data, recipes.digest FROM recipes LEFT JOIN summaries USING (slug) "
+                "WHERE summaries.digest IS NULL OR summaries.digest != recipes.digest"
+            ).fetchall()
+        if outdated:
+            rows = []
+            for slug, data, digest in outdated:
+                try:
+                    summary = RecipeSummary.from_recipe(slug, Recipe.model_validate_json(data))
+                except ValidationError as e:
+                    logger.warning(f"skipping recipe {self.location(slug)}: {e}")
+                    continue
+                rows.append((slug, digest, summary.model_dump_json()))
+            with self._lock, self._connection:
+                self._connection.executemany("INSERT OR REPLACE INTO summaries (slug, digest, data) VALUES (?, ?, ?)", rows)
+
+        connection = self._connect()
+        try:
+            cursor = connection.execute("SELECT data, digest FROM summaries ORDER BY slug")
+            while rows := cursor.fetchmany(1024):
+                for data, digest in rows:
+                    yield RecipeSummary.model_validate_json(data), digest
+        finally:
+            connection.close()
+
+    def location(self, slug: str) -> Path:
+        return self.path / slug
+
+    def _write(self, items: list[tuple[str, bytes, str, RecipeSummary]]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO recipes (slug, data, digest) VALUES (?, ?, ?)",
+                [(slug, data, digest) for slug, data, digest, _ in items],
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO summaries (slug, digest, data) VALUES (?, ?, ?)",
+                [(slug, digest, summary.model_dump_json()) for slug, _, digest, summary in items],
+            )
+
+    def _delete(self, slug: str) -> bool:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM summaries WHERE slug = ?", (slug,))
+            return self._connection.execute("DELETE FROM recipes WHERE slug = ?", (slug,)).rowcount > 0
+
+
+def open_store(path: Path) -> RecipeStore:
+    """SQLite store for .db, .sqlite and .sqlite3 files, a directory of JSON files otherwise."""
+    if path.suffix in SQLITE_SUFFIXES:
+        return SQLiteStore(path)
+    return DirectoryStore(path)
+
+
+def copy_recipes(source: RecipeStore, target: RecipeStore, batch_size: int = 500) -> int:
+    """Copy every recipe to another store, keeping the slugs."""
+    return target.put_many(iter(source), batch_size=batch_size)
@@ -0,0 +1,219 @@
+"""Streamed Claude requests with incremental tool input, deadlines and hedged requests."""
+
+import asyncio
+import json
+import logging
+import statistics
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
+
+import jiter
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic, AsyncAnthropic
+    from anthropic.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Seconds a single request may take, from sending it to the last streamed event.
+DEFAULT_DEADLINE = 300.0
+
+# The partial tool input is only parsed again after a delta that can complete what is
+# reported next: the closing quote of the title, then the closing brace of an ingredient.
+TITLE_END = frozenset('"')
+INGREDIENT_END = frozenset("}")
+
+ProgressCallback = Callable[[str, Any], None]
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a request does not finish within its deadline."""
+
+
+class ToolInputProgress:
+    """Reports the title and the ingredients of a recipe as soon as they are complete.
+
+    The callback receives ("title", str) once and ("ingredient", dict) for every
+    ingredient, in order.
+    """
+
+    def __init__(self, on_progress: ProgressCallback):
+        self.on_progress = on_progress
+        self._title_sent = False
+        self._ingredients_sent = 0
+        self._done = False
+
+    def feed(self, buffer: str, delta: str) -> None:
+        """Look at the partial input after a delta was appended to it."""
+        if self._done or (INGREDIENT_END if self._title_sent else TITLE_END).isdisjoint(delta):
+            return
+        try:
+            # Incomplete strings are left out, so every string in the snapshot is complete.
+            snapshot = jiter.from_json(buffer.encode(), partial_mode=True)
+        except ValueError:
+            return
+        if isinstance(snapshot, dict):
+            self._report(snapshot, final=False)
+
+    def finish(self, tool_input: dict) -> None:
+        if not self._done:
+            self._report(tool_input, final=True)
+
+    def _report(self, snapshot: dict, final: bool) -> None:
+        if not self._title_sent and isinstance(snapshot.get("title"), str):
+            self._title_sent = True
+            self.on_progress("title", snapshot["title"])
+
+        ingredients = snapshot.get("ingredients")
+        if not isinstance(ingredients, list):
+            return
+        # The last ingredient may still be streaming, unless a later field has started.
+        complete = final or next(reversed(snapshot)) != "ingredients"
+        if not complete:
+            ingredients = ingredients[:-1]
+        for ingredient in ingredients[self._ingredients_sent:]:
+            self.on_progress("ingredient", ingredient)
+        self._ingredients_sent = max(self._ingredients_sent, len(ingredients))
+        # Nothing left to report, the rest of the input is not parsed until it is complete.
+        self._done = complete and self._title_sent
+
+
+class MessageAccumulator:
+    """Builds the final message from the events of a streamed request."""
+
+    def __init__(self, on_progress: ProgressCallback | None = None):
+        self.message: "Message | None" = None
+        self._json: dict[int, list[str]] = {}
+        self._progress = ToolInputProgress(on_progress) if on_progress is not None else None
+
+    def add(self, event) -> None:
+        match event.type:
+            case "message_start":
+                self.message = event.message
+            case "content_block_start":
+                self.message.content.append(event.content_block)
+                if event.content_block.type == "tool_use":
+                    self._json[event.index] = []
+            case "content_block_delta":
+                block = self.message.content[event.index]
+                if event.delta.type == "text_delta":
+                    block.text += event.delta.text
+                elif event.delta.type == "input_json_delta":
+                    parts = self._json[event.index]
+                    parts.append(event.delta.partial_json)
+                    if self._progress is not None:
+                        self._progress.feed("".join(parts), event.delta.partial_json)
+            case "content_block_stop":
+                if (parts := self._json.pop(event.index, None)) is not None:
+                    block = self.message.content[event.index]
+                    block.input = json.loads("".join(parts)) if parts else {}
+                    if self._progress is not None:
+                        self._progress.finish(block.input)
+            case "message_delta":
+                self.message.stop_reason = event.delta.stop_reason
+                self.message.stop_sequence = event.delta.stop_sequence
+                self.message.usage.output_tokens = event.usage.output_tokens
+
+    def result(self) -> "Message":
+        if self.message is None:
+            raise ValueError("stream ended before the message started")
+        return self.message
+
+
+def stream_message(
+    client: "Anthropic",
+    request: dict,
+    deadline: float | None = DEFAULT_DEADLINE,
+    on_progress: ProgressCallback | None = None,
+) -> "Message":
+    """Send a request as a stream and return the complete message.
+
+    The deadline is checked after every event, and is the HTTP timeout as well so
+    a stream that stops sending events fails too.
+    """
+    start = time.monotonic()
+    accumulator = MessageAccumulator(on_progress)
+    options = {"timeout": deadline} if deadline is not None else {}
+    with client.messages.create(**request, stream=True, **options) as stream:
+        for event in stream:
+            accumulator.add(event)
+            if deadline is not None and time.monotonic() - start > deadline:
+                raise DeadlineExceededError(f"request did not finish within {deadline:g} seconds")
+    return accumulator.result()
+
+
+async def astream_message(
+    client: "AsyncAnthropic",
+    request: dict,
+    deadline: float | None = DEFAULT_DEADLINE,
+    on_progress: ProgressCallback | None = None,
+) -> "Message":
+    """Send a request as a stream and return the complete message, cancelled at the deadline."""
+    accumulator = MessageAccumulator(on_progress)
+    try:
+        async with asyncio.timeout(deadline):
+            async with await client.messages.create(**request, stream=True) as stream:
+                async for event in stream:
+                    accumulator.add(event)
+    except TimeoutError as e:
+        raise DeadlineExceededError(f"request did not finish within {deadline:g} seconds") from e
+    return accumulator.result()
+
+
+class LatencyTracker:
+    """Latencies of recent requests, to tell when a request is slower than most.
+
+    Safe to share between the tasks of one event loop.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20, quantile: float = 0.95):
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self._latencies: deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def threshold(self) -> float | None:
+        """The quantile of the recent latencies, None until there are enough samples."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        return statistics.quantiles(self._latencies, n=100, method="inclusive")[round(self.quantile * 100) - 1]
+
+
+async def hedged(request: Callable[[], Awaitable["Message"]], tracker: LatencyTracker) -> "Message":
+    """Await a request, and a duplicate when the first is slower than the tracked threshold.
+
+    The first request to succeed wins and the other one is cancelled. A hedge is only
+    sent once there are enough latencies to know what slow is, and at most once.
+    """
+
+    async def timed() -> "Message":
+        start = time.monotonic()
+        result = await request()
+        tracker.add(time.monotonic() - start)
+        return result
+
+    pending = {asyncio.ensure_future(timed())}
+    errors = []
+    try:
+        threshold = tracker.threshold()
+        if threshold is not None:
+            done, _ = await asyncio.wait(pending, timeout=threshold)
+            if not done:
+                logger.info(f"request is slower than {threshold:.1f} seconds, sending a hedged request")
+                pending.add(asyncio.ensure_future(timed()))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors.append(task.exception())
+        raise errors[0]
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
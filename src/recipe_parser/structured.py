@@ -0,0 +1,307 @@
+"""Map schema.org Recipe markup (JSON-LD or microdata) directly to the Recipe model."""
+
+import json
+import logging
+import re
+from datetime import timedelta
+from fractions import Fraction
+
+from bs4 import BeautifulSoup
+from pydantic import TypeAdapter, ValidationError
+
+from .models import DifficultyLevel, Ingredient, MealCategory, MeasurementUnit, Recipe, Step
+
+logger = logging.getLogger(__name__)
+
+UNIT_ALIASES = {
+    "g": MeasurementUnit.G,
+    "gr": MeasurementUnit.G,
+    "gram": MeasurementUnit.G,
+    "grams": MeasurementUnit.G,
+    "kg": MeasurementUnit.KG,
+    "kilo": MeasurementUnit.KG,
+    "kilogram": MeasurementUnit.KG,
+    "kilograms": MeasurementUnit.KG,
+    "ml": MeasurementUnit.ML,
+    "milliliter": MeasurementUnit.ML,
+    "milliliters": MeasurementUnit.ML,
+    "millilitre": MeasurementUnit.ML,
+    "millilitres": MeasurementUnit.ML,
+    "l": MeasurementUnit.L,
+    "liter": MeasurementUnit.L,
+    "liters": MeasurementUnit.L,
+    "litre": MeasurementUnit.L,
+    "litres": MeasurementUnit.L,
+    "tsp": MeasurementUnit.TSP,
+    "teaspoon": MeasurementUnit.TSP,
+    "teaspoons": MeasurementUnit.TSP,
+    "tbsp": MeasurementUnit.TBSP,
+    "tablespoon": MeasurementUnit.TBSP,
+    "tablespoons": MeasurementUnit.TBSP,
+    "pinch": MeasurementUnit.PINCH,
+    "pinches": MeasurementUnit.PINCH,
+    "piece": MeasurementUnit.PIECE,
+    "pieces": MeasurementUnit.PIECE,
+}
+
+# Words that are units but have no equivalent in MeasurementUnit, these are left to Claude.
+# Abbreviations such as 'c.' or 'T' are left to Claude as well, see _is_abbreviation.
+UNKNOWN_UNITS = {
+    "cup", "cups", "oz", "ounce", "ounces", "lb", "lbs", "pound", "pounds", "can", "cans",
+    "bunch", "bunches", "sprig", "sprigs", "package", "packages", "stick", "sticks", "quart",
+    "quarts", "pint", "pints", "dash", "handful", "clove", "cloves", "slice", "slices",
+    "tin", "tins", "jar", "jars", "bottle", "bottles", "packet", "packets", "pack", "packs", "pkg",
+    "box", "boxes", "bag", "bags", "carton", "cartons", "container", "containers", "tub", "tubs",
+    "sachet", "sachets", "envelope", "envelopes", "block", "blocks", "head", "heads", "stalk",
+    "stalks", "knob", "knobs", "tbs", "tbl", "tblsp", "gallon", "gallons", "inch", "inches",
+}
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4",
+    "⅕": "1/5", "⅖": "2/5", "⅗": "3/5", "⅘": "4/5", "⅙": "1/6",
+    "⅚": "5/6", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+
+_NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?"
+_QUANTITY_RE = re.compile(rf"^\s*(?P<quantity>{_NUMBER})(?:\s*(?:-|–|to)\s*(?:{_NUMBER}))?\s*")
+_UNIT_RE = re.compile(r"^(?P<unit>[a-zA-Z]+)\.?(?:\s+|$)")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+_timedelta = TypeAdapter(timedelta)
+
+
+def find_recipe_data(soup: BeautifulSoup) -> dict | None:
+    """Find the schema.org Recipe object in the page, JSON-LD first then microdata."""
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except json.JSONDecodeError:
+            continue
+        if (recipe := _find_recipe_object(data)) is not None:
+            return recipe
+
+    element = soup.find(itemtype=re.compile(r"schema\.org/Recipe$"))
+    if element is not None:
+        return _microdata_to_dict(element)
+
+    return None
+
+
+def recipe_from_structured(data: dict) -> Recipe | None:
+    """Map a schema.org Recipe object to a Recipe.
+
+    Returns None when a required field is missing or cannot be mapped exactly, in
+    which case the markup is handed to Claude instead.
+    """
+    try:
+        ingredients = [parse_ingredient(text) for text in _as_list(data.get("recipeIngredient") or data.get("ingredients"))]
+        instructions = _parse_instructions(data.get("recipeInstructions"))
+        prep_time, cook_time, total_time = _parse_times(data)
+        recipe = Recipe(
+            title=_text(data["name"]),
+            description=_text(data.get("description") or ""),
+            author=_author(data["author"]),
+            prep_time=prep_time,
+            cook_time=cook_time,
+            total_time=total_time,
+            servings=_servings(data["recipeYield"]),
+            difficulty=_difficulty(total_time, len(instructions)),
+            ingredients=ingredients,
+            instructions=instructions,
+            tags=_keywords(data.get("keywords")),
+            cuisine_type=next(iter(_as_list(data.get("recipeCuisine"))), None),
+            category=_category(data.get("recipeCategory")),
+        )
+    except (KeyError, TypeError, ValueError, ValidationError) as e:
+        logger.info(f"structured recipe data cannot be mapped directly: {e}")
+        return None
+
+    if not recipe.ingredients or not recipe.instructions:
+        return None
+    return recipe
+
+
+def parse_ingredient(text: str) -> Ingredient:
+    """Parse an ingredient line such as '200 g flour, sifted'.
+
+    Raises ValueError when a unit-like word after the quantity has no exact
+    MeasurementUnit equivalent, or the quantity is followed by a size such as
+    '1 (14 oz) can'. Only a quantity followed by a plain name is a PIECE.
+    """
+    text = _text(text)
+    for symbol, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, f" {fraction}")
+
+    match = _QUANTITY_RE.match(text)
+    if match is None:
+        # No quantity, e.g. 'salt and pepper' or 'olive oil, to serve'.
+        name, notes = _split_notes(text)
+        return Ingredient(name=name, quantity=1, unit=MeasurementUnit.TO_TASTE, notes=notes)
+
+    quantity = _parse_number(match["quantity"])
+    rest = text[match.end():]
+
+    if rest.startswith("("):
+        raise ValueError(f"quantity '{text}' has a size that needs normalisation")
+
+    unit = MeasurementUnit.PIECE
+    unit_match = _UNIT_RE.match(rest)
+    if unit_match is not None:
+        word = unit_match["unit"].lower()
+        if word in UNIT_ALIASES:
+            unit = UNIT_ALIASES[word]
+            rest = rest[unit_match.end():]
+        elif word in UNKNOWN_UNITS or _is_abbreviation(unit_match):
+            raise ValueError(f"unit '{unit_match['unit']}' needs normalisation")
+
+    name, notes = _split_notes(rest.removeprefix("of "))
+    return Ingredient(name=name, quantity=quantity, unit=unit, notes=notes)
+
+
+def _find_recipe_object(data) -> dict | None:
+    """Walk JSON-LD data, including @graph containers, for a Recipe object."""
+    if isinstance(data, list):
+        for item in data:
+            if (recipe := _find_recipe_object(item)) is not None:
+                return recipe
+    elif isinstance(data, dict):
+        types = data.get("@type")
+        if types == "Recipe" or (isinstance(types, list) and "Recipe" in types):
+            return data
+        if "@graph" in data:
+            return _find_recipe_object(data["@graph"])
+    return None
+
+
+def _microdata_to_dict(element) -> dict:
+    """Collect the itemprop values of a microdata Recipe element."""
+    data: dict = {}
+    for prop in element.find_all(itemprop=True):
+        if prop.find_parent(itemscope=True) is not element:
+            continue
+        if prop.has_attr("itemscope"):
+            value = {"name": _text(prop.get_text(" "))} | {
+                child["itemprop"]: _text(child.get("content") or child.get_text(" "))
+                for child in prop.find_all(itemprop=True)
+            }
+        else:
+            value = prop.get("content") or prop.get("datetime") or prop.get_text(" ")
+        for name in prop["itemprop"].split():
+            data.setdefault(name, []).append(value)
+
+    return {name: values[0] if len(values) == 1 and name != "recipeIngredient" else values for name, values in data.items()}
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def _text(value) -> str:
+    """Plain text of a value that may contain HTML tags and entities."""
+    text = BeautifulSoup(_TAG_RE.sub(" ", str(value)), "html.parser").get_text()
+    return " ".join(text.split())
+
+
+def _is_abbreviation(unit_match: re.Match) -> bool:
+    """Whether the word after a quantity looks like an abbreviated unit, e.g. 'c.', 'T' or 'pt'."""
+    return unit_match[0].rstrip().endswith(".") or len(unit_match["unit"]) <= 2
+
+
+def _split_notes(text: str) -> tuple[str, str | None]:
+    """Split an ingredient into its name and the notes after a comma or in parentheses."""
+    notes = [_text(note) for note in re.findall(r"\(([^)]*)\)", text)]
+    text = re.sub(r"\([^)]*\)", "", text)
+    name, _, after = text.partition(",")
+    if after.strip():
+        notes.insert(0, after.strip())
+    name = " ".join(name.split())
+    if not name:
+        raise ValueError("ingredient has no name")
+    return name, ", ".join(notes) or None
+
+
+def _parse_number(value: str) -> float:
+    return float(sum(Fraction(part.replace(",", ".")) for part in value.split()))
+
+
+def _parse_instructions(value) -> list[Step]:
+    """Flatten text, HowToStep and HowToSection instructions into ordered steps."""
+    texts = []
+
+    def collect(item):
+        if isinstance(item, list):
+            for child in item:
+                collect(child)
+        elif isinstance(item, dict):
+            if "itemListElement" in item:
+                collect(item["itemListElement"])
+            else:
+                collect(item.get("text") or item.get("name"))
+        elif item:
+            texts.extend(line for line in (_text(line) for line in str(item).splitlines()) if line)
+
+    collect(value)
+    return [Step(order=order, instruction=text) for order, text in enumerate(texts, start=1)]
+
+
+def _parse_times(data: dict) -> tuple[timedelta, timedelta, timedelta]:
+    """Read ISO-8601 durations and derive a missing one from the other two."""
+    prep, cook, total = (
+        _timedelta.validate_python(data[key]) if data.get(key) else None
+        for key in ("prepTime", "cookTime", "totalTime")
+    )
+    if total is None and prep is not None and cook is not None:
+        total = prep + cook
+    if prep is None and total is not None:
+        prep = total - (cook or timedelta(0))
+    if cook is None and total is not None and prep is not None:
+        cook = total - prep
+    if prep is None or cook is None or total is None:
+        raise ValueError("recipe times are missing")
+    # A total below prep and cook time, e.g. a total of 10 minutes with a cook time of 20.
+    if min(prep, cook) < timedelta(0) or prep + cook > total:
+        raise ValueError(f"recipe times are inconsistent: prep {prep}, cook {cook}, total {total}")
+    return prep, cook, total
+
+
+def _author(value) -> str:
+    authors = [_text(author["name"] if isinstance(author, dict) else author) for author in _as_list(value)]
+    if not authors:
+        raise ValueError("recipe has no author")
+    return ", ".join(authors)
+
+
+def _servings(value) -> int:
+    for item in _as_list(value):
+        if match := re.search(r"\d+", str(item)):
+            return int(match[0])
+    raise ValueError(f"cannot read servings from {value!r}")
+
+
+def _keywords(value) -> list[str]:
+    keywords = []
+    for item in _as_list(value):
+        keywords.extend(keyword.strip() for keyword in str(item).split(","))
+    return [keyword for keyword in keywords if keyword]
+
+
+def _category(value) -> MealCategory | None:
+    for item in _as_list(value):
+        name = _text(item).lower().replace(" ", "_").replace("-", "_")
+        for candidate in (name, name.removesuffix("s")):
+            if candidate in MealCategory._value2member_map_:
+                return MealCategory(candidate)
+    return None
+
+
+def _difficulty(total_time: timedelta, steps: int) -> DifficultyLevel:
+    """Estimate difficulty, schema.org has no field for it."""
+    if total_time <= timedelta(minutes=30) and steps <= 6:
+        return DifficultyLevel.EASY
+    if total_time > timedelta(hours=2) or steps > 12:
+        return DifficultyLevel.HARD
+    return DifficultyLevel.MEDIUM
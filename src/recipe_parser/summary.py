@@ -0,0 +1,171 @@
+"""Lightweight recipe summaries for listings, with filters and cursor pagination."""
+
+import base64
+import bisect
+import binascii
+import heapq
+import math
+import threading
+from collections.abc import Iterable, Iterator
+from datetime import timedelta
+
+from pydantic import BaseModel
+
+from .models import DifficultyLevel, MealCategory, Recipe
+
+
+class RecipeSummary(BaseModel):
+    """The fields of a recipe shown in listings."""
+
+    slug: str
+    title: str
+    tags: list[str]
+    category: MealCategory | None
+    total_time: timedelta
+    difficulty: DifficultyLevel
+
+    @classmethod
+    def from_recipe(cls, slug: str, recipe: Recipe) -> "RecipeSummary":
+        return cls(
+            slug=slug,
+            title=recipe.title,
+            tags=recipe.tags,
+            category=recipe.category,
+            total_time=recipe.total_time,
+            difficulty=recipe.difficulty,
+        )
+
+
+class SummaryPage(BaseModel):
+    """One page of summaries and the cursor of the next page, None on the last page."""
+
+    items: list[RecipeSummary]
+    next_cursor: str | None = None
+
+
+def encode_cursor(slug: str) -> str:
+    return base64.urlsafe_b64encode(slug.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor {cursor!r}") from e
+
+
+# Stands for any category or difficulty in the key of a slug list.
+ANY = "*"
+
+FilterKey = tuple[MealCategory | None | str, DifficultyLevel | str]
+
+
+class SummaryIndex:
+    """Summaries with sorted slug lists for every combination of the filters.
+
+    There is a list per category, per difficulty, per pair of both and one for all
+    summaries, and each list is also split into buckets by total time in whole
+    minutes. A page merges the lists that match the filters from a binary search for
+    the cursor onwards, so it only walks matching summaries and its cost depends on
+    the page size and not on the number of recipes.
+    """
+
+    def __init__(self):
+        self._summaries: dict[str, RecipeSummary] = {}
+        self._digests: dict[str, str | None] = {}
+        self._slugs: dict[FilterKey, list[str]] = {}
+        self._by_minutes: dict[FilterKey, dict[int, list[str]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    @classmethod
+    def from_summaries(cls, summaries: Iterable[tuple[RecipeSummary, str | None]]) -> "SummaryIndex":
+        """Index precomputed summaries with the digest of their recipe."""
+        index = cls()
+        for summary, digest in summaries:
+            index.add(summary, digest)
+        return index
+
+    def update(self, slug: str, recipe: Recipe | None, digest: str | None = None) -> None:
+        """Summarise a new or changed recipe, or remove it when the recipe is None."""
+        if recipe is None:
+            self.remove(slug)
+        elif digest is None or self._digests.get(slug) != digest:
+            self.add(RecipeSummary.from_recipe(slug, recipe), digest)
+
+    def add(self, summary: RecipeSummary, digest: str | None = None) -> None:
+        with self._lock:
+            self._discard(summary.slug)
+            self._summaries[summary.slug] = summary
+            self._digests[summary.slug] = digest
+            minutes = _minutes(summary.total_time)
+            for key in _filter_keys(summary):
+                bisect.insort(self._slugs.setdefault(key, []), summary.slug)
+                bisect.insort(self._by_minutes.setdefault(key, {}).setdefault(minutes, []), summary.slug)
+
+    def remove(self, slug: str) -> None:
+        with self._lock:
+            self._discard(slug)
+
+    def page(
+        self,
+        cursor: str | None = None,
+        limit: int = 24,
+        category: MealCategory | None = None,
+        difficulty: DifficultyLevel | None = None,
+        max_total_time: timedelta | None = None,
+    ) -> SummaryPage:
+        """Summaries after the cursor that match all given filters."""
+        after = decode_cursor(cursor) if cursor else ""
+        key = (ANY if category is None else category, ANY if difficulty is None else difficulty)
+        with self._lock:
+            if max_total_time is None:
+                candidates = [self._slugs.get(key, [])]
+            else:
+                longest = _minutes(max_total_time)
+                candidates = [slugs for minutes, slugs in self._by_minutes.get(key, {}).items() if minutes <= longest]
+
+            items = []
+            for slug in heapq.merge(*(_after(slugs, after) for slugs in candidates)):
+                summary = self._summaries[slug]
+                # Only the bucket of the last minute can hold summaries above the maximum.
+                if max_total_time is not None and summary.total_time > max_total_time:
+                    continue
+                if len(items) == limit:
+                    return SummaryPage(items=items, next_cursor=encode_cursor(items[-1].slug))
+                items.append(summary)
+            return SummaryPage(items=items)
+
+    def _discard(self, slug: str) -> None:
+        summary = self._summaries.pop(slug, None)
+        if summary is None:
+            return
+        del self._digests[slug]
+        minutes = _minutes(summary.total_time)
+        for key in _filter_keys(summary):
+            for slugs in (self._slugs[key], self._by_minutes[key][minutes]):
+                del slugs[bisect.bisect_left(slugs, slug)]
+            if not self._by_minutes[key][minutes]:
+                del self._by_minutes[key][minutes]
+
+
+def _filter_keys(summary: RecipeSummary) -> list[FilterKey]:
+    """Keys of the slug lists a summary belongs to."""
+    return [
+        (summary.category, summary.difficulty),
+        (summary.category, ANY),
+        (ANY, summary.difficulty),
+        (ANY, ANY),
+    ]
+
+
+def _minutes(duration: timedelta) -> int:
+    """Duration in whole minutes, rounded up."""
+    return math.ceil(duration.total_seconds() / 60)
+
+
+def _after(slugs: list[str], after: str) -> Iterator[str]:
+    """Slugs of a sorted list after the given one, without copying the list."""
+    return (slugs[position] for position in range(bisect.bisect_right(slugs, after), len(slugs)))
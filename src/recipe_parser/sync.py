@@ -0,0 +1,201 @@
+"""Keep a recipe store in sync with a list of sources that changes over time."""
+
+import hashlib
+import logging
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel, ValidationError
+
+from .cache import _recipe_schema
+from .fetch import Fetcher
+from .utils import atomic_write, is_valid_http_url
+
+if TYPE_CHECKING:
+    from .parser import Base64Input
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "sync-manifest.json"
+
+# Files of a listed directory that are synced, other files are ignored.
+SOURCE_SUFFIXES = {".html", ".htm", ".txt", ".md", ".pdf", ".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+
+class SyncEntry(BaseModel):
+    """A synced source: the content it was parsed from, how, and the recipe it was saved as."""
+
+    source: str
+    content_hash: str
+    parse_version: str
+    slug: str
+    output: Path
+    etag: str | None = None
+    last_modified: str | None = None
+    file_marker: str | None = None
+    synced_at: float
+
+
+class SourceState(BaseModel):
+    """A source checked against its entry, with the body of a URL that has to be parsed."""
+
+    source: str
+    changed: bool = True
+    content_hash: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    file_marker: str | None = None
+    body: bytes | None = None
+    error: str | None = None
+
+
+class SyncManifest(BaseModel):
+    """Synced sources by source, stored next to the recipes they were parsed to."""
+
+    entries: dict[str, SyncEntry] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "SyncManifest":
+        """The manifest of the last sync, empty when there is none."""
+        try:
+            return cls.model_validate_json(path.read_bytes())
+        except FileNotFoundError:
+            return cls()
+        except ValidationError as e:
+            logger.warning(f"ignoring invalid sync manifest {path}: {e}")
+            return cls()
+
+    def save(self, path: Path) -> None:
+        """Write the manifest atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, self.model_dump_json(indent=2))
+
+    def slugs(self) -> set[str]:
+        return {entry.slug for entry in self.entries.values()}
+
+    def record(self, state: SourceState, parse_version: str, slug: str | None = None, output: Path | None = None) -> None:
+        """Remember a checked source with its new recipe, or the recipe it had when it did not change."""
+        previous = self.entries.get(state.source)
+        self.entries[state.source] = SyncEntry(
+            source=state.source,
+            content_hash=state.content_hash,
+            parse_version=parse_version,
+            slug=slug or previous.slug,
+            output=output or previous.output,
+            etag=state.etag,
+            last_modified=state.last_modified,
+            file_marker=state.file_marker,
+            synced_at=time.time(),
+        )
+
+    def prune(self, sources: Iterable[str]) -> list[SyncEntry]:
+        """Forget the sources that are not listed anymore, returns their entries."""
+        listed = set(sources)
+        return [self.entries.pop(source) for source in list(self.entries) if source not in listed]
+
+
+def expand_sources(sources: Iterable[str]) -> list[str]:
+    """URLs and files as they are, directories as the source files they contain, in order and without repeats."""
+    expanded = []
+    for source in sources:
+        path = Path(source)
+        if is_valid_http_url(source) or not path.is_dir():
+            expanded.append(source)
+            continue
+        expanded += sorted(
+            str(file) for file in path.rglob("*")
+            if file.suffix.lower() in SOURCE_SUFFIXES
+            and file.is_file()
+            and not any(part.startswith(".") for part in file.relative_to(path).parts)
+        )
+    return list(dict.fromkeys(expanded))
+
+
+def parse_version(model_name: str, system_prompt: str) -> str:
+    """Hash of what a recipe is parsed with, so changing the model, prompt or schema parses everything again."""
+    digest = hashlib.sha256()
+    for part in (model_name, system_prompt, _recipe_schema()):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+def check_source(
+    source: str,
+    entry: SyncEntry | None,
+    version: str,
+    outputs: set[str],
+    fetcher: Fetcher,
+    force: bool = False,
+) -> SourceState:
+    """Whether a source may have changed and has to be loaded.
+
+    URLs are revalidated with the validators of the last sync and files are only
+    loaded when their modification time or size changed. Everything is loaded when
+    the parse version changed or the recipe is gone from the store.
+    """
+    current = _is_current(entry, version, outputs, force)
+
+    if is_valid_http_url(source):
+        if current:
+            result = fetcher.fetch(source, entry.etag, entry.last_modified)
+        else:
+            result = fetcher.fetch(source)
+        if result.body is None:
+            return SourceState(
+                source=source,
+                changed=False,
+                content_hash=entry.content_hash,
+                etag=result.etag,
+                last_modified=result.last_modified,
+            )
+        return SourceState(source=source, etag=result.etag, last_modified=result.last_modified, body=result.body)
+
+    path = Path(source)
+    stat = path.stat()
+    marker = f"{stat.st_mtime_ns}:{stat.st_size}"
+    if current and entry.file_marker == marker:
+        return SourceState(source=source, changed=False, content_hash=entry.content_hash, file_marker=marker)
+    return SourceState(source=source, file_marker=marker)
+
+
+def load_source(
+    source: str,
+    entry: SyncEntry | None,
+    version: str,
+    outputs: set[str],
+    fetcher: Fetcher,
+    load: Callable[[str, bytes | None], "Base64Input"],
+    force: bool = False,
+) -> tuple[SourceState, "Base64Input | None"]:
+    """Check a source and load the input to parse, None when it did not change.
+
+    `load` is given the source and the body fetched by the check. The body is
+    dropped from the state as soon as the input is loaded. The content hash is
+    taken from the input, so a page whose markup, scripts or ads change around the
+    same recipe is not parsed again.
+    """
+    state = check_source(source, entry, version, outputs, fetcher, force)
+    if not state.changed:
+        return state, None
+    body, state.body = state.body, None
+    input = load(source, body)
+    state.content_hash = input_hash(input)
+    state.changed = not _is_current(entry, version, outputs, force) or state.content_hash != entry.content_hash
+    return state, input if state.changed else None
+
+
+def input_hash(input: "Base64Input") -> str:
+    """Hash of what Claude is sent for a source."""
+    digest = hashlib.sha256()
+    for part in (input.file_type, input.data):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+def _is_current(entry: SyncEntry | None, version: str, outputs: set[str], force: bool) -> bool:
+    """Whether the recipe of an entry is still in the store and was parsed with the current version."""
+    return not force and entry is not None and entry.parse_version == version and entry.slug in outputs
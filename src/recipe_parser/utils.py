@@ -1,9 +1,13 @@
 """Utility functions."""
 
+import os
+import re
+import unicodedata
+from collections.abc import Iterable
 from datetime import timedelta
+from pathlib import Path
 
 from pydantic import HttpUrl, ValidationError
-from bs4 import BeautifulSoup
 
 def is_valid_http_url(url: str) -> bool:
     try:
@@ -13,6 +17,8 @@ def is_valid_http_url(url: str) -> bool:
         return False
 
 def is_html(file_path):
+    from bs4 import BeautifulSoup
+
     with open(file_path, 'r') as file:
         content = file.read()
     return bool(BeautifulSoup(content, "html.parser").find())
@@ -25,6 +31,26 @@ def format_fn(name: str):
     return lowercase_name.replace(' ', '-')
 
 
+def atomic_write(path: Path, data: str | bytes | Iterable[str]) -> None:
+    """Write through a temporary file next to the path, so readers never see a half-written file.
+
+    An iterable of strings is written one string at a time.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    if isinstance(data, bytes):
+        tmp.write_bytes(data)
+    else:
+        with tmp.open("w", encoding="utf-8") as f:
+            f.writelines([data] if isinstance(data, str) else data)
+    os.replace(tmp, path)
+
+
+def slugify(title: str) -> str:
+    """Lowercase ASCII words of a title joined by dashes, safe as file name and URL."""
+    ascii_title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", ascii_title.lower()).strip("-") or "recipe"
+
+
 def format_duration(td: timedelta) -> str:
     """
     Convert a timedelta to a human-readable string for recipe durations.
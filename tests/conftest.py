@@ -0,0 +1,32 @@
+from pathlib import Path
+
+from anthropic.types import Message, ToolUseBlock, Usage
+
+from recipe_parser.models import Ingredient, MeasurementUnit, Recipe
+
+ROOT = Path(__file__).parent.parent
+SAMPLE_RECIPE = ROOT / "recipes" / "dutch-apple-cake.json"
+SYSTEM_PROMPT = ROOT / "recipe-prompt.txt"
+
+
+def make_recipe(title: str = "Dutch Apple Cake", ingredients: list[str] | None = None, **update) -> Recipe:
+    """The sample recipe with another title, ingredient names or fields."""
+    recipe = Recipe.model_validate_json(SAMPLE_RECIPE.read_text())
+    update["title"] = title
+    if ingredients is not None:
+        update["ingredients"] = [Ingredient(name=name, quantity=1, unit=MeasurementUnit.PIECE) for name in ingredients]
+    return recipe.model_copy(update=update)
+
+
+def recipe_message(recipe: Recipe) -> Message:
+    """A Claude response that calls the recipe tool with the recipe."""
+    return Message(
+        id="msg_test",
+        type="message",
+        role="assistant",
+        model="model",
+        content=[ToolUseBlock(type="tool_use", id="toolu_test", name="recipe_parser", input=recipe.model_dump(mode="json"))],
+        stop_reason="tool_use",
+        stop_sequence=None,
+        usage=Usage(input_tokens=1000, output_tokens=500),
+    )
@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+
+import pytest
+
+from recipe_parser import batches
+from recipe_parser.batches import BatchManifest, custom_id, run_batch
+from recipe_parser.cache import ParseCache
+from recipe_parser.store import open_store
+
+from .conftest import SYSTEM_PROMPT, make_recipe, recipe_message
+
+
+class FakeBatches:
+    """Message batches that end at once, with the same recipe for every request."""
+
+    def __init__(self, fail_after: int | None = None):
+        self.message = recipe_message(make_recipe())
+        self.fail_after = fail_after
+        self.created: list[list[str]] = []
+
+    def create(self, requests):
+        self.created.append([request["custom_id"] for request in requests])
+        return SimpleNamespace(id=f"batch-{len(self.created)}")
+
+    def retrieve(self, batch_id):
+        counts = SimpleNamespace(processing=0, succeeded=1, errored=0)
+        return SimpleNamespace(processing_status="ended", request_counts=counts)
+
+    def results(self, batch_id):
+        for number, cid in enumerate(self.created[int(batch_id.removeprefix("batch-")) - 1]):
+            if number == self.fail_after:
+                raise ConnectionError("connection lost")
+            yield SimpleNamespace(custom_id=cid, result=SimpleNamespace(type="succeeded", message=self.message))
+
+
+@pytest.fixture
+def client():
+    return SimpleNamespace(messages=SimpleNamespace(batches=FakeBatches()))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_store(tmp_path / "recipes")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def sources(tmp_path):
+    paths = []
+    for number in range(5):
+        path = tmp_path / f"source-{number}.txt"
+        path.write_text(f"recipe number {number} " * 50)
+        paths.append(str(path))
+    return paths
+
+
+def test_round_trip(tmp_path, client, sources, store):
+    manifest = run_batch(client, sources, tmp_path / "batch.json", "model", SYSTEM_PROMPT, store, poll_interval=0)
+
+    assert client.messages.batches.created == [[custom_id(source) for source in sources]]
+    assert manifest.batch_id is None
+    assert all(entry.recipe_path is not None and entry.error is None for entry in manifest.entries.values())
+    assert BatchManifest.load(tmp_path / "batch.json", "model") == manifest
+
+
+def test_resumed_run_submits_only_new_sources(tmp_path, client, sources, store):
+    run_batch(client, sources[:3], tmp_path / "batch.json", "model", SYSTEM_PROMPT, store, poll_interval=0)
+
+    run_batch(client, sources, tmp_path / "batch.json", "model", SYSTEM_PROMPT, store, poll_interval=0)
+
+    assert client.messages.batches.created[1] == [custom_id(source) for source in sources[3:]]
+
+
+def test_cached_sources_are_not_submitted(tmp_path, client, sources, store):
+    cache = ParseCache(tmp_path / "cache")
+    run_batch(client, sources[:2], tmp_path / "first.json", "model", SYSTEM_PROMPT, store, cache, poll_interval=0)
+
+    manifest = run_batch(
+        client, sources, tmp_path / "second.json", "model", SYSTEM_PROMPT, store, cache, poll_interval=0
+    )
+
+    assert client.messages.batches.created[1] == [custom_id(source) for source in sources[2:]]
+    assert not manifest.pending()
+
+
+def count_loads(monkeypatch) -> list[str]:
+    loaded = []
+    source_to_input = batches.source_to_input
+
+    def load(source, *args):
+        loaded.append(source)
+        return source_to_input(source, *args)
+
+    monkeypatch.setattr(batches, "source_to_input", load)
+    return loaded
+
+
+def test_splits_at_the_request_limit(tmp_path, client, sources, store, monkeypatch):
+    monkeypatch.setattr(batches, "MAX_BATCH_REQUESTS", 2)
+    loaded = count_loads(monkeypatch)
+
+    manifest = run_batch(client, sources, tmp_path / "batch.json", "model", SYSTEM_PROMPT, store, poll_interval=0)
+
+    assert [len(ids) for ids in client.messages.batches.created] == [2, 2, 1]
+    assert [custom_id(source) for source in loaded] == [cid for ids in client.messages.batches.created for cid in ids]
+    assert not manifest.pending()
+
+
+def test_splits_at_the_size_limit_without_loading_sources_again(tmp_path, client, sources, store, monkeypatch):
+    # Requests are about 13 kB with the prompt and the recipe schema, two fit in a batch.
+    monkeypatch.setattr(batches, "MAX_BATCH_BYTES", 30_000)
+    loaded = count_loads(monkeypatch)
+
+    manifest = run_batch(client, sources, tmp_path / "batch.json", "model", SYSTEM_PROMPT, store, poll_interval=0)
+
+    assert [len(ids) for ids in client.messages.batches.created] == [2, 2, 1]
+    assert loaded == sources
+    assert not manifest.pending()
+
+
+def test_failed_source_is_loaded_once(tmp_path, client, sources, store, monkeypatch):
+    monkeypatch.setattr(batches, "MAX_BATCH_REQUESTS", 2)
+    loaded = count_loads(monkeypatch)
+    missing = str(tmp_path / "missing.txt")
+
+    manifest = run_batch(
+        client, [missing, *sources], tmp_path / "batch.json", "model", SYSTEM_PROMPT, store, poll_interval=0
+    )
+
+    assert loaded.count(missing) == 1
+    assert "FileNotFoundError" in manifest.entries[custom_id(missing)].error
+    assert list(manifest.pending()) == [custom_id(missing)]
+
+
+def test_request_larger_than_a_batch_fails(tmp_path, client, sources, store, monkeypatch):
+    monkeypatch.setattr(batches, "MAX_BATCH_BYTES", 200_000)
+    large = tmp_path / "large.txt"
+    large.write_text("flour " * 50_000)
+
+    manifest = run_batch(
+        client, [sources[0], str(large)], tmp_path / "batch.json", "model", SYSTEM_PROMPT, store,
+        poll_interval=0, token_budget=None,
+    )
+
+    assert client.messages.batches.created == [[custom_id(sources[0])]]
+    assert "exceeds the batch limit" in manifest.entries[custom_id(str(large))].error
+
+
+def test_refuses_manifest_of_another_model(tmp_path):
+    BatchManifest(model_name="model").save(tmp_path / "batch.json")
+
+    with pytest.raises(ValueError, match="created for model model"):
+        BatchManifest.load(tmp_path / "batch.json", "other-model")
+
+
+def test_interrupted_collection_keeps_stored_results(tmp_path, sources, store):
+    client = SimpleNamespace(messages=SimpleNamespace(batches=FakeBatches(fail_after=2)))
+
+    with pytest.raises(ConnectionError):
+        run_batch(client, sources, tmp_path / "batch.json", "model", SYSTEM_PROMPT, store, poll_interval=0)
+
+    manifest = BatchManifest.load(tmp_path / "batch.json", "model")
+    assert manifest.batch_id == "batch-1"
+    assert [entry.recipe_path is not None for entry in manifest.entries.values()] == [True, True, False, False, False]
@@ -0,0 +1,26 @@
+import sys
+
+from recipe_parser.parser import parse_input_to_recipe, source_to_input
+
+from .conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+import suite  # noqa: E402
+
+
+def test_replay_client_parses_offline(tmp_path):
+    path = tmp_path / "article.html"
+    path.write_text(suite.article_html(suite.sample_recipe()))
+    client = suite.ReplayClient(suite.RECORDED_MESSAGE)
+
+    recipe = parse_input_to_recipe(source_to_input(str(path)), client, "claude-benchmark", suite.SYSTEM_PROMPT)
+
+    assert recipe.title
+    assert recipe.ingredients and recipe.instructions
+
+
+def test_compare_reports_only_slowdowns_above_the_tolerance():
+    baseline = {"fast": {"seconds": 1.0}, "slow": {"seconds": 1.0}, "faster": {"seconds": 1.0}}
+    results = {"fast": {"seconds": 1.2}, "slow": {"seconds": 1.3}, "faster": {"seconds": 0.5}, "new": {"seconds": 9.0}}
+
+    assert suite.compare(results, baseline, tolerance=0.25) == ["slow"]
@@ -0,0 +1,59 @@
+import os
+import time
+from datetime import timedelta
+
+import pytest
+
+from recipe_parser.cache import ParseCache
+
+from .conftest import make_recipe
+
+PARTS = {"data": "recipe text", "file_type": "text/plain", "system_prompt": "prompt", "model_name": "model"}
+
+
+def test_key_is_deterministic():
+    assert ParseCache.key(**PARTS) == ParseCache.key(**PARTS)
+
+
+@pytest.mark.parametrize("part", PARTS)
+def test_key_depends_on_every_part(part):
+    assert ParseCache.key(**PARTS | {part: PARTS[part] + "!"}) != ParseCache.key(**PARTS)
+
+
+def test_key_does_not_collide_across_part_boundaries():
+    assert ParseCache.key("ab", "c", "p", "m") != ParseCache.key("b", "ca", "p", "m")
+    assert ParseCache.key("x", "t", "prompt", "model") != ParseCache.key("x", "t", "prom", "ptmodel")
+
+
+def test_put_and_get(tmp_path):
+    cache = ParseCache(tmp_path)
+    key = ParseCache.key(**PARTS)
+    recipe = make_recipe()
+
+    assert cache.get(key) is None
+    cache.put(key, recipe)
+    assert cache.get(key) == recipe
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = ParseCache(tmp_path, max_age=timedelta(hours=1))
+    key = ParseCache.key(**PARTS)
+    cache.put(key, make_recipe())
+    old = time.time() - 2 * 3600
+    os.utime(cache._path(key), (old, old))
+
+    assert cache.get(key) is None
+    assert not cache._path(key).exists()
+
+
+def test_evict_drops_least_recently_used_above_size(tmp_path):
+    recipe = make_recipe()
+    cache = ParseCache(tmp_path, max_size=int(len(recipe.model_dump_json()) * 2.5))
+    keys = [ParseCache.key(**PARTS | {"data": str(i)}) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, recipe)
+        os.utime(cache._path(key), (1000 + i, time.time() - 100 + i))
+    cache.get(keys[0])
+
+    assert cache.evict() == 1
+    assert [cache._path(key).exists() for key in keys] == [True, False, True]
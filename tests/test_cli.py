@@ -0,0 +1,77 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from recipe_parser import cli, parser
+from recipe_parser.dedup import DedupIndex
+from recipe_parser.parser import Base64Input
+from recipe_parser.store import open_store
+
+from .conftest import SYSTEM_PROMPT, make_recipe
+
+
+class FakeClient:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+@pytest.fixture
+def texts():
+    rng = random.Random(3)
+    text = " ".join(rng.choices([f"word{i}" for i in range(2000)], k=400))
+    return {"original": text, "copy": "Syndicated " + text, "second copy": "Syndicated " + text + " again"}
+
+
+def run_jobs(tmp_path, texts, monkeypatch, fail_first: bool):
+    calls = []
+
+    async def parse(input, **kwargs):
+        calls.append(input.data)
+        first = len(calls) == 1
+        await asyncio.sleep(0.05)
+        if fail_first and first:
+            raise RuntimeError("parsing failed")
+        return make_recipe(f"Recipe {len(calls)}")
+
+    monkeypatch.setattr(parser, "aparse_input_to_recipe", parse)
+    monkeypatch.setattr(cli, "make_async_client", lambda settings: FakeClient())
+    settings = SimpleNamespace(claude_model_name="model", request_deadline_seconds=None)
+    jobs = [(label, lambda text=text: Base64Input(data=text, file_type="text/plain")) for label, text in texts.items()]
+    results = asyncio.run(
+        cli._run_jobs(jobs, settings, SYSTEM_PROMPT, open_store(tmp_path / "recipes"), 3, dedup=DedupIndex())
+    )
+    return {result.source: result for result in results}, calls
+
+
+def test_duplicates_wait_for_the_original(tmp_path, texts, monkeypatch):
+    results, calls = run_jobs(tmp_path, texts, monkeypatch, fail_first=False)
+
+    # Inputs load in threads, so any of the sources may be the one that is parsed.
+    [original] = [result for result in results.values() if result.duplicate_of is None]
+    duplicates = [result for result in results.values() if result.duplicate_of is not None]
+    assert len(calls) == 1
+    assert original.slug is not None
+    assert [(result.duplicate_of, result.slug) for result in duplicates] == [(original.source, original.slug)] * 2
+
+
+def test_duplicate_is_parsed_when_the_original_fails(tmp_path, texts, monkeypatch):
+    results, calls = run_jobs(tmp_path, texts, monkeypatch, fail_first=True)
+
+    [failed] = [result for result in results.values() if result.error is not None]
+    [parsed] = [result for result in results.values() if result.slug is not None and result.duplicate_of is None]
+    [duplicate] = [result for result in results.values() if result.duplicate_of is not None]
+    assert len(calls) == 2
+    assert failed.source != parsed.source
+    assert (duplicate.duplicate_of, duplicate.slug) == (parsed.source, parsed.slug)
+
+
+def test_short_texts_are_not_duplicates(tmp_path, monkeypatch):
+    results, calls = run_jobs(tmp_path, {"missing": "Page not found", "gone": "Page not found"}, monkeypatch, fail_first=False)
+
+    assert len(calls) == 2
+    assert all(result.duplicate_of is None and result.slug is not None for result in results.values())
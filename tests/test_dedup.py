@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from recipe_parser.dedup import JOURNAL_NAME, DedupIndex, text_signature
+
+
+@pytest.fixture
+def text():
+    rng = random.Random(3)
+    return " ".join(rng.choices([f"word{i}" for i in range(2000)], k=400))
+
+
+def test_finds_near_duplicate(text):
+    index = DedupIndex()
+    index.add("original", text_signature(text), slug="cake")
+
+    match = index.find("copy", text_signature("Syndicated from elsewhere. " + text.upper()))
+
+    assert match.duplicate_of == "original"
+    assert match.slug == "cake"
+    assert match.similarity >= index.threshold
+
+
+def test_different_text_is_not_a_duplicate(text):
+    index = DedupIndex()
+    index.add("original", text_signature(text))
+
+    assert index.find("other", text_signature(" ".join(reversed(text.split())))) is None
+
+
+def test_original_is_not_a_copy_of_its_copies(text):
+    index = DedupIndex()
+    index.add("original", text_signature(text))
+    index.add("copy", text_signature(text + " and more"))
+
+    assert index.find("original", text_signature(text)) is None
+    assert [match.source for match in index.duplicates()] == ["copy"]
+
+
+def test_removed_source_is_forgotten_after_reload(tmp_path, text):
+    index = DedupIndex(tmp_path)
+    index.add("original", text_signature(text))
+    index.add("failed", text_signature(" ".join(f"other{i}" for i in range(40))))
+    index.remove("failed")
+
+    reloaded = DedupIndex.load(tmp_path)
+
+    assert "failed" not in reloaded
+    assert reloaded.find("copy", text_signature(text)).duplicate_of == "original"
+    assert (tmp_path / JOURNAL_NAME).read_text().count("\n") == 3
+
+
+def test_reindexed_source_keeps_its_place(tmp_path, text):
+    index = DedupIndex(tmp_path)
+    index.add("original", text_signature(text))
+    index.add("copy", text_signature(text))
+    index.add("original", text_signature(text), slug="cake")
+
+    reloaded = DedupIndex.load(tmp_path)
+
+    assert reloaded.find("original", text_signature(text)) is None
+    assert reloaded.find("copy", text_signature(text)).slug == "cake"
+
+
+@pytest.mark.parametrize("short", ["", "Page not found", "Access denied " * 20])
+def test_short_text_has_no_signature(short):
+    assert text_signature(short) is None
@@ -0,0 +1,66 @@
+from recipe_parser.extract import CHARS_PER_TOKEN, extract_main_text, make_soup
+
+INGREDIENTS = "<ul class='ingredients'>" + "".join(f"<li>{n} g ingredient {n}</li>" for n in range(1, 30)) + "</ul>"
+
+
+def test_drops_site_chrome():
+    html = (
+        "<html><body><header><nav>Home Shop</nav><h2>Site name</h2></header>"
+        f"<article><h1>Apple Cake</h1>{INGREDIENTS}</article>"
+        "<footer>Copyright</footer><form>Subscribe</form></body></html>"
+    )
+
+    text, _ = extract_main_text(make_soup(html))
+
+    assert "Apple Cake" in text and "ingredient 29" in text
+    assert "Site name" not in text and "Copyright" not in text and "Subscribe" not in text
+
+
+def test_keeps_header_and_form_inside_the_recipe():
+    html = (
+        "<html><body><article class='recipe'><header><h1>Apple Cake</h1><p>Serves 8, ready in 1 hour</p></header>"
+        f"<form class='servings'>Servings: 8</form>{INGREDIENTS}<footer>Notes: keeps 3 days</footer></article></body></html>"
+    )
+
+    text, _ = extract_main_text(make_soup(html))
+
+    assert "Apple Cake" in text
+    assert "Serves 8, ready in 1 hour" in text
+    assert "Servings: 8" in text
+    assert "keeps 3 days" in text
+
+
+def test_keeps_the_title_from_the_page_header():
+    html = (
+        "<html><body><header class='site-header'><h1>Apple Cake</h1></header>"
+        f"<div class='recipe'>{INGREDIENTS}</div></body></html>"
+    )
+
+    text, _ = extract_main_text(make_soup(html))
+
+    assert text.startswith("Apple Cake")
+    assert "ingredient 29" in text
+
+
+def test_keeps_the_recipe_region():
+    html = (
+        "<html><body><div class='sidebar'>Popular posts</div><p>Our trip to the orchard</p>"
+        f"<div class='recipe-card'><h2>Apple Cake</h2>{INGREDIENTS}</div><div class='comments'>Lovely!</div></body></html>"
+    )
+
+    text, report = extract_main_text(make_soup(html))
+
+    assert text.startswith("Apple Cake")
+    assert "orchard" not in text and "Popular posts" not in text and "Lovely!" not in text
+    assert report.chars_after < report.chars_before
+
+
+def test_fits_the_token_budget():
+    html = f"<html><body><article><h1>Apple Cake</h1>{INGREDIENTS}</article></body></html>"
+
+    text, report = extract_main_text(make_soup(html), token_budget=50)
+
+    assert len(text) <= 50 * CHARS_PER_TOKEN
+    # Cut at a line break, not in the middle of an ingredient.
+    assert f"<li>{text.splitlines()[-1]}</li>" in INGREDIENTS
+    assert report.truncated
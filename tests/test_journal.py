@@ -0,0 +1,36 @@
+import json
+
+from recipe_parser.journal import Journal
+from recipe_parser.utils import atomic_write
+
+
+def test_replay_skips_a_line_cut_short(tmp_path):
+    journal = Journal(tmp_path / "index" / "test.jsonl")
+    journal.append(json.dumps({"slug": slug}) for slug in ["a", "b"])
+    with journal.path.open("a") as f:
+        f.write('{"slug": "c"')
+
+    assert [entry["slug"] for entry in journal.replay()] == ["a", "b"]
+    assert journal.lines == 2
+
+
+def test_outdated_journal_is_rewritten(tmp_path):
+    journal = Journal(tmp_path / "test.jsonl")
+    journal.append(json.dumps({"slug": "a", "version": version}) for version in range(103))
+    entries = {entry["slug"]: entry for entry in journal.replay()}
+
+    assert journal.is_outdated(len(entries))
+    journal.rewrite(json.dumps(entry) for entry in entries.values())
+    assert list(Journal(journal.path).replay()) == [{"slug": "a", "version": 102}]
+    assert not (tmp_path / "test.jsonl.tmp").exists()
+
+
+def test_atomic_write(tmp_path):
+    atomic_write(tmp_path / "text", "café")
+    atomic_write(tmp_path / "bytes", b"\x00\x01")
+    atomic_write(tmp_path / "lines", (f"{i}\n" for i in range(3)))
+
+    assert (tmp_path / "text").read_text(encoding="utf-8") == "café"
+    assert (tmp_path / "bytes").read_bytes() == b"\x00\x01"
+    assert (tmp_path / "lines").read_text() == "0\n1\n2\n"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["bytes", "lines", "text"]
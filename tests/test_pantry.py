@@ -0,0 +1,62 @@
+from recipe_parser.pantry import PantryIndex, normalize_ingredient
+
+from .conftest import make_recipe
+
+
+def index_of(**recipes: list[str]) -> PantryIndex:
+    index = PantryIndex()
+    for slug, ingredients in recipes.items():
+        index.update(slug, make_recipe(slug, ingredients))
+    return index
+
+
+def test_normalize_ingredient():
+    assert normalize_ingredient("Eggs") == "egg"
+    assert normalize_ingredient("2 large eggs") == "egg"
+    assert normalize_ingredient("egg (room temperature)") == "egg"
+    assert normalize_ingredient("unsalted butter, softened") == "butter"
+
+
+def test_pantry_item_covers_ingredients_containing_it():
+    index = index_of(cake=["unsalted butter", "flour", "eggs"])
+
+    [match] = index.match(["butter", "flour", "egg"])
+
+    assert (match.covered, match.total, match.missing) == (3, 3, [])
+
+
+def test_staples_only_match_their_exact_name():
+    index = index_of(stuffed_peppers=["red bell pepper", "rice", "water chestnut", "pepper", "salt", "water"])
+
+    [match] = index.match(["rice"])
+
+    assert match.missing == ["red bell pepper", "water chestnut"]
+    assert match.covered == 4
+
+
+def test_staples_alone_are_no_match():
+    index = index_of(soup=["salt", "water", "leek"])
+
+    assert index.match(["flour"]) == []
+    assert index.match(["leek"], staples=False)[0].missing == ["salt", "water"]
+
+
+def test_ranked_by_missing_ingredients():
+    index = index_of(
+        pancakes=["flour", "milk", "egg"],
+        omelette=["egg", "milk"],
+        quiche=["flour", "egg", "cream", "bacon"],
+    )
+
+    matches = index.match(["egg", "milk", "flour"])
+
+    assert [match.slug for match in matches] == ["pancakes", "omelette", "quiche"]
+    assert [match.slug for match in index.match(["egg", "milk", "flour"], max_missing=0)] == ["pancakes", "omelette"]
+
+
+def test_removed_recipes_are_not_matched():
+    index = index_of(omelette=["egg"], pancakes=["egg", "flour"])
+
+    index.update("omelette", None)
+
+    assert [match.slug for match in index.match(["egg"])] == ["pancakes"]
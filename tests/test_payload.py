@@ -0,0 +1,44 @@
+import os
+import tracemalloc
+
+import pytest
+
+from recipe_parser.parser import PayloadTooLargeError, _build_request, source_to_input
+
+FILE_SIZE = 16 * 1024 * 1024
+
+
+@pytest.fixture
+def large_pdf(tmp_path):
+    path = tmp_path / "cookbook.pdf"
+    with path.open("wb") as f:
+        f.write(b"%PDF-1.7\n")
+        f.write(os.urandom(FILE_SIZE - 9))
+    return path
+
+
+@pytest.fixture
+def traced():
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+def test_peak_memory_of_a_large_payload(large_pdf, traced):
+    input = source_to_input(str(large_pdf), max_payload_bytes=None)
+    _, peak = tracemalloc.get_traced_memory()
+    request = _build_request(input, "model", "prompt")
+    retained, _ = tracemalloc.get_traced_memory()
+
+    # The base64 str is 4/3 of the file, encoding briefly holds the bytes and the str.
+    assert peak < 2.8 * FILE_SIZE
+    assert retained < 1.4 * FILE_SIZE
+    assert request["messages"][0]["content"][0]["source"]["data"] is input.data
+
+
+def test_payload_over_the_limit_fails_before_encoding(large_pdf, traced):
+    with pytest.raises(PayloadTooLargeError):
+        source_to_input(str(large_pdf), max_payload_bytes=FILE_SIZE)
+
+    _, peak = tracemalloc.get_traced_memory()
+    assert peak < FILE_SIZE / 10
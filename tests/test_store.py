@@ -0,0 +1,98 @@
+import pytest
+
+from recipe_parser.store import copy_recipes, open_store
+
+from .conftest import make_recipe
+
+
+@pytest.fixture(params=["recipes", "recipes.db"])
+def store(request, tmp_path):
+    store = open_store(tmp_path / request.param)
+    yield store
+    store.close()
+
+
+def test_put_and_get(store):
+    recipe = make_recipe("Mac & Cheese")
+
+    path = store.put(recipe)
+
+    assert path == store.location("mac-cheese")
+    assert store.get("mac-cheese") == recipe
+    assert "mac-cheese" in store and len(store) == 1
+
+
+def test_colliding_slug_gets_a_suffix(store):
+    first = make_recipe("Mac & Cheese", ["macaroni"])
+    second = make_recipe("Mac Cheese", ["cheddar"])
+    third = make_recipe("Mac & Cheese!", ["gouda"])
+
+    assert [store.add(recipe) for recipe in (first, second, third)] == ["mac-cheese", "mac-cheese-2", "mac-cheese-3"]
+    assert store.get("mac-cheese") == first
+    assert store.get("mac-cheese-2") == second
+    assert len(store) == 3
+
+
+def test_same_recipe_keeps_its_slug(store):
+    recipe = make_recipe("Mac & Cheese")
+
+    assert store.add(recipe) == store.add(recipe) == "mac-cheese"
+    assert len(store) == 1
+
+
+def test_replace_overwrites_the_older_version(store):
+    store.add(make_recipe("Mac & Cheese", ["macaroni"]))
+    newer = make_recipe("Mac & Cheese", ["cheddar"])
+
+    assert store.add(newer, replace="mac-cheese") == "mac-cheese"
+    assert store.get("mac-cheese") == newer
+    assert len(store) == 1
+
+
+def test_put_without_slug_does_not_overwrite(store):
+    store.put(make_recipe("Mac & Cheese", ["macaroni"]))
+
+    path = store.put(make_recipe("Mac & Cheese", ["cheddar"]))
+
+    assert path == store.location("mac-cheese-2")
+    assert len(store) == 2
+
+
+def test_put_with_slug_replaces(store):
+    store.put(make_recipe("Mac & Cheese", ["macaroni"]))
+    newer = make_recipe("Mac & Cheese", ["cheddar"])
+
+    store.put(newer, slug="mac-cheese")
+
+    assert store.get("mac-cheese") == newer
+    assert len(store) == 1
+
+
+def test_delete(store):
+    store.put(make_recipe("Mac & Cheese"))
+
+    store.delete("mac-cheese")
+
+    assert store.get("mac-cheese") is None
+    assert len(store) == 0
+
+
+def test_versions_change_with_the_recipe(store):
+    store.put(make_recipe("Mac & Cheese", ["macaroni"]))
+    before = store.versions()
+
+    store.put(make_recipe("Mac & Cheese", ["cheddar"]), slug="mac-cheese")
+
+    assert store.versions().keys() == before.keys()
+    assert store.versions()["mac-cheese"] != before["mac-cheese"]
+
+
+def test_copy_between_backends(tmp_path):
+    source = open_store(tmp_path / "recipes")
+    target = open_store(tmp_path / "recipes.db")
+    recipes = [make_recipe(f"Recipe {number}") for number in range(3)]
+    for recipe in recipes:
+        source.put(recipe)
+
+    assert copy_recipes(source, target, batch_size=2) == 3
+    assert sorted(recipe.title for _, recipe in target) == [recipe.title for recipe in recipes]
@@ -0,0 +1,144 @@
+import json
+from datetime import timedelta
+
+import pytest
+from bs4 import BeautifulSoup
+
+from recipe_parser.models import MeasurementUnit
+from recipe_parser.parser import source_to_input
+from recipe_parser.structured import find_recipe_data, parse_ingredient, recipe_from_structured
+
+RECIPE = {
+    "@type": "Recipe",
+    "name": "Pancakes &amp; Syrup",
+    "author": {"@type": "Person", "name": "Jane Cook"},
+    "recipeYield": ["4", "4 servings"],
+    "prepTime": "PT10M",
+    "cookTime": "PT20M",
+    "recipeIngredient": ["200 g flour, sifted", "2 eggs", "½ tsp salt", "butter, to serve"],
+    "recipeInstructions": [
+        {"@type": "HowToSection", "itemListElement": [{"@type": "HowToStep", "text": "Whisk everything."}]},
+        {"@type": "HowToStep", "text": "Fry in butter."},
+    ],
+    "recipeCategory": "Breakfast",
+    "keywords": "quick, sweet",
+}
+
+
+def page(*scripts: object) -> BeautifulSoup:
+    body = "".join(f'<script type="application/ld+json">{json.dumps(script)}</script>' for script in scripts)
+    return BeautifulSoup(f"<html><head>{body}</head><body></body></html>", "html.parser")
+
+
+def test_parse_ingredient():
+    flour = parse_ingredient("200 g flour, sifted")
+    assert (flour.name, flour.quantity, flour.unit, flour.notes) == ("flour", 200, MeasurementUnit.G, "sifted")
+
+    salt = parse_ingredient("1½ tsp salt")
+    assert (salt.quantity, salt.unit) == (1.5, MeasurementUnit.TSP)
+
+    eggs = parse_ingredient("2 eggs")
+    assert (eggs.name, eggs.quantity, eggs.unit) == ("eggs", 2, MeasurementUnit.PIECE)
+
+    pepper = parse_ingredient("pepper")
+    assert (pepper.name, pepper.unit) == ("pepper", MeasurementUnit.TO_TASTE)
+
+
+@pytest.mark.parametrize(
+    "text", ["1 c. sugar", "2 T butter", "1 tin tomatoes", "1 jar honey", "1 (14 oz) can tomatoes", "2 cups flour"]
+)
+def test_unknown_unit_is_not_a_piece(text):
+    with pytest.raises(ValueError):
+        parse_ingredient(text)
+
+
+def test_finds_recipe_in_json_ld_graph():
+    soup = page({"@type": "WebSite"}, {"@graph": [{"@type": "BreadcrumbList"}, RECIPE]})
+
+    assert find_recipe_data(soup)["name"] == RECIPE["name"]
+
+
+def test_finds_recipe_in_microdata():
+    soup = BeautifulSoup(
+        '<div itemscope itemtype="https://schema.org/Recipe"><h1 itemprop="name">Pancakes</h1>'
+        '<span itemprop="recipeIngredient">2 eggs</span><span itemprop="recipeIngredient">1 l milk</span></div>',
+        "html.parser",
+    )
+
+    data = find_recipe_data(soup)
+
+    assert data["name"] == "Pancakes"
+    assert data["recipeIngredient"] == ["2 eggs", "1 l milk"]
+
+
+def test_maps_structured_recipe():
+    recipe = recipe_from_structured(RECIPE)
+
+    assert recipe.title == "Pancakes & Syrup"
+    assert recipe.author == "Jane Cook"
+    assert recipe.servings == 4
+    assert (recipe.prep_time, recipe.cook_time, recipe.total_time) == (
+        timedelta(minutes=10),
+        timedelta(minutes=20),
+        timedelta(minutes=30),
+    )
+    assert [ingredient.name for ingredient in recipe.ingredients] == ["flour", "eggs", "salt", "butter"]
+    assert [step.instruction for step in recipe.instructions] == ["Whisk everything.", "Fry in butter."]
+    assert recipe.tags == ["quick", "sweet"]
+
+
+def test_unknown_unit_is_left_to_claude():
+    assert recipe_from_structured(RECIPE | {"recipeIngredient": ["2 cups flour"]}) is None
+
+
+def test_missing_field_is_left_to_claude():
+    assert recipe_from_structured({key: value for key, value in RECIPE.items() if key != "author"}) is None
+    assert recipe_from_structured(RECIPE | {"recipeInstructions": []}) is None
+
+
+@pytest.mark.parametrize(
+    "times",
+    [
+        {"totalTime": "PT10M", "cookTime": "PT20M"},
+        {"prepTime": "PT10M", "cookTime": "PT20M", "totalTime": "PT15M"},
+        {"prepTime": "PT30M", "totalTime": "PT20M"},
+    ],
+)
+def test_inconsistent_times_are_left_to_claude(times):
+    data = {key: value for key, value in RECIPE.items() if key not in ("prepTime", "cookTime")}
+
+    assert recipe_from_structured(data | times) is None
+
+
+def test_total_time_may_include_resting():
+    recipe = recipe_from_structured(RECIPE | {"totalTime": "PT2H"})
+
+    assert (recipe.prep_time, recipe.cook_time, recipe.total_time) == (
+        timedelta(minutes=10),
+        timedelta(minutes=20),
+        timedelta(hours=2),
+    )
+
+
+def test_claude_gets_the_page_text_with_markup_that_cannot_be_mapped(tmp_path):
+    stub = {"@type": "Recipe", "name": "Pancakes", "recipeIngredient": ["200 g flour"]}
+    path = tmp_path / "pancakes.html"
+    path.write_text(
+        f'<html><head><script type="application/ld+json">{json.dumps(stub)}</script></head>'
+        "<body><article><h1>Pancakes</h1><p>Serves 4. Whisk 2 eggs.</p></article></body></html>"
+    )
+
+    input = source_to_input(str(path))
+
+    assert input.recipe is None
+    assert json.dumps(stub) in input.data
+    assert "Serves 4. Whisk 2 eggs." in input.data
+
+
+def test_markup_that_maps_is_not_sent_to_claude(tmp_path):
+    path = tmp_path / "pancakes.html"
+    path.write_text(f'<html><head><script type="application/ld+json">{json.dumps(RECIPE)}</script></head></html>')
+
+    input = source_to_input(str(path))
+
+    assert input.recipe.model_dump(exclude={"created_at"}) == recipe_from_structured(RECIPE).model_dump(exclude={"created_at"})
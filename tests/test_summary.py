@@ -0,0 +1,87 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from recipe_parser.models import DifficultyLevel, MealCategory
+from recipe_parser.summary import RecipeSummary, SummaryIndex
+
+from .conftest import make_recipe
+
+
+@pytest.fixture(scope="module")
+def summaries():
+    rng = random.Random(0)
+    return [
+        RecipeSummary(
+            slug=f"recipe-{number:04d}",
+            title=f"Recipe {number}",
+            tags=[],
+            category=rng.choice([*MealCategory, None]),
+            difficulty=rng.choice(list(DifficultyLevel)),
+            total_time=timedelta(seconds=rng.randrange(5 * 60, 3 * 3600, 30)),
+        )
+        for number in range(2000)
+    ]
+
+
+def walk(index: SummaryIndex, limit: int, **filters) -> list[str]:
+    """Slugs of every page, following the cursors."""
+    slugs = []
+    cursor = None
+    while True:
+        page = index.page(cursor, limit, **filters)
+        assert len(page.items) <= limit
+        slugs += [summary.slug for summary in page.items]
+        if page.next_cursor is None:
+            return slugs
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"category": MealCategory.DESSERT},
+        {"difficulty": DifficultyLevel.EASY},
+        {"max_total_time": timedelta(minutes=30)},
+        {"max_total_time": timedelta(minutes=30, seconds=30)},
+        {"difficulty": DifficultyLevel.HARD, "max_total_time": timedelta(hours=1)},
+        {"category": MealCategory.DESSERT, "difficulty": DifficultyLevel.MEDIUM, "max_total_time": timedelta(minutes=45)},
+    ],
+)
+def test_pages_hold_every_match_in_slug_order(summaries, filters):
+    index = SummaryIndex.from_summaries((summary, None) for summary in summaries)
+    expected = sorted(
+        summary.slug for summary in summaries
+        if (filters.get("category") is None or summary.category == filters["category"])
+        and ("difficulty" not in filters or summary.difficulty == filters["difficulty"])
+        and ("max_total_time" not in filters or summary.total_time <= filters["max_total_time"])
+    )
+
+    assert walk(index, 24, **filters) == expected
+
+
+def test_no_match():
+    index = SummaryIndex()
+
+    assert index.page(category=MealCategory.DESSERT, max_total_time=timedelta(minutes=10)).items == []
+
+
+def test_changed_and_removed_recipes(summaries):
+    index = SummaryIndex.from_summaries((summary, None) for summary in summaries[:10])
+    slug = summaries[0].slug
+    quick = make_recipe(total_time=timedelta(minutes=1), category=MealCategory.SNACK, difficulty=DifficultyLevel.EASY)
+
+    index.update(slug, quick, digest="changed")
+    assert walk(index, 5, max_total_time=timedelta(minutes=1)) == [slug]
+    assert walk(index, 5, category=MealCategory.SNACK, difficulty=DifficultyLevel.EASY) == [slug]
+
+    index.update(slug, None)
+    assert walk(index, 5, max_total_time=timedelta(minutes=1)) == []
+    assert len(index) == 9
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        SummaryIndex().page(cursor="not base64!")
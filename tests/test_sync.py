@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+
+from recipe_parser.parser import Base64Input
+from recipe_parser.sync import SyncManifest, check_source, expand_sources, load_source, parse_version
+
+
+def test_expand_sources(tmp_path):
+    (tmp_path / "book").mkdir()
+    (tmp_path / "book" / "b.html").write_text("b")
+    (tmp_path / "book" / "a.txt").write_text("a")
+    (tmp_path / "book" / "notes.docx").write_text("skipped")
+    (tmp_path / "book" / ".hidden").mkdir()
+    (tmp_path / "book" / ".hidden" / "c.txt").write_text("skipped")
+    url = "https://example.com/recipe"
+
+    sources = expand_sources([url, str(tmp_path / "book"), str(tmp_path / "book" / "a.txt"), url])
+
+    assert sources == [url, str(tmp_path / "book" / "a.txt"), str(tmp_path / "book" / "b.html")]
+
+
+def test_parse_version_changes_with_the_model():
+    assert parse_version("model", "prompt") != parse_version("other-model", "prompt")
+
+
+def load_text(source, body):
+    return Base64Input(data=Path(source).read_text().strip(), file_type="text/plain")
+
+
+def synced(path, version):
+    """A manifest with the file parsed to the pancakes recipe."""
+    state, _ = load_source(str(path), None, version, set(), None, load_text)
+    manifest = SyncManifest()
+    manifest.record(state, version, "pancakes", path.parent / "pancakes.json")
+    return manifest
+
+
+def test_unchanged_file_is_not_parsed_again(tmp_path):
+    path = tmp_path / "recipe.txt"
+    path.write_text("flour and eggs")
+    version = parse_version("model", "prompt")
+    entry = synced(path, version).entries[str(path)]
+
+    assert not check_source(str(path), entry, version, {"pancakes"}, fetcher=None).changed
+    assert check_source(str(path), entry, version, set(), fetcher=None).changed
+    assert check_source(str(path), entry, parse_version("other-model", "prompt"), {"pancakes"}, fetcher=None).changed
+
+
+def test_touched_file_with_the_same_content_is_unchanged(tmp_path):
+    path = tmp_path / "recipe.txt"
+    path.write_text("flour and eggs")
+    version = parse_version("model", "prompt")
+    manifest = synced(path, version)
+    os.utime(path, (1, 1))
+
+    state, input = load_source(str(path), manifest.entries[str(path)], version, {"pancakes"}, None, load_text)
+
+    assert input is None
+    assert not state.changed
+    assert state.file_marker != manifest.entries[str(path)].file_marker
+
+
+def test_same_input_from_a_changed_file_is_unchanged(tmp_path):
+    path = tmp_path / "recipe.txt"
+    path.write_text("flour and eggs")
+    version = parse_version("model", "prompt")
+    manifest = synced(path, version)
+    path.write_text("flour and eggs\n\n")
+
+    state, input = load_source(str(path), manifest.entries[str(path)], version, {"pancakes"}, None, load_text)
+
+    assert input is None
+    assert not state.changed
+
+
+def test_manifest_round_trip_and_prune(tmp_path):
+    path = tmp_path / "recipe.txt"
+    path.write_text("flour and eggs")
+    version = parse_version("model", "prompt")
+    manifest = synced(path, version)
+    manifest.save(tmp_path / "sync-manifest.json")
+
+    loaded = SyncManifest.load(tmp_path / "sync-manifest.json")
+
+    assert loaded == manifest
+    assert [entry.slug for entry in loaded.prune([])] == ["pancakes"]
+    assert not loaded.entries
+
+
+def test_load_source_loads_only_changed_sources(tmp_path):
+    path = tmp_path / "recipe.txt"
+    path.write_text("flour and eggs")
+    version = parse_version("model", "prompt")
+    loaded = []
+
+    def load(source, body):
+        loaded.append(source)
+        return load_text(source, body)
+
+    state, input = load_source(str(path), None, version, set(), None, load)
+    manifest = SyncManifest()
+    manifest.record(state, version, "pancakes", tmp_path / "pancakes.json")
+    state, unchanged = load_source(str(path), manifest.entries[str(path)], version, {"pancakes"}, None, load)
+
+    assert input.data == "flour and eggs"
+    assert unchanged is None
+    assert loaded == [str(path)]